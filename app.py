@@ -1,1082 +1,3440 @@
-import streamlit as st
-import pandas as pd
-from datetime import date, timedelta
-import time
-import gspread # Biblioteca para Google Sheets
-
-# ==============================================================================
-# 🚨 CONFIGURAÇÃO GOOGLE SHEETS E CONEXÃO 🚨
-# ==============================================================================
-
-# Defina a URL ou ID da sua planilha AQUI
-SHEET_ID = '1BNjgWhvEj8NbnGr4x7F42LW7QbQiG5kZ1FBhfr9Q-4g' # <--- SUBSTITUA PELO SEU SHEET ID REAL!
-
-@st.cache_resource(ttl=3600) # Cache para a conexão não abrir a cada execução
-def get_gspread_client():
-"""Retorna o cliente Gspread autenticado."""
-    try:
-        # Tenta carregar as credenciais do Streamlit Secrets
-        creds_info = st.secrets["gcp_service_account"]
-        gc = gspread.service_account_from_dict(creds_info)
-        return gc
-    except KeyError:
-        st.error("⚠️ Credenciais do Google Sheets não encontradas. Certifique-se de que o 'gcp_service_account' está configurado em .streamlit/secrets.toml.")
-        st.stop()
-    except Exception as e:
-        # Este erro agora é mais específico para problemas na chave (Base64/Padding)
-        st.error(f"Erro de autenticação Gspread. Verifique seu ID da planilha e o compartilhamento com a Service Account: {e}")
-        st.stop()
-
-@st.cache_data(ttl=5) # Cache para leitura rápida (revalida a cada 5 segundos)
-def get_sheet_data(sheet_name):
-    """Lê os dados de uma aba/sheet e retorna um DataFrame, com conversões iniciais."""
-    try:
-        gc = get_gspread_client()
-        sh = gc.open_by_key(SHEET_ID)
-        worksheet = sh.worksheet(sheet_name)
-        
-        # Lê todos os dados como lista de listas
-        data = worksheet.get_all_records()
-        df = pd.DataFrame(data)
-
-        if df.empty:
-            return df
-            
-        # Garante que as colunas de ID sejam tratadas como inteiros
-        id_col = f'id_{sheet_name}' if sheet_name in ('veiculo', 'prestador') else 'id_servico'
-        if id_col in df.columns:
-            df[id_col] = pd.to_numeric(df[id_col], errors='coerce').fillna(0).astype(int)
-        
-        # 🚀 ESTABILIZAÇÃO: CONVERSÃO INICIAL DE TIPOS CHAVE LOGO APÓS A LEITURA
-        if sheet_name == 'veiculo':
-            # Conversão para float e data no df_veiculo
-            if 'valor_pago' in df.columns:
-                 df['valor_pago'] = pd.to_numeric(df['valor_pago'], errors='coerce').fillna(0.0).astype(float)
-            if 'data_compra' in df.columns:
-                 df['data_compra'] = pd.to_datetime(df['data_compra'], errors='coerce')
-
-        if sheet_name == 'servico':
-             # Conversão para tipos numéricos de serviço
-             for col in ['valor', 'garantia_dias', 'km_realizado', 'km_proxima_revisao']:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-             # Conversão para data de serviço
-             for col in ['data_servico', 'data_vencimento']:
-                 if col in df.columns:
-                     df[col] = pd.to_datetime(df[col], errors='coerce')
-        
-        return df
-
-    except gspread.WorksheetNotFound:
-        st.error(f"A aba/sheet **'{sheet_name}'** não foi encontrada na planilha. Crie-a com os cabeçalhos corretos.")
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"Erro ao ler a sheet '{sheet_name}': {e}")
-        return pd.DataFrame()
-
-
-def write_sheet_data(sheet_name, df_new):
-    """Sobrescreve a aba/sheet com o novo DataFrame."""
-    try:
-        gc = get_gspread_client()
-        sh = gc.open_by_key(SHEET_ID)
-        worksheet = sh.worksheet(sheet_name)
-
-        # Converte o DataFrame para lista de listas, incluindo o cabeçalho
-        data_to_write = [df_new.columns.tolist()] + df_new.values.tolist()
-        
-        # Sobrescreve toda a aba
-        worksheet.clear()
-        worksheet.update('A1', data_to_write, value_input_option='USER_ENTERED')
-        
-        # Limpa o cache do Streamlit para forçar a releitura imediata
-        get_sheet_data.clear()
-        
-        return True
-
-    except Exception as e:
-        st.error(f"Erro ao escrever na sheet '{sheet_name}': {e}")
-        return False
-
-# ==============================================================================
-# 🚨 FUNÇÕES DE ACESSO A DADOS (SIMULAÇÃO CRUD) 🚨
-# ==============================================================================
-
-def get_data(sheet_name, filter_col=None, filter_value=None):
-    """Busca dados de uma aba/sheet e retorna um DataFrame do Pandas, com filtro opcional."""
-    df = get_sheet_data(sheet_name) 
-    if df.empty:
-        return df
-    
-    if filter_col and filter_value is not None:
-        try:
-            # Garante que o ID no DataFrame é inteiro para comparação
-            if filter_col.startswith('id_'):
-                 df[filter_col] = pd.to_numeric(df[filter_col], errors='coerce').fillna(0).astype(int)
-                 # Garante que o valor de filtro seja inteiro
-                 filter_value = int(filter_value) if pd.notna(filter_value) else 0
-            
-            df_filtered = df[df[filter_col] == filter_value]
-            return df_filtered
-        except:
-            # Em caso de falha de filtro (por exemplo, coluna não existe), retorne um DF vazio.
-            return pd.DataFrame() 
-    
-    return df
-
-
-def execute_crud_operation(sheet_name, data=None, id_col=None, id_value=None, operation='insert'):
-    """Executa as operações CRUD no Google Sheets (Insert, Update, Delete)."""
-    df = get_data(sheet_name)
-    
-    # 1. TRATAMENTO DE ID (SIMULAÇÃO DE AUTO_INCREMENT)
-    new_id = None
-    if operation == 'insert':
-        # Calcula o próximo ID
-        id_col = f'id_{sheet_name}' if id_col is None else id_col
-        if df.empty:
-            new_id = 1
-            df = pd.DataFrame(columns=data.keys()) # Cria DF vazio com as colunas
-        else:
-            df[id_col] = pd.to_numeric(df[id_col], errors='coerce').fillna(0).astype(int)
-            new_id = df[id_col].max() + 1
-        
-        data[id_col] = new_id
-    
-    # 2. INSERÇÃO (APPEND)
-    if operation == 'insert':
-        # Cria um novo DataFrame com os dados a serem inseridos
-        df_new_row = pd.DataFrame([data])
-        # Concatena a nova linha. Garante a ordem das colunas.
-        if df.empty:
-            df_updated = df_new_row
-        else:
-             df_updated = pd.concat([df, df_new_row], ignore_index=True)
-             df_updated = df_updated[df.columns] # Reordena colunas
-        
-        success = write_sheet_data(sheet_name, df_updated)
-        return success, new_id if success else None
-
-    # 3. ATUALIZAÇÃO OU EXCLUSÃO (UPDATE/DELETE)
-    elif operation in ['update', 'delete']:
-        if df.empty or id_value is None:
-            return False, None
-        
-        # Encontra o índice da linha
-        id_col = f'id_{sheet_name}' if id_col is None else id_col
-        df[id_col] = pd.to_numeric(df[id_col], errors='coerce').fillna(0).astype(int)
-        index_to_modify = df[df[id_col] == int(id_value)].index
-        
-        if index_to_modify.empty:
-            return False, None
-
-        if operation == 'update':
-            # Atualiza a linha
-            for key, value in data.items():
-                if key in df.columns:
-                    df.loc[index_to_modify, key] = value
-            df_updated = df
-        
-        elif operation == 'delete':
-            # Remove a linha
-            df_updated = df.drop(index_to_modify).reset_index(drop=True)
-
-        success = write_sheet_data(sheet_name, df_updated)
-        return success, id_value if success else None
-        
-    return False, None
-
-# --- Funções de Inserção/Atualização/Exclusão (CRUD) ---
-# Veículo
-def insert_vehicle(nome, placa, ano, valor_pago, data_compra):
-    
-    # Checa se a placa já existe
-    df_check = get_data('veiculo', 'placa', placa)
-    if not df_check.empty:
-        st.error(f"Placa '{placa}' já cadastrada.")
-        return False
-        
-    data = {
-        'id_veiculo': 0, 
-        'nome': nome, 'placa': placa, 
-        'ano': ano, 'valor_pago': float(valor_pago), 'data_compra': str(data_compra)
-    }
-    
-    success, _ = execute_crud_operation('veiculo', data=data, id_col='id_veiculo', operation='insert')
-    
-    if success:
-        st.success(f"Veículo '{nome}' ({placa}) cadastrado com sucesso!")
-        st.session_state['edit_vehicle_id'] = None
-        st.rerun()  
-    else:
-        st.error("Falha ao cadastrar veículo.")
-
-def update_vehicle(id_veiculo, nome, placa, ano, valor_pago, data_compra):
-    
-    # Checa se a placa existe em outro ID
-    df_check = get_data('veiculo', 'placa', placa)
-    if not df_check.empty:
-        # Pega o ID do veículo encontrado (se houver) e converte para int
-        found_id = df_check.iloc[0]['id_veiculo'] 
-        if found_id != int(id_veiculo):
-            st.error(f"Placa '{placa}' já cadastrada para outro veículo (ID {found_id}).")
-            return False
-
-    data = {
-        'nome': nome, 'placa': placa, 
-        'ano': ano, 'valor_pago': float(valor_pago), 'data_compra': str(data_compra)
-    }
-    
-    success, _ = execute_crud_operation('veiculo', data=data, id_col='id_veiculo', id_value=int(id_veiculo), operation='update')
-    
-    if success:
-        st.success(f"Veículo '{nome}' ({placa}) atualizado com sucesso!")
-        st.session_state['edit_vehicle_id'] = None
-        st.rerun()  
-    else:
-        st.error("Falha ao atualizar veículo.")
-
-def delete_vehicle(id_veiculo):
-    # Simulação da verificação de chave estrangeira
-    df_servicos = get_data('servico', 'id_veiculo', int(id_veiculo))
-    if not df_servicos.empty:
-        st.error("Não é possível remover o veículo. Existem serviços vinculados a ele.")
-        return False
-        
-    success, _ = execute_crud_operation('veiculo', id_col='id_veiculo', id_value=int(id_veiculo), operation='delete')
-    
-    if success:
-        st.success("Veículo removido com sucesso!")
-        time.sleep(1)
-        st.rerun()  
-    else:
-        st.error("Falha ao remover veículo.")
-
-# Prestador
-def insert_new_prestador(empresa, telefone, nome_prestador, cnpj, email, endereco, numero, cidade, bairro, cep):
-    df_check = get_data("prestador", "empresa", empresa)
-    if not df_check.empty:
-        st.warning(f"A empresa '{empresa}' já está cadastrada.")
-        return False
-        
-    data = {
-        'id_prestador': 0, 'empresa': empresa, 'telefone': telefone, 'nome_prestador': nome_prestador, 
-        'cnpj': cnpj, 'email': email, 'endereco': endereco, 'numero': numero, 
-        'cidade': cidade, 'bairro': bairro, 'bairro': bairro, 'cep': cep
-    }
-    
-    success, _ = execute_crud_operation('prestador', data=data, id_col='id_prestador', operation='insert')
-    
-    if success:
-        st.success(f"Prestador '{empresa}' cadastrado com sucesso!")
-        st.session_state['edit_prestador_id'] = None
-        st.rerun()  
-        return True
-    return False
-
-def update_prestador(id_prestador, empresa, telefone, nome_prestador, cnpj, email, endereco, numero, cidade, bairro, cep):
-    data = {
-        'empresa': empresa, 'telefone': telefone, 'nome_prestador': nome_prestador, 
-        'cnpj': cnpj, 'email': email, 'endereco': endereco, 'numero': numero, 
-        'cidade': cidade, 'bairro': bairro, 'cep': cep
-    }
-    
-    success, _ = execute_crud_operation('prestador', data=data, id_col='id_prestador', id_value=int(id_prestador), operation='update')
-    
-    if success:
-        st.success(f"Prestador '{empresa}' atualizado com sucesso!")
-        st.session_state['edit_prestador_id'] = None
-        st.rerun()  
-        return True
-    return False
-
-def delete_prestador(id_prestador):
-    df_servicos = get_data('servico', 'id_prestador', int(id_prestador))
-    if not df_servicos.empty:
-        st.error("Não é possível remover o prestador. Existem serviços vinculados a ele.")
-        return False
-
-    success, _ = execute_crud_operation('prestador', id_col='id_prestador', id_value=int(id_prestador), operation='delete')
-    
-    if success:
-        st.success("Prestador removido com sucesso!")
-        time.sleep(1)
-        st.rerun()  
-    else:
-        st.error("Falha ao remover prestador.")
-
-def insert_prestador(empresa, telefone, nome_prestador, cnpj, email, endereco, numero, cidade, bairro, cep):
-    """Insere ou atualiza um prestador (usado no cadastro de Serviço)."""
-    df = get_data("prestador", "empresa", empresa)
-    
-    if not df.empty:
-        # Se existe, retorna o ID e atualiza os dados
-        id_prestador = df.iloc[0]['id_prestador']
-        # Simula a atualização de dados do prestador
-        update_prestador(id_prestador, empresa, telefone, nome_prestador, cnpj, email, endereco, numero, cidade, bairro, cep)
-        st.info(f"Dados do Prestador '{empresa}' atualizados.")
-        return id_prestador
-    
-    # Se não existe, insere
-    data = {
-        'id_prestador': 0, 'empresa': empresa, 'telefone': telefone, 'nome_prestador': nome_prestador, 
-        'cnpj': cnpj, 'email': email, 'endereco': endereco, 'numero': numero, 
-        'cidade': cidade, 'bairro': bairro, 'cep': cep
-    }
-    success, new_id = execute_crud_operation('prestador', data=data, id_col='id_prestador', operation='insert')
-    
-    return new_id if success else None
-
-# Serviço
-def insert_service(id_veiculo, id_prestador, nome_servico, data_servico, garantia_dias, valor, km_realizado, km_proxima_revisao, registro):
-    data_servico_dt = pd.to_datetime(data_servico)
-    data_vencimento = data_servico_dt + timedelta(days=int(garantia_dias))
-
-    data = {
-        'id_servico': 0, 'id_veiculo': int(id_veiculo), 'id_prestador': int(id_prestador), 
-        'nome_servico': nome_servico, 'data_servico': str(data_servico_dt.date()), 
-        'garantia_dias': str(garantia_dias), 'valor': float(valor), 
-        'km_realizado': str(km_realizado), 'km_proxima_revisao': str(km_proxima_revisao), 
-        'registro': registro, 
-        'data_vencimento': str(data_vencimento.date()) # Campo auxiliar para Dashboards
-    }
-    
-    success, _ = execute_crud_operation('servico', data=data, id_col='id_servico', operation='insert')
-    
-    if success:
-        st.success(f"Serviço '{nome_servico}' cadastrado com sucesso!")
-        if 'edit_service_id' in st.session_state:
-            del st.session_state['edit_service_id']
-        st.rerun()  
-    else:
-        st.error("Falha ao cadastrar serviço.")
-
-def update_service(id_servico, id_veiculo, id_prestador, nome_servico, data_servico, garantia_dias, valor, km_realizado, km_proxima_revisao, registro):
-    data_servico_dt = pd.to_datetime(data_servico)
-    data_vencimento = data_servico_dt + timedelta(days=int(garantia_dias))
-
-    data = {
-        'id_veiculo': int(id_veiculo), 'id_prestador': int(id_prestador), 
-        'nome_servico': nome_servico, 'data_servico': str(data_servico_dt.date()), 
-        'garantia_dias': str(garantia_dias), 'valor': float(valor), 
-        'km_realizado': str(km_realizado), 'km_proxima_revisao': str(km_proxima_revisao), 
-        'registro': registro,
-        'data_vencimento': str(data_vencimento.date()) # Campo auxiliar para Dashboards
-    }
-    
-    success, _ = execute_crud_operation('servico', data=data, id_col='id_servico', id_value=int(id_servico), operation='update')
-    
-    if success:
-        st.success(f"Serviço '{nome_servico}' atualizado com sucesso!")
-        if 'edit_service_id' in st.session_state:
-            del st.session_state['edit_service_id']
-        st.rerun()  
-    else:
-        st.error("Falha ao atualizar serviço.")
-
-def delete_service(id_servico):
-    success, _ = execute_crud_operation('servico', id_col='id_servico', id_value=int(id_servico), operation='delete')
-    
-    if success:
-        st.success("Serviço removido com sucesso!")
-        time.sleep(1)
-        st.rerun()  
-    else:
-        st.error("Falha ao remover serviço.")
-
-# --- FUNÇÃO QUE SIMULA O JOIN DO SQL ---
-
-def get_full_service_data(date_start=None, date_end=None):
-    """Lê todos os dados e simula a operação JOIN do SQL no Pandas."""
-    
-    df_servicos = get_data('servico')
-    df_veiculos = get_data('veiculo')
-    df_prestadores = get_data('prestador')
-    
-    if df_servicos.empty or df_veiculos.empty or df_prestadores.empty:
-        return pd.DataFrame()
-    
-    # Converte tipos para o merge
-    df_servicos['id_veiculo'] = pd.to_numeric(df_servicos['id_veiculo'], errors='coerce').fillna(0).astype(int)
-    df_servicos['id_prestador'] = pd.to_numeric(df_servicos['id_prestador'], errors='coerce').fillna(0).astype(int)
-    
-    # 🛑 CONVERSÃO FINAL DE TIPOS NUMÉRICOS 🛑
-    df_servicos['valor'] = pd.to_numeric(df_servicos['valor'], errors='coerce').fillna(0.0)
-    df_servicos['garantia_dias'] = pd.to_numeric(df_servicos['garantia_dias'], errors='coerce').fillna(0).astype(int)
-    df_servicos['km_realizado'] = pd.to_numeric(df_servicos['km_realizado'], errors='coerce').fillna(0).astype(int)
-    df_servicos['km_proxima_revisao'] = pd.to_numeric(df_servicos['km_proxima_revisao'], errors='coerce').fillna(0).astype(int)
-    # -----------------------------------------------
-    # 1. JOIN com Veículo
-    df_merged = pd.merge(df_servicos, df_veiculos[['id_veiculo', 'nome', 'placa']], on='id_veiculo', how='left')
-    
-    # 2. JOIN com Prestador
-    df_merged = pd.merge(df_merged, df_prestadores[['id_prestador', 'empresa', 'cidade']], on='id_prestador', how='left')
-    
-    # Renomeia colunas para o display
-    df_merged = df_merged.rename(columns={'nome': 'Veículo', 'placa': 'Placa', 'empresa': 'Empresa', 'cidade': 'Cidade', 'nome_servico': 'Serviço', 'data_servico': 'Data', 'valor': 'Valor'})
-    
-    # Converte colunas de data (sem NaT) - já foram feitas em get_sheet_data
-    df_merged['Data'] = pd.to_datetime(df_merged['Data'], errors='coerce')
-    df_merged['data_vencimento'] = pd.to_datetime(df_merged['data_vencimento'], errors='coerce')
-
-    # 3. Filtragem por Data (se necessário)
-    if date_start and date_end:
-        df_merged = df_merged[(df_merged['Data'] >= pd.to_datetime(date_start)) & (df_merged['Data'] <= pd.to_datetime(date_end))]
-        
-    return df_merged.sort_values(by='Data', ascending=False)
-
-# ==============================================================================
-# 🚨 CSS PERSONALIZADO PARA FORÇAR BOTÕES LADO A LADO NO CELULAR 🚨
-# ==============================================================================
-CUSTOM_CSS = """
-/* Aplica display flex (alinhamento horizontal) e nowrap (não quebrar linha) 
-   aos containers de coluna que envolvem os botões de ação (lápis e lixeira).
-   Isso garante que os botões fiquem lado a lado mesmo em telas muito pequenas. */
-.st-emotion-cache-12fmwza, .st-emotion-cache-n2e28m { /* Classes específicas do Streamlit */
-    display: flex;
-    flex-wrap: nowrap !important;
-    gap: 5px; 
-    align-items: center; 
-}
-
-/* Garante que os containers internos dos botões ocupem o mínimo de espaço */
-.st-emotion-cache-12fmwza > div, .st-emotion-cache-n2e28m > div {
-    min-width: 0 !important;
-    max-width: none !important;
-}
-/* Reduz o padding dos botões para economizar espaço e garantir o alinhamento */
-.st-emotion-cache-n2e28m button, .st-emotion-cache-12fmwza button {
-    padding: 0px 5px !important;
-    line-height: 1.2 !important;
-    font-size: 14px;
-}
-"""
-# ==============================================================================
-
-
-# --- COMPONENTES DE DISPLAY ---
-
-def display_vehicle_table_and_actions(df_veiculos_listagem):
-    """Exibe a tabela de veículos com layout adaptado para celular."""
-    st.subheader("Manutenção de Veículos Existentes")
-    st.markdown('---') 
-    
-    for index, row in df_veiculos_listagem.iterrows():
-        id_veiculo = int(row['id_veiculo']) 
-        
-        # PROPORÇÃO PARA RESPONSIVIDADE: 85% para Dados, 15% para Ações.
-        col_data, col_actions = st.columns([0.85, 0.15]) 
-        
-        # --- BLOC DE DADOS (COLUNA ESQUERDA) ---
-        with col_data:
-            st.markdown(f"**{row['nome']} ({row['placa']})**")
-            st.markdown(f"Ano: **{row['ano']}**")
-            st.markdown(f"Valor: **R$ {float(row['valor_pago']):.2f}**")
-        
-        # --- BLOCO DE AÇÃO (COLUNA DIREITA) ---
-        with col_actions:
-            col_act1, col_act2 = st.columns(2) 
-            
-            with col_act1:
-                if st.button("✏️", key=f"edit_v_{id_veiculo}", help=f"Editar Veículo ID {id_veiculo}"):
-                    st.session_state['edit_vehicle_id'] = id_veiculo
-                    st.rerun() 
-
-            with col_act2:
-                if st.button("🗑️", key=f"delete_v_{id_veiculo}", help=f"Excluir Veículo ID {id_veiculo}"):
-                    if st.session_state.get(f'confirm_delete_v_{id_veiculo}', False):
-                        delete_vehicle(id_veiculo)
-                    else:
-                        st.session_state[f'confirm_delete_v_{id_veiculo}'] = True
-                        st.rerun() 
-        
-        # Linha de aviso de confirmação de exclusão (fora das colunas)
-        if st.session_state.get(f'confirm_delete_v_{id_veiculo}', False) and not st.session_state.get('edit_vehicle_id'):
-            st.error(f"⚠️ **Clique novamente** no botão 🗑️ acima para confirmar a exclusão do ID {id_veiculo}.")
-        
-        st.markdown("---") 
-            
-def display_prestador_table_and_actions(df_prestadores_listagem):
-    """Exibe a tabela de prestadores com layout adaptado para celular."""
-    st.subheader("Manutenção de Prestadores Existentes")
-    st.markdown('---') 
-    
-    for index, row in df_prestadores_listagem.iterrows():
-        id_prestador = int(row['id_prestador']) 
-        
-        # PROPORÇÃO PARA RESPONSIVIDADE
-        col_data, col_actions = st.columns([0.85, 0.15]) 
-        
-        # --- BLOC DA LINHA DE DADOS ---
-        with col_data:
-            st.markdown(f"**{row['empresa']}**")
-            st.markdown(f"Contato: **{row['nome_prestador'] or 'N/A'}**")
-            st.markdown(f"Telefone: **{row['telefone'] or 'N/A'}**")
-            st.markdown(f"Cidade: **{row['cidade'] or 'N/A'}**")
-        
-        # --- BLOCO DE AÇÃO (COLUNA DIREITA) ---
-        with col_actions:
-            col_act1, col_act2 = st.columns(2) 
-            
-            with col_act1:
-                if st.button("✏️", key=f"edit_p_{id_prestador}", help=f"Editar Prestador ID {id_prestador}"):
-                    st.session_state['edit_prestador_id'] = id_prestador
-                    st.rerun() 
-
-            with col_act2:
-                if st.button("🗑️", key=f"delete_p_{id_prestador}", help=f"Excluir Prestador ID {id_prestador}"):
-                    if st.session_state.get(f'confirm_delete_p_{id_prestador}', False):
-                        delete_prestador(id_prestador)
-                    else:
-                        st.session_state[f'confirm_delete_p_{id_prestador}'] = True
-                        st.rerun() 
-
-        if st.session_state.get(f'confirm_delete_p_{id_prestador}', False) and not st.session_state.get('edit_prestador_id'):
-            st.error(f"⚠️ **Clique novamente** no botão 🗑️ acima para confirmar a exclusão do ID {id_prestador}.")
-            
-        st.markdown("---") 
-
-def display_service_table_and_actions(df_servicos_listagem):
-    """Exibe a tabela de serviços com layout adaptado para celular."""
-    st.subheader("Manutenção de Serviços Existentes")
-    st.markdown('---') 
-    
-    for index, row in df_servicos_listagem.iterrows():
-        # df_servicos_listagem é o resultado de get_full_service_data, que já tem o id_servico
-        id_servico = int(row['id_servico']) 
-        
-        # Formata a data para exibição (a coluna 'Data' já é datetime do Pandas)
-        data_display = row['Data'].strftime('%d-%m-%Y') if pd.notna(row['Data']) else 'N/A'
-        
-        # PROPORÇÃO PARA RESPONSIVIDADE
-        col_data, col_actions = st.columns([0.85, 0.15]) 
-        
-        # --- BLOC DA LINHA DE DADOS ---
-        with col_data:
-            st.markdown(f"**{row['Veículo']}** - {row['Serviço']}")
-            st.markdown(f"Data: **{data_display}**")
-            st.markdown(f"Empresa: **{row['Empresa']}**")
-
-        # --- BLOCO DE AÇÃO (COLUNA DIREITA) ---
-        with col_actions:
-            col_act1, col_act2 = st.columns(2) 
-
-            with col_act1:
-                if st.button("✏️", key=f"edit_{id_servico}", help=f"Editar Serviço ID {id_servico}"):
-                    st.session_state['edit_service_id'] = id_servico
-                    st.rerun() 
-
-            with col_act2:
-                if st.button("🗑️", key=f"delete_{id_servico}", help=f"Excluir Serviço ID {id_servico}"):
-                    if st.session_state.get(f'confirm_delete_{id_servico}', False):
-                        delete_service(id_servico)
-                    else:
-                        st.session_state[f'confirm_delete_{id_servico}'] = True
-                        st.rerun() 
-
-        if st.session_state.get(f'confirm_delete_{id_servico}', False) and not st.session_state.get('edit_service_id'):
-            st.error(f"⚠️ **Clique novamente** no botão 🗑️ acima para confirmar a exclusão do ID {id_servico}.")
-
-        st.markdown("---") 
-
-
-# --- Componentes de Gestão Unificada (Cadastro/Manutenção) ---
-
-def manage_vehicle_form():
-    """Formulário unificado para Cadastro e Manutenção de Veículos."""
-    
-    vehicle_id_to_edit = st.session_state.get('edit_vehicle_id', None)
-    is_editing = vehicle_id_to_edit is not None
-    
-    col_header1, col_header2 = st.columns([0.2, 0.8])
-    with col_header1:
-        st.header("Veículo")
-    with col_header2:
-        if not is_editing:
-             if st.button("➕ Novo Veículo", key="btn_novo_veiculo_lista", help="Iniciar um novo cadastro de veículo"):
-                 st.session_state['edit_vehicle_id'] = 'NEW_MODE'
-                 st.rerun()
-
-    if is_editing or st.session_state.get('edit_vehicle_id') == 'NEW_MODE':
-        
-        is_new_mode = st.session_state.get('edit_vehicle_id') == 'NEW_MODE'
-        # ALTERAÇÃO: Chama a nova função de busca de dados
-        df_veiculos = get_data("veiculo")
-
-        if is_new_mode:
-            st.header("➕ Novo Veículo")
-            submit_label = 'Cadastrar Veículo'
-            data = {
-                'nome': '', 'placa': '', 'ano': date.today().year, 
-                'valor_pago': 0.0, 'data_compra': date.today()
-            }
-            if st.button("Cancelar Cadastro / Voltar para Lista"):
-                del st.session_state['edit_vehicle_id']
-                st.rerun()  
-                return
-            
-        else: # MODO EDIÇÃO
-            submit_label = 'Atualizar Veículo'
-            
-            try:
-                selected_row = df_veiculos[df_veiculos['id_veiculo'] == vehicle_id_to_edit].iloc[0]
-            except:
-                st.error("Dados do veículo não encontrados para edição.")
-                del st.session_state['edit_vehicle_id']
-                st.rerun()  
-                return
-            
-            data = selected_row.to_dict()
-            # Converte data_compra de string para date
-            data['data_compra'] = pd.to_datetime(data['data_compra'], errors='coerce').date() if pd.notna(data['data_compra']) else date.today()
-
-            st.header(f"✏️ Editando Veículo ID: {vehicle_id_to_edit}")
-            if st.button("Cancelar Edição / Voltar para Lista"):
-                del st.session_state['edit_vehicle_id']
-                st.rerun()  
-                return
-
-        with st.form(key='manage_vehicle_form_edit'):
-            st.caption("Informações Básicas")
-            vehicle_name = st.text_input("Nome Amigável do Veículo (Ex: Gol do João)", value=data['nome'], max_chars=100)
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                placa = st.text_input("Placa", value=data['placa'], max_chars=10)
-            
-            # Ajustando colunas para 2, já que Renavam saiu
-            col3, col4 = st.columns(2)
-            with col3:
-                st.caption("Detalhes de Aquisição")
-                current_year = date.today().year
-                # Converte o ano para int, tratando possíveis erros
-                default_ano = int(data['ano']) if pd.notna(data.get('ano')) and str(data['ano']).isdigit() else current_year
-                ano = st.number_input("Ano do Veículo", min_value=1900, max_value=current_year + 1, value=default_ano, step=1)
-            with col4:
-                st.caption(" ") # Espaço para alinhar com o título acima
-                # Converte o valor para float, tratando possíveis erros
-                default_valor = float(data['valor_pago']) if pd.notna(data.get('valor_pago')) else 0.0
-                valor_pago = st.number_input("Valor Pago (R$)", min_value=0.0, format="%.2f", value=default_valor, step=1000.0)
-            
-            col5, col6 = st.columns(2)
-            with col5:
-                # data_compra já está como date
-                data_compra = st.date_input("Data de Compra", value=data['data_compra'])
-            
-            # O Renavam foi removido, então ele não é passado aqui
-            renavam_dummy = None
-
-            submit_button = st.form_submit_button(label=submit_label)
-
-            if submit_button:
-                if not vehicle_name or not placa:
-                    st.warning("O Nome e a Placa são campos obrigatórios.")
-                elif is_new_mode:
-                    # 🛑 REMOÇÃO 6: Não passar 'renavam_dummy'
-                    insert_vehicle(vehicle_name, placa, ano, valor_pago, data_compra)
-                else:
-                    # 🛑 REMOÇÃO 7: Não passar 'renavam_dummy'
-                    update_vehicle(vehicle_id_to_edit, vehicle_name, placa, ano, valor_pago, data_compra)
-        
-        return
-
-    # MODO LISTAGEM
-    # ALTERAÇÃO: Chama a nova função de busca de dados
-    df_veiculos_listagem = get_data("veiculo")
-    # Simula o 'ORDER BY nome'
-    if not df_veiculos_listagem.empty:
-        df_veiculos_listagem = df_veiculos_listagem.sort_values(by='nome')
-        display_vehicle_table_and_actions(df_veiculos_listagem)
-    else:
-        st.info("Nenhum veículo cadastrado. Clique em '➕ Novo Veículo' para começar.")
-        st.markdown("---")
-
-def manage_prestador_form():
-    """Formulário unificado para Cadastro e Manutenção de Prestadores."""
-    
-    prestador_id_to_edit = st.session_state.get('edit_prestador_id', None)
-    is_editing = prestador_id_to_edit is not None
-    
-    col_header1, col_header2 = st.columns([0.2, 0.8])
-    with col_header1:
-        st.header("Prestador")
-    with col_header2:
-        if not is_editing:
-             if st.button("➕ Novo Prestador", key="btn_novo_prestador_lista", help="Iniciar um novo cadastro de prestador"):
-                 st.session_state['edit_prestador_id'] = 'NEW_MODE'
-                 st.rerun()
-
-    if is_editing or st.session_state.get('edit_prestador_id') == 'NEW_MODE':
-
-        is_new_mode = st.session_state.get('edit_prestador_id') == 'NEW_MODE'
-        # ALTERAÇÃO: Chama a nova função de busca de dados
-        df_prestadores = get_data("prestador")
-
-        if is_new_mode:
-            st.header("➕ Novo Prestador")
-            submit_label = 'Cadastrar Prestador'
-            data = {
-                'empresa': '', 'telefone': '', 'nome_prestador': '', 'cnpj': '', 'email': '',
-                'endereco': '', 'numero': '', 'cidade': '', 'bairro': '', 'cep': ''
-            }
-            if st.button("Cancelar Cadastro / Voltar para Lista"):
-                del st.session_state['edit_prestador_id']
-                st.rerun()  
-                return
-
-        else: # MODO EDIÇÃO
-            submit_label = 'Atualizar Prestador'
-            try:
-                selected_row = df_prestadores[df_prestadores['id_prestador'] == prestador_id_to_edit].iloc[0]
-            except:
-                st.error("Dados do prestador não encontrados para edição.")
-                del st.session_state['edit_prestador_id']
-                st.rerun()  
-                return
-
-            data = selected_row.to_dict()
-            st.header(f"✏️ Editando Prestador ID: {prestador_id_to_edit}")
-            
-            if st.button("Cancelar Edição / Voltar para Lista"):
-                del st.session_state['edit_prestador_id']
-                st.rerun()  
-                return
-
-        with st.form(key='manage_prestador_form_edit'):
-            st.caption("Dados da Empresa")
-            company_name = st.text_input("Nome da Empresa/Oficina (Obrigatório)", value=data['empresa'], max_chars=100, disabled=(not is_new_mode))
-            
-            col_p1, col_p2 = st.columns(2)
-            with col_p1:
-                telefone = st.text_input("Telefone da Empresa", value=data['telefone'] or "", max_chars=20)
-            with col_p2:
-                nome_prestador = st.text_input("Nome do Prestador/Contato", value=data['nome_prestador'] or "", max_chars=100)
-            
-            col_p3, col_p4 = st.columns(2) 
-            with col_p3:
-                cnpj = st.text_input("CNPJ", value=data['cnpj'] or "", max_chars=18)
-            with col_p4:
-                email = st.text_input("E-mail", value=data['email'] or "", max_chars=100)
-            
-            st.caption("Endereço")
-            col_addr1, col_addr2 = st.columns([3, 1])
-            with col_addr1:
-                endereco = st.text_input("Endereço (Rua, Av.)", value=data['endereco'] or "", max_chars=255)
-            with col_addr2:
-                numero = st.text_input("Número", value=data['numero'] or "", max_chars=20)
-
-            col_addr3, col_addr4, col_addr5 = st.columns([2, 2, 1])
-            with col_addr3:
-                bairro = st.text_input("Bairro", value=data['bairro'] or "", max_chars=100)
-            with col_addr4:
-                cidade = st.text_input("Cidade", value=data['cidade'] or "", max_chars=100)
-            with col_addr5:
-                cep = st.text_input("CEP", value=data['cep'] or "", max_chars=20)
-                
-            submit_button = st.form_submit_button(label=submit_label)
-            
-            if submit_button:
-                if not company_name:
-                    st.warning("O nome da empresa é obrigatório.")
-                    return
-                
-                args = (company_name, telefone, nome_prestador, cnpj, email, endereco, numero, cidade, bairro, cep)
-
-                if is_new_mode:
-                    insert_new_prestador(*args)
-                else:
-                    update_prestador(prestador_id_to_edit, *args)
-        
-        return
-    
-    # MODO LISTAGEM
-    # ALTERAÇÃO: Chama a nova função de busca de dados
-    df_prestadores_listagem = get_data("prestador")
-    # Simula o 'ORDER BY empresa'
-    if not df_prestadores_listagem.empty:
-        df_prestadores_listagem = df_prestadores_listagem.sort_values(by='empresa')
-        display_prestador_table_and_actions(df_prestadores_listagem)
-    else:
-        st.info("Nenhum prestador cadastrado. Clique em '➕ Novo Prestador' para começar.")
-        st.markdown("---")
-
-def manage_service_form():
-    """Gerencia o fluxo de Novo Cadastro, Edição e Listagem/Filtro de Serviços."""
-    
-    # ALTERAÇÃO: Chama a nova função de busca de dados
-    df_veiculos = get_data("veiculo").sort_values(by='nome')
-    df_prestadores = get_data("prestador").sort_values(by='empresa')
-
-    if df_veiculos.empty or df_prestadores.empty:
-        st.warning("⚠️ Por favor, cadastre pelo menos um veículo e um prestador primeiro.")
-        return
-    
-    df_veiculos['display_name'] = df_veiculos['nome'] + ' (' + df_veiculos['placa'] + ')'
-    veiculos_map = pd.Series(df_veiculos.id_veiculo.values, index=df_veiculos.display_name).to_dict()
-    veiculos_nomes = list(df_veiculos['display_name'])
-    prestadores_nomes = list(df_prestadores['empresa']) 
-    
-    service_id_to_edit = st.session_state.get('edit_service_id', None)
-    is_editing = service_id_to_edit is not None
-    
-    col_header1, col_header2 = st.columns([0.2, 0.8])
-    with col_header1:
-        st.header("Serviço")
-    with col_header2:
-        if not is_editing:
-             if st.button("➕ Novo Serviço", key="btn_novo_servico_lista", help="Iniciar um novo cadastro de serviço"):
-                 st.session_state['edit_service_id'] = 'NEW_MODE'
-                 st.rerun()
-
-    if is_editing or st.session_state.get('edit_service_id') == 'NEW_MODE':
-        
-        is_new_mode = st.session_state.get('edit_service_id') == 'NEW_MODE'
-        
-        if is_new_mode:
-             st.header("➕ Novo Serviço")
-             submit_label = 'Cadastrar Serviço'
-             data = {
-                 'nome_servico': '', 'registro': '', 'data_servico': date.today(), 
-                 'garantia_dias': 90, 'valor': 0.0, 'km_realizado': 0, 'km_proxima_revisao': 0
-             }
-             selected_vehicle_idx = 0
-             selected_prestador_idx = 0
-             
-             if st.button("Cancelar Cadastro / Voltar para Lista"):
-                 del st.session_state['edit_service_id']
-                 st.rerun()  
-                 return
-        
-        else: # MODO EDIÇÃO
-            submit_label = 'Atualizar Serviço'
-            
-            try:
-                # ALTERAÇÃO: Chama a nova função de busca com filtro
-                df_data = get_data("servico", "id_servico", int(service_id_to_edit))
-            except Exception as e:
-                st.error(f"Erro ao buscar dados do serviço ID {service_id_to_edit}: {e}")
-                df_data = pd.DataFrame()
-            
-            if df_data.empty:
-                st.error("Dados do serviço não encontrados para edição.")
-                del st.session_state['edit_service_id']
-                st.rerun()  
-                return
-                
-            data = df_data.iloc[0].to_dict()
-            st.header(f"✏️ Editando Serviço ID: {service_id_to_edit}")
-            
-            # Garante que os IDs de Veículo e Prestador sejam inteiros
-            current_id_veiculo = int(data['id_veiculo'])
-            current_id_prestador = int(data['id_prestador'])
-
-            # Busca os nomes para preencher o selectbox (JOIN manual)
-            current_vehicle_row = df_veiculos[df_veiculos['id_veiculo'] == current_id_veiculo].iloc[0]
-            current_vehicle_name = current_vehicle_row['display_name']
-            
-            current_prestador_name = df_prestadores[df_prestadores['id_prestador'] == current_id_prestador].iloc[0]['empresa']
-            
-            # Encontra os índices
-            selected_vehicle_idx = veiculos_nomes.index(current_vehicle_name)
-            selected_prestador_idx = prestadores_nomes.index(current_prestador_name) if current_prestador_name in prestadores_nomes else 0
-            
-            # Converte a data de string para date
-            data['data_servico'] = pd.to_datetime(data['data_servico'], errors='coerce').date() if pd.notna(data['data_servico']) else date.today()
-
-            if st.button("Cancelar Edição / Voltar para Lista"):
-                del st.session_state['edit_service_id']
-                st.rerun()  
-                return
-
-        # --- FORMULÁRIO (Novo Cadastro ou Edição) ---
-        with st.form(key='manage_service_form_edit'):
-            
-            st.caption("Veículo e Prestador")
-            selected_vehicle = st.selectbox("Veículo", veiculos_nomes, index=selected_vehicle_idx, key="edit_service_vehicle", help="Comece a digitar para buscar o veículo.")
-            selected_company_name = st.selectbox("Nome da Empresa/Oficina", prestadores_nomes, index=selected_prestador_idx, key='edit_service_company', help="Comece a digitar para buscar a empresa.")
-
-            st.caption("Detalhes do Serviço")
-            service_name = st.text_input("Nome do Serviço", value=data['nome_servico'], max_chars=100)
-            
-            registro = st.text_input("Registro Adicional (Ex: N° NF, Código)", value=data.get('registro') or "", max_chars=50) 
-            
-            default_service_date = data['data_servico']
-            service_date = st.date_input("Data do Serviço", value=default_service_date)
-            
-            col_s1, col_s2, col_s3, col_s4 = st.columns(4)
-            with col_s1:
-                default_garantia = int(data['garantia_dias']) if pd.notna(data.get('garantia_dias')) and str(data.get('garantia_dias')).isdigit() else 90
-                garantia = st.number_input("Garantia (Dias)", min_value=0, max_value=3650, value=default_garantia, step=1)
-            with col_s2:
-                default_valor = float(data['valor']) if pd.notna(data.get('valor')) else 0.0
-                value = st.number_input("Valor (R$)", min_value=0.0, format="%.2f", value=default_valor, step=10.0)
-            with col_s3:
-                default_km_current = int(data['km_realizado']) if pd.notna(data.get('km_realizado')) and str(data.get('km_realizado')).isdigit() else 0
-                km_realizado = st.number_input("KM Realizado", min_value=0, value=default_km_current, step=100)
-            with col_s4:
-                default_km_next = int(data['km_proxima_revisao']) if pd.notna(data.get('km_proxima_revisao')) and str(data.get('km_proxima_revisao')).isdigit() else 0
-                km_next = st.number_input("KM Próxima Revisão", min_value=0, value=default_km_next, step=1000)
-                
-            submit_button = st.form_submit_button(label=submit_label)
-
-            if submit_button:
-                if not selected_company_name:
-                     st.error("Por favor, selecione uma Empresa/Oficina válida.")
-                     return
-                if not service_name:
-                    st.warning("Preencha o Nome do Serviço.")
-                    return
-
-                new_id_veiculo = int(veiculos_map[selected_vehicle])
-                prestador_row = df_prestadores[df_prestadores['empresa'] == selected_company_name]
-                new_id_prestador = int(prestador_row.iloc[0]['id_prestador'])
-
-                args_service = (
-                    new_id_veiculo, new_id_prestador, service_name, service_date, garantia, 
-                    value, km_realizado, km_next, registro
-                )
-
-                if is_new_mode:
-                    insert_service(*args_service)
-                else:
-                    update_service(int(service_id_to_edit), *args_service)
-        
-        return
-
-    # --- MODO LISTAGEM / MANUTENÇÃO ---
-    else: 
-        st.subheader("Manutenção de Serviços Existentes (Filtro e Edição)")
-        
-        col_filtro1, col_filtro2 = st.columns(2)
-        with col_filtro1:
-            date_end_default = date.today()
-            date_start_default = date_end_default - timedelta(days=90)
-            date_start = st.date_input("Filtrar por Data de Início", value=date_start_default)
-        with col_filtro2:
-            date_end = st.date_input("Filtrar por Data Final", value=date_end_default)
-
-        # ALTERAÇÃO: Chama a função de JOIN e Filtro no Pandas
-        df_servicos_listagem = get_full_service_data(date_start, date_end)
-        
-        if not df_servicos_listagem.empty:
-            # Filtra colunas necessárias para o display_service_table_and_actions
-            df_servicos_display = df_servicos_listagem[['id_servico', 'Veículo', 'Serviço', 'Data', 'Empresa']]
-            display_service_table_and_actions(df_servicos_display)
-        else:
-            st.info("Nenhum serviço encontrado no período selecionado.")
-
-# --- Layout Principal do Streamlit ---
-
-def main():
-    """Função principal que organiza as abas do aplicativo."""
-    # 🚨 PASSO 1: INJETAR O CSS PERSONALIZADO (APLICA O TRUQUE DE RESPONSIVIDADE)
-    st.markdown(f"<style>{CUSTOM_CSS}</style>", unsafe_allow_html=True)
-    
-    # Configuração de Página
-    st.set_page_config(page_title="Controle Automotivo", layout="wide") 
-    st.title("🚗 Sistema de Controle Automotivo")
-
-    # Inicialização do State
-    if 'edit_service_id' not in st.session_state:
-        st.session_state['edit_service_id'] = None
-    if 'edit_vehicle_id' not in st.session_state:
-        st.session_state['edit_vehicle_id'] = None
-    if 'edit_prestador_id' not in st.session_state:
-        st.session_state['edit_prestador_id'] = None
-
-    # Abas
-    tab_resumo, tab_historico, tab_cadastro = st.tabs(["📊 Resumo de Gastos", "📈 Histórico Detalhado", "➕ Cadastro e Manutenção"])
-
-    # ----------------------------------------------------
-    # 1. DASHBOARD: RESUMO DE GASTOS
-    # ----------------------------------------------------
-    with tab_resumo:
-        st.header("Resumo de Gastos por Veículo")
-
-        # ALTERAÇÃO: Usa a função de JOIN para obter os dados
-        df_merged = get_full_service_data()
-
-        if not df_merged.empty:
-            # Usa o DataFrame completo para o resumo
-            df_resumo_raw = df_merged[['Veículo', 'Valor']].copy()
-            
-            # Não precisa converter novamente, o Valor já é float do get_full_service_data
-            
-            resumo = df_resumo_raw.groupby('Veículo')['Valor'].sum().sort_values(ascending=False).reset_index()
-            resumo.columns = ['Veículo', 'Total Gasto em Serviços']
-            
-            # Formata para R$
-            resumo['Total Gasto em Serviços'] = resumo['Total Gasto em Serviços'].apply(lambda x: f'R$ {x:,.2f}'.replace('.', 'X').replace(',', '.').replace('X', ','))
-            
-            st.dataframe(resumo, hide_index=True, width='stretch')
-            
-        else:
-            st.info("Nenhum dado de serviço encontrado para calcular o resumo.")
-
-    # ----------------------------------------------------
-    # 2. DASHBOARD: HISTÓRICO DETALHADO
-    # ----------------------------------------------------
-    with tab_historico:
-        st.header("Histórico Completo de Serviços")
-        
-        df_historico = get_full_service_data()
-
-        if not df_historico.empty:
-            st.write("### Tabela Detalhada de Serviços")
-            
-            # 🛑 CORREÇÃO FINAL DE TIPO 🛑
-            # 1. Força a conversão e trata NaT em ambas as colunas de data.
-            #    Isso resolve o erro persistente do .dt accessor.
-            df_historico['data_vencimento'] = pd.to_datetime(df_historico['data_vencimento'], errors='coerce').fillna(pd.Timestamp(date.today()))
-            df_historico['Data'] = pd.to_datetime(df_historico['Data'], errors='coerce').fillna(pd.Timestamp(date.today()))
-            
-            # FIM DA CORREÇÃO DE TIPO
-            # -------------------------------------------------------------------------------------
-
-            # CORREÇÃO DA LINHA DO ERRO (AGORA SEGURO):
-            # Subtrai o Timestamp da data de hoje de um Series de Timestamp.
-            # O resultado é uma Timedelta Series, que suporta .dt.days
-            df_historico['Dias para Vencer'] = (df_historico['data_vencimento'] - pd.to_datetime(date.today())).dt.days
-            
-            # Formatação de colunas
-            df_historico['Data Serviço'] = df_historico['Data'].dt.strftime('%d-%m-%Y')
-            df_historico['Data Vencimento'] = df_historico['data_vencimento'].dt.strftime('%d-%m-%Y')
-            
-            # O valor já é float, basta formatar.
-            df_historico['Valor'] = df_historico['Valor'].apply(lambda x: f'R$ {x:,.2f}'.replace('.', 'X').replace(',', '.').replace('X', ','))
-            
-            # Seleção final das colunas
-            df_historico_display = df_historico[[
-                'Veículo', 'Serviço', 'Empresa', 'Data Serviço', 'Data Vencimento', 
-                'Dias para Vencer', 'Cidade', 'Valor', 'km_realizado', 'km_proxima_revisao'
-            ]].rename(columns={
-                'km_realizado': 'KM Realizado', 'km_proxima_revisao': 'KM Próxima Revisão'
-            })
-            
-            st.dataframe(df_historico_display, width='stretch', hide_index=True)
-            
-        else:
-            st.info("Nenhum serviço encontrado. Por favor, cadastre um serviço na aba 'Cadastro'.")
-
-    # ----------------------------------------------------
-    # 3. CADASTRO / MANUTENÇÃO UNIFICADA
-    # ----------------------------------------------------
-    with tab_cadastro:
-        st.header("Gestão de Dados (Cadastro e Edição)")
-        
-        if 'cadastro_choice_unificado' not in st.session_state:
-            st.session_state.cadastro_choice_unificado = "Veículo" 
-            
-        choice = st.radio("Selecione a Tabela para Gerenciar:", ["Veículo", "Prestador", "Serviço"], horizontal=True, key='cadastro_choice_unificado')
-        st.markdown("---")
-
-        if choice == "Veículo":
-            manage_vehicle_form()
-        elif choice == "Prestador":
-            manage_prestador_form()
-        elif choice == "Serviço":
-            manage_service_form()
-
-if __name__ == '__main__':
-
-    main()
+import streamlit as st
+import pandas as pd
+from datetime import date, datetime, timedelta
+import time
+import os
+import re
+import collections
+import contextlib
+import functools
+import weakref
+import concurrent.futures
+import hashlib
+import json
+import sqlite3
+import threading
+import uuid
+import requests
+import gspread # Biblioteca para Google Sheets
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+# Copy-on-write do pandas: DataFrames derivados compartilham os dados até que um deles seja alterado,
+# e só então a coluna alterada é copiada. É o que permite entregar os snapshots em cache sem cópia.
+pd.set_option('mode.copy_on_write', True)
+
+# ==============================================================================
+# 🚨 INSTRUMENTAÇÃO DE DESEMPENHO 🚨
+# ==============================================================================
+
+PERF_BUFFER_SIZE = 5000 # Medições guardadas; as mais antigas são descartadas
+PERF_RUNS_KEPT = 100 # Execuções do script (reruns) resumidas no painel
+PERF_ADMIN_KEY = os.environ.get('PERF_ADMIN_KEY') # A aba de diagnóstico aparece com ?admin=<chave>; sem a variável, nunca aparece
+
+
+class PerfRecorder:
+    """Medições de tempo (spans) e contadores de eventos do processo, num buffer circular limitado.
+
+    Os percentis saem das medições no buffer; as contagens e somas por span são acumuladas desde
+    a partida do processo. Eventos da thread de uma execução do script também são somados no
+    resumo dessa execução (ver `rerun`).
+    """
+
+    def __init__(self, size, runs_kept):
+        self._spans = collections.deque(maxlen=size) # (span, instante, duração em ms)
+        self._totals = collections.defaultdict(lambda: [0, 0.0]) # {span: [contagem, soma em ms]}
+        self._counters = collections.Counter()
+        self._runs = collections.deque(maxlen=runs_kept)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._spans.append((name, time.time(), elapsed))
+                self._totals[name][0] += 1
+                self._totals[name][1] += elapsed
+
+    def count(self, name, n=1):
+        if not n:
+            return
+        with self._lock:
+            self._counters[name] += n
+        run = getattr(self._local, 'run', None)
+        if run is not None:
+            run['counts'][name] += n
+
+    @contextlib.contextmanager
+    def rerun(self):
+        """Delimita uma execução do script: duração total e eventos da thread nessa execução."""
+        run = {'started': time.time(), 'counts': collections.Counter()}
+        self._local.run = run
+        try:
+            with self.span('render.total'):
+                yield
+        finally:
+            self._local.run = None
+            run['ms'] = (time.time() - run['started']) * 1000
+            with self._lock:
+                self._runs.append(run)
+
+    def summary(self):
+        """DataFrame por span: contagem no buffer, p50, p95, máximo e total (ms)."""
+        with self._lock:
+            spans = pd.DataFrame(list(self._spans), columns=['span', 'at', 'ms'])
+        if spans.empty:
+            return pd.DataFrame(columns=['span', 'count', 'p50_ms', 'p95_ms', 'max_ms', 'total_ms'])
+        ms = spans.groupby('span')['ms']
+        return pd.DataFrame({
+            'count': ms.size(), 'p50_ms': ms.quantile(0.5), 'p95_ms': ms.quantile(0.95),
+            'max_ms': ms.max(), 'total_ms': ms.sum(),
+        }).round(2).reset_index()
+
+    def runs(self):
+        """DataFrame com as últimas execuções do script: início, duração e eventos contados."""
+        with self._lock:
+            runs = list(self._runs)
+        return pd.DataFrame([
+            {'início': pd.Timestamp(run['started'], unit='s'), 'ms': round(run['ms'], 1), **run['counts']}
+            for run in reversed(runs)
+        ]).fillna(0)
+
+    def to_json(self, extra=None):
+        with self._lock:
+            totals = {name: {'count': count, 'sum_ms': round(total, 3)} for name, (count, total) in self._totals.items()}
+            counters = dict(self._counters)
+        return json.dumps({
+            'generated_at': time.time(), 'spans': self.summary().to_dict('records'), 'span_totals': totals,
+            'counters': counters, 'runs': self.runs().astype({'início': str}).to_dict('records') if self._runs else [],
+            **(extra or {}),
+        }, default=str, indent=2)
+
+    def to_prometheus(self, extra_counters=None):
+        """Texto no formato de exposição do Prometheus (percentis do buffer, totais acumulados)."""
+        summary = self.summary().set_index('span')
+        with self._lock:
+            totals = {name: tuple(values) for name, values in self._totals.items()}
+            counters = dict(self._counters)
+        lines = ['# TYPE movdrive_span_ms summary']
+        for name, (count, total) in sorted(totals.items()):
+            if name in summary.index:
+                for quantile, col in (('0.5', 'p50_ms'), ('0.95', 'p95_ms')):
+                    lines.append(f'movdrive_span_ms{{span="{name}",quantile="{quantile}"}} {summary.at[name, col]}')
+            lines.append(f'movdrive_span_ms_sum{{span="{name}"}} {round(total, 3)}')
+            lines.append(f'movdrive_span_ms_count{{span="{name}"}} {count}')
+        lines.append('# TYPE movdrive_events_total counter')
+        for name, value in sorted({**counters, **(extra_counters or {})}.items()):
+            lines.append(f'movdrive_events_total{{event="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+@st.cache_resource # Um único registro de medições por processo, compartilhado entre as sessões
+def get_perf():
+    return PerfRecorder(PERF_BUFFER_SIZE, PERF_RUNS_KEPT)
+
+def perf_span(name):
+    """Mede o bloco `with` como um span `name`."""
+    return get_perf().span(name)
+
+def timed(name):
+    """Decorador: mede cada chamada da função como um span `name`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_perf().span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# ==============================================================================
+# 🚨 CONFIGURAÇÃO GOOGLE SHEETS E CONEXÃO 🚨
+# ==============================================================================
+
+# Defina a URL ou ID da sua planilha AQUI
+SHEET_ID = '1BNjgWhvEj8NbnGr4x7F42LW7QbQiG5kZ1FBhfr9Q-4g' # <--- SUBSTITUA PELO SEU SHEET ID REAL!
+
+# Backend de armazenamento: 'sheets' (Google Sheets) ou 'sqlite' (banco local, útil para testes offline)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'sheets')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'movdrive.db')
+
+# Frescor das leituras (feitas em segundo plano, ver SheetCache): 'ttl' relê as abas vencidas a cada
+# SHEET_CACHE_TTL segundos; 'version' primeiro consulta os contadores de versão da aba/tabela META_TABLE
+# e só relê as abas que mudaram. Os contadores só avançam com as escritas feitas pelo app: uma edição feita
+# direto na planilha não muda a versão, e só aparece na releitura completa a cada SHEET_VERSION_MAX_AGE segundos
+FRESHNESS_MODE = os.environ.get('FRESHNESS_MODE', 'ttl')
+META_TABLE = '_meta'
+# Prefixo das abas só de acréscimos que reservam os IDs novos no Google Sheets, uma por tabela
+# (ver GoogleSheetsBackend._allocate_ids)
+ID_LOG_PREFIX = '_ids_'
+ID_LOG_BLOCK = 20 # IDs reservados por linha da aba de reserva (gravado na linha 1 quando a aba é criada)
+ID_LOG_ATTEMPTS = 3 # Tentativas de reserva quando a conferência mostra linhas gravadas por outro processo
+
+# Colunas de cada aba/tabela, na ordem dos cabeçalhos da planilha
+TABLE_COLUMNS = {
+    'veiculo': ['id_veiculo', 'nome', 'placa', 'ano', 'valor_pago', 'data_compra'],
+    'prestador': [
+        'id_prestador', 'empresa', 'telefone', 'nome_prestador', 'cnpj', 'email',
+        'endereco', 'numero', 'cidade', 'bairro', 'cep'
+    ],
+    'servico': [
+        'id_servico', 'id_veiculo', 'id_prestador', 'nome_servico', 'data_servico',
+        'garantia_dias', 'valor', 'km_realizado', 'km_proxima_revisao', 'registro', 'data_vencimento'
+    ],
+}
+ID_COLUMNS = {'veiculo': 'id_veiculo', 'prestador': 'id_prestador', 'servico': 'id_servico'}
+
+# Tipo de cada coluna, aplicado uma única vez na leitura (apply_table_schema); as etapas seguintes
+# (JOIN, índices, agregados, telas) confiam nesses tipos e não convertem de novo.
+#   'id'/'int': int32 (vazio -> 0)   'year': Int32 anulável   'money': float64 (vazio -> 0.0)
+#   'date': datetime64 (inválida -> NaT)   'category': categórica (textos repetidos)   'text': str (vazio -> '')
+TABLE_SCHEMAS = {
+    'veiculo': {
+        'id_veiculo': 'id', 'nome': 'category', 'placa': 'category', 'ano': 'year',
+        'valor_pago': 'money', 'data_compra': 'date',
+    },
+    'prestador': {
+        'id_prestador': 'id', 'empresa': 'category', 'telefone': 'text', 'nome_prestador': 'text', 'cnpj': 'text',
+        'email': 'text', 'endereco': 'text', 'numero': 'text', 'cidade': 'category', 'bairro': 'text', 'cep': 'text',
+    },
+    'servico': {
+        'id_servico': 'id', 'id_veiculo': 'id', 'id_prestador': 'id', 'nome_servico': 'text', 'data_servico': 'date',
+        'garantia_dias': 'int', 'valor': 'money', 'km_realizado': 'int', 'km_proxima_revisao': 'int',
+        'registro': 'text', 'data_vencimento': 'date',
+    },
+}
+
+# Cota da API do Sheets: 60 requisições por minuto por usuário (a conta de serviço). O limitador
+# espaça as chamadas de todas as sessões do processo; as que ainda assim recebem 429 são repetidas.
+SHEETS_RATE_PER_MINUTE = int(os.environ.get('SHEETS_RATE_PER_MINUTE', '60'))
+SHEETS_RATE_BURST = 10 # Chamadas que podem sair de uma vez depois de um período ocioso
+SHEETS_MAX_ATTEMPTS = 6 # Tentativas por chamada (a primeira + 5 repetições)
+SHEETS_MAX_BACKOFF = 32 # Teto, em segundos, da espera aleatória entre tentativas
+
+
+class TokenBucket:
+    """Limitador de taxa: `rate` fichas por segundo, acumulando no máximo `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Retira uma ficha, esperando a vez se o balde estiver vazio. Retorna os segundos esperados.
+
+        A ficha é reservada dentro do lock (o saldo pode ficar negativo) e a espera acontece fora
+        dele: quem chega depois espera mais, na ordem de chegada, sem bloquear as contas dos demais.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class ApiMetrics:
+    """Contadores das chamadas à API do Sheets feitas pelo processo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'calls': 0, 'throttled': 0, 'retried': 0, 'failed': 0}
+        self._throttle_seconds = 0.0
+        self._last = {} # {'throttled'/'retried'/'failed': instante do último evento}
+        self._last_error = None
+
+    def record(self, event, waited=0.0, error=None):
+        with self._lock:
+            self._counts[event] += 1
+            self._throttle_seconds += waited
+            if event != 'calls':
+                self._last[event] = time.time()
+            if error is not None:
+                self._last_error = str(error)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts, throttle_seconds=round(self._throttle_seconds, 3),
+                        last_event_at=dict(self._last), last_error=self._last_error)
+
+
+@st.cache_resource # Um único limitador por processo, compartilhado entre as sessões e threads
+def get_sheets_limiter():
+    return TokenBucket(SHEETS_RATE_PER_MINUTE / 60, SHEETS_RATE_BURST)
+
+@st.cache_resource
+def get_api_metrics():
+    return ApiMetrics()
+
+
+def _is_retryable(error, method):
+    """429 (cota) é sempre repetido: a requisição foi recusada sem efeito. Erros 5xx, timeouts e
+    falhas de conexão só são repetidos em leituras (GET): uma escrita pode ter sido aplicada antes
+    da falha, e repeti-la duplicaria um append ou apagaria outra linha."""
+    if isinstance(error, gspread.exceptions.APIError):
+        return error.code == 429 or (method.upper() == 'GET' and (error.code >= 500 or error.code == 408))
+    return method.upper() == 'GET' and isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class ThrottledHTTPClient(gspread.http_client.HTTPClient):
+    """Cliente HTTP do gspread por onde passa toda chamada à API: limite de taxa e novas tentativas."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limiter = get_sheets_limiter()
+        self.metrics = get_api_metrics()
+        self.perf = get_perf()
+
+    def request(self, method, endpoint, *args, **kwargs):
+        def on_retry(retry_state):
+            self.metrics.record('retried', error=retry_state.outcome.exception())
+
+        retrying = Retrying(
+            retry=retry_if_exception(lambda error: _is_retryable(error, method)),
+            wait=wait_random_exponential(multiplier=1, max=SHEETS_MAX_BACKOFF), # Espera exponencial com jitter
+            stop=stop_after_attempt(SHEETS_MAX_ATTEMPTS),
+            before_sleep=on_retry,
+            reraise=True,
+        )
+        try:
+            for attempt in retrying:
+                with attempt:
+                    waited = self.limiter.acquire()
+                    self.metrics.record('calls')
+                    self.perf.count('sheets.api_calls')
+                    if waited:
+                        self.metrics.record('throttled', waited=waited)
+                    with self.perf.span(f'sheets.api.{method.lower()}'):
+                        return super().request(method, endpoint, *args, **kwargs)
+        except Exception as e:
+            self.metrics.record('failed', error=e)
+            raise
+
+
+@st.cache_resource(ttl=3600) # Cache para a conexão não abrir a cada execução
+def get_gspread_client():
+    """Retorna o cliente Gspread autenticado."""
+    try:
+        # Tenta carregar as credenciais do Streamlit Secrets
+        creds_info = st.secrets["gcp_service_account"]
+        gc = gspread.service_account_from_dict(creds_info, http_client=ThrottledHTTPClient)
+        return gc
+    except KeyError:
+        st.error("⚠️ Credenciais do Google Sheets não encontradas. Certifique-se de que o 'gcp_service_account' está configurado em .streamlit/secrets.toml.")
+        st.stop()
+    except Exception as e:
+        # Este erro agora é mais específico para problemas na chave (Base64/Padding)
+        st.error(f"Erro de autenticação Gspread. Verifique seu ID da planilha e o compartilhamento com a Service Account: {e}")
+        st.stop()
+
+HANDLE_CACHE_TTL = 600 # Os handles só guardam metadados (IDs da planilha/aba), não os dados
+
+@st.cache_resource(ttl=HANDLE_CACHE_TTL) # Evita um open_by_key (chamada de metadados) a cada leitura/escrita
+@timed('sheets.open_by_key') # Só mede as chamadas reais (fora do cache)
+def get_spreadsheet(sheet_id):
+    """Retorna o handle da planilha, em cache por sheet id."""
+    return get_gspread_client().open_by_key(sheet_id)
+
+@st.cache_resource(ttl=HANDLE_CACHE_TTL) # Evita um sh.worksheet (chamada de metadados) a cada leitura/escrita
+@timed('sheets.worksheet')
+def get_worksheet(sheet_id, sheet_name):
+    """Retorna o handle de uma aba, em cache por (sheet id, aba).
+
+    Uma aba inexistente levanta WorksheetNotFound, e exceções não entram no cache.
+    """
+    return get_spreadsheet(sheet_id).worksheet(sheet_name)
+
+def invalidate_sheet_handles(sheet_id, sheet_name=None):
+    """Descarta os handles em cache da planilha (e de uma aba, ou de todas)."""
+    if sheet_name is None:
+        get_worksheet.clear()
+    else:
+        get_worksheet.clear(sheet_id, sheet_name)
+    get_spreadsheet.clear(sheet_id)
+
+def show_api_status():
+    """Avisa no topo da página quando as chamadas ao Google Sheets estão sendo espaçadas ou repetidas."""
+    metrics = get_api_metrics().snapshot()
+    recent = [event for event, at in metrics['last_event_at'].items() if time.time() - at < 60]
+    if 'failed' in recent:
+        st.warning(f"⚠️ Falha ao acessar o Google Sheets após novas tentativas: {metrics['last_error']}")
+    elif recent:
+        st.caption(
+            f"⏳ Google Sheets no limite de uso: {metrics['throttled']} chamada(s) aguardaram a vez e "
+            f"{metrics['retried']} foram repetidas. As operações ficam mais lentas, mas continuam."
+        )
+
+# ==============================================================================
+# 🚨 BACKENDS DE ARMAZENAMENTO (GOOGLE SHEETS / SQLITE) 🚨
+# ==============================================================================
+
+def _to_cell_value(value):
+    """Converte um valor do Pandas/NumPy para um tipo simples aceito pelo Sheets e pelo SQLite."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    if isinstance(value, (pd.Timestamp, date)):
+        return value.strftime('%Y-%m-%d')
+    if hasattr(value, 'item'): # Escalares NumPy (int64, float64...) não são serializáveis em JSON
+        return value.item()
+    return value
+
+
+def row_version(sheet_name, row):
+    """Versão de uma linha: hash do seu conteúdo, normalizado pelo esquema da tabela.
+
+    A mesma linha dá a mesma versão lida do cache (já tipada) ou crua do backend, então a versão
+    vista pelo usuário ao abrir uma edição pode ser conferida com a linha atual antes de gravar.
+    """
+    typed = apply_table_schema(sheet_name, pd.DataFrame([row])).iloc[0]
+    values = [_to_cell_value(typed[col]) if col in typed.index else '' for col in TABLE_COLUMNS[sheet_name]]
+    return hashlib.sha1(json.dumps(values, default=str).encode()).hexdigest()[:16]
+
+
+@st.cache_resource # Uma única classe por processo (ver WriteConflictError abaixo)
+def _write_conflict_error_class():
+    class WriteConflictError(Exception):
+        """A linha mudou (ou foi excluída) no backend depois de lida: a escrita é recusada para não sobrescrever outra edição."""
+
+        def __init__(self, sheet_name, id_value, deleted=False):
+            self.deleted = deleted
+            action = 'excluído' if deleted else 'alterado'
+            super().__init__(
+                f"O registro ID {int(id_value)} de '{sheet_name}' foi {action} por outra pessoa depois que você o abriu. "
+                "Confira os dados atuais antes de repetir a operação."
+            )
+    return WriteConflictError
+
+# O Streamlit re-executa o script a cada interação e recria as classes, mas o backend em cache lança a
+# exceção da execução em que foi criado: com a classe criada uma só vez, o `except` sempre a reconhece
+WriteConflictError = _write_conflict_error_class()
+
+
+class StorageBackend:
+    """Interface comum dos backends de armazenamento.
+
+    As leituras devolvem uma lista de dicionários (como o `get_all_records` do gspread);
+    as conversões de tipo continuam centralizadas em `get_sheet_data`.
+    """
+
+    def read_table(self, sheet_name):
+        """Retorna todos os registros da tabela como lista de dicionários."""
+        raise NotImplementedError
+
+    def read_tables(self, sheet_names):
+        """Lê várias tabelas de uma vez. Retorna {tabela: registros}.
+
+        Backends remotos sobrescrevem este método para buscar tudo numa única requisição.
+        """
+        return {sheet_name: self.read_table(sheet_name) for sheet_name in sheet_names}
+
+    def write_table(self, sheet_name, df):
+        """Sobrescreve a tabela inteira com o DataFrame informado."""
+        raise NotImplementedError
+
+    def insert_row(self, sheet_name, data, id_col):
+        """Insere uma linha. Usa o ID de `data[id_col]` se for positivo; senão atribui o próximo ID.
+
+        Retorna o ID da linha inserida.
+        """
+        raise NotImplementedError
+
+    def insert_rows(self, sheet_name, rows, id_col):
+        """Insere várias linhas de uma vez (mesma regra de IDs de `insert_row`). Retorna a lista de IDs."""
+        return [self.insert_row(sheet_name, row, id_col) for row in rows]
+
+    def reserve_ids(self, sheet_name, count):
+        """Reserva `count` IDs novos da tabela, sem repetição entre processos. Retorna a lista de IDs.
+
+        É a mesma reserva de `insert_row` sem ID: um ID reservado aqui e inserido depois como ID
+        explícito nunca é entregue a outra inserção.
+        """
+        raise NotImplementedError
+
+    def existing_ids(self, sheet_name, id_col, ids):
+        """Retorna o conjunto dos IDs de `ids` que já existem na tabela."""
+        wanted = {int(v) for v in ids}
+        return {int(row[id_col]) for row in self.read_table(sheet_name) if str(row.get(id_col, '')).isdigit() and int(row[id_col]) in wanted}
+
+    def update_row(self, sheet_name, id_col, id_value, data, expected_version=None):
+        """Atualiza as colunas de `data` na linha do ID. Retorna True se a linha existia.
+
+        Com `expected_version` (ver `row_version`), só grava se a linha ainda tiver essa versão;
+        senão lança WriteConflictError.
+        """
+        raise NotImplementedError
+
+    def delete_row(self, sheet_name, id_col, id_value, expected_version=None):
+        """Remove a linha do ID. Retorna True se a linha existia (mesma regra de `expected_version` de `update_row`)."""
+        raise NotImplementedError
+
+    def read_versions(self):
+        """Retorna {tabela: versão} de META_TABLE, ou None se o backend não mantém versões.
+
+        Cada escrita muda a versão da tabela escrita; quem lê compara apenas por igualdade.
+        """
+        return None
+
+
+def _evict_handles_on_api_error(method):
+    """Se a API recusar a operação (aba apagada/renomeada, planilha inacessível), descarta os handles em cache."""
+    @functools.wraps(method)
+    def wrapper(self, sheet_name, *args, **kwargs):
+        try:
+            return method(self, sheet_name, *args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            if e.code in (400, 403, 404):
+                invalidate_sheet_handles(self.sheet_id, sheet_name)
+                self._headers.pop(sheet_name, None)
+                self._row_maps.pop(sheet_name, None)
+            raise
+    return wrapper
+
+
+class GoogleSheetsBackend(StorageBackend):
+    """Backend que lê e grava diretamente nas abas da planilha do Google Sheets."""
+
+    def __init__(self, sheet_id, track_versions=False):
+        self.sheet_id = sheet_id
+        self.track_versions = track_versions # Mantém a aba META_TABLE atualizada a cada escrita
+        self._headers = {} # Cabeçalho (linha 1) de cada aba, para montar as linhas na ordem certa
+        self._row_maps = {} # {aba: {id: número da linha na planilha}}, para edições de uma única linha
+        self._id_logs = {} # {aba: (base, IDs por linha) da aba de reserva (linha 1)}, lidos uma vez
+        self._free_ids = {} # {aba: IDs já reservados por este processo e ainda não usados}
+        # Serializa as escritas do processo: uma exclusão desloca as linhas seguintes do mapa
+        self._lock = threading.RLock()
+
+    def _worksheet(self, sheet_name, fresh=False):
+        """Retorna o handle em cache da aba; `fresh=True` busca metadados atuais (ex.: número de linhas)."""
+        if fresh:
+            return get_spreadsheet(self.sheet_id).worksheet(sheet_name)
+        return get_worksheet(self.sheet_id, sheet_name)
+
+    def _header(self, worksheet, sheet_name):
+        if not self._headers.get(sheet_name):
+            self._headers[sheet_name] = worksheet.row_values(1)
+        return self._headers[sheet_name]
+
+    def _set_row_map(self, sheet_name, ids, first_row=2):
+        """Reconstrói o mapa id -> linha a partir dos IDs na ordem da planilha (a linha 1 é o cabeçalho)."""
+        ids = pd.to_numeric(pd.Series(ids, dtype=object), errors='coerce')
+        self._row_maps[sheet_name] = {int(v): first_row + i for i, v in enumerate(ids) if pd.notna(v)}
+
+    def _locate_row(self, worksheet, sheet_name, id_col, id_value):
+        """Retorna a linha do ID na planilha, confirmando a célula de ID antes de gravar.
+
+        Se o mapa estiver desatualizado (edição feita por outro processo), relê apenas a coluna de ID.
+        """
+        id_col_number = self._header(worksheet, sheet_name).index(id_col) + 1
+        row = self._row_maps.get(sheet_name, {}).get(int(id_value))
+        if row is not None and str(worksheet.cell(row, id_col_number).value) == str(int(id_value)):
+            return row
+
+        self._set_row_map(sheet_name, worksheet.col_values(id_col_number)[1:])
+        return self._row_maps[sheet_name].get(int(id_value))
+
+    @_evict_handles_on_api_error
+    def existing_ids(self, sheet_name, id_col, ids):
+        # Uma única leitura da coluna de ID (que também atualiza o mapa id -> linha)
+        with self._lock:
+            worksheet = self._worksheet(sheet_name)
+            header = self._header(worksheet, sheet_name)
+            if id_col not in header:
+                return set()
+            self._set_row_map(sheet_name, worksheet.col_values(header.index(id_col) + 1)[1:])
+            return {int(v) for v in ids} & set(self._row_maps[sheet_name])
+
+    def _check_row_version(self, worksheet, sheet_name, row, id_value, expected_version):
+        """Relê a linha e lança WriteConflictError se ela não tiver mais a versão esperada.
+
+        A API do Sheets não tem escrita condicional: entre processos resta a janela de uma chamada
+        entre esta conferência e a gravação. Entre as sessões deste processo, o lock a elimina.
+        """
+        if expected_version is None:
+            return
+        if row is None:
+            raise WriteConflictError(sheet_name, id_value, deleted=True)
+        header = self._header(worksheet, sheet_name)
+        values = worksheet.row_values(row)[:len(header)] # Como em _to_records: texto, tipado por apply_table_schema
+        current = dict(zip(header, values + [''] * (len(header) - len(values))))
+        if row_version(sheet_name, current) != expected_version:
+            raise WriteConflictError(sheet_name, id_value)
+
+    def _read_id_log(self, worksheet, sheet_name, id_col):
+        """Retorna (base, IDs por linha) da aba de reserva (linha 1: base, B1; bloco, D1), criando-a no primeiro uso."""
+        if sheet_name in self._id_logs:
+            return self._id_logs[sheet_name]
+        try:
+            first_row = self._worksheet(ID_LOG_PREFIX + sheet_name).row_values(1)
+        except gspread.WorksheetNotFound:
+            first_row = self._create_id_log(worksheet, sheet_name, id_col)
+        if len(first_row) < 2 or first_row[1] in (None, ''):
+            raise RuntimeError('A reserva de IDs está sendo criada por outro processo. Tente novamente.')
+        # Abas de reserva criadas antes dos blocos não têm D1: continuam com um ID por linha
+        block = int(first_row[3]) if len(first_row) >= 4 and str(first_row[3]).isdigit() else 1
+        self._id_logs[sheet_name] = (int(first_row[1]), block)
+        return self._id_logs[sheet_name]
+
+    def _create_id_log(self, worksheet, sheet_name, id_col):
+        """Cria a aba de reserva com a base = maior ID existente na aba de dados. Retorna a linha 1 gravada."""
+        header = self._header(worksheet, sheet_name)
+        base = 0
+        if id_col in header:
+            ids = pd.to_numeric(pd.Series(worksheet.col_values(header.index(id_col) + 1)[1:], dtype=object), errors='coerce')
+            base = int(ids.max()) if ids.notna().any() else 0
+        log_name = ID_LOG_PREFIX + sheet_name
+        try:
+            log = get_spreadsheet(self.sheet_id).add_worksheet(log_name, rows=1, cols=4)
+        except gspread.exceptions.APIError:
+            # Outro processo criou a aba antes: vale a linha 1 gravada por ele
+            invalidate_sheet_handles(self.sheet_id, log_name)
+            return self._worksheet(log_name).row_values(1)
+        first_row = ['base', base, 'bloco', ID_LOG_BLOCK]
+        log.update([first_row], 'A1')
+        invalidate_sheet_handles(self.sheet_id, log_name)
+        return first_row
+
+    def _allocate_ids(self, worksheet, sheet_name, id_col, count):
+        """Reserva `count` IDs novos da aba, sem repetição mesmo entre processos diferentes.
+
+        Ler o maior ID e somar 1 deixa dois processos escolherem o mesmo ID. Aqui cada linha acrescentada
+        (append) na aba de reserva da tabela vale um bloco de IDs: a linha r (a partir da 2) reserva de
+        base + (r - 2) * bloco + 1 até base + (r - 1) * bloco. Os IDs do bloco que sobram ficam com
+        este processo para as próximas inserções: a aba cresce uma linha a cada `bloco` IDs, e só uma
+        inserção em cada `bloco` vai à aba de reserva. Os que sobrarem num reinício viram lacunas, e
+        processos diferentes gravam IDs de blocos diferentes (a ordem dos IDs não é a ordem de inserção).
+
+        Premissa: a API do Sheets serializa os appends de uma aba e cada um recebe as linhas logo depois
+        da última com dados, informadas em `updatedRange`. Como a API não tem escrita condicional, a
+        premissa é conferida: cada linha leva um marcador único (coluna B), relido logo depois; se outro
+        processo gravou por cima, a reserva é refeita em linhas novas (até ID_LOG_ATTEMPTS vezes).
+        """
+        if count <= 0:
+            return []
+        free = self._free_ids.setdefault(sheet_name, collections.deque())
+        if len(free) < count:
+            base, block = self._read_id_log(worksheet, sheet_name, id_col)
+            free.extend(self._append_id_blocks(sheet_name, base, block, -(-(count - len(free)) // block)))
+        return [free.popleft() for _ in range(count)]
+
+    def _append_id_blocks(self, sheet_name, base, block, n_rows):
+        """Acrescenta `n_rows` linhas marcadas na aba de reserva e retorna os IDs dos blocos, conferidos."""
+        log_name = ID_LOG_PREFIX + sheet_name
+        for _ in range(ID_LOG_ATTEMPTS):
+            tokens = [uuid.uuid4().hex for _ in range(n_rows)]
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S')
+            response = self._worksheet(log_name).append_rows(
+                [[stamp, token] for token in tokens], value_input_option='RAW', table_range='A1'
+            )
+            updated_range = (response or {}).get('updates', {}).get('updatedRange', '')
+            match = re.search(r'!\D+(\d+)', updated_range)
+            if not match:
+                break
+            written = get_spreadsheet(self.sheet_id).values_get(updated_range).get('values', [])[:n_rows]
+            if [row[1] if len(row) > 1 else '' for row in written] == tokens:
+                first_row = int(match.group(1))
+                return [
+                    base + (row - 2) * block + offset
+                    for row in range(first_row, first_row + n_rows) for offset in range(1, block + 1)
+                ]
+        raise RuntimeError('Não foi possível reservar novos IDs.')
+
+    @_evict_handles_on_api_error
+    def reserve_ids(self, sheet_name, count):
+        with self._lock:
+            return self._allocate_ids(self._worksheet(sheet_name), sheet_name, ID_COLUMNS[sheet_name], count)
+
+    def _bump_version(self, sheet_name):
+        """Grava uma nova versão da aba em META_TABLE (uma linha por tabela, na ordem de TABLE_COLUMNS).
+
+        A versão é um carimbo de tempo gravado às cegas, sem ler o valor anterior: uma única chamada
+        por escrita, e duas escritas concorrentes nunca deixam o contador igual ao que um leitor já viu.
+        """
+        if not self.track_versions:
+            return
+        tables = list(TABLE_COLUMNS)
+        try:
+            meta = self._worksheet(META_TABLE)
+        except gspread.WorksheetNotFound:
+            meta = get_spreadsheet(self.sheet_id).add_worksheet(META_TABLE, rows=len(tables) + 1, cols=2)
+            meta.update([['tabela', 'versao']] + [[table, 0] for table in tables], 'A1')
+            invalidate_sheet_handles(self.sheet_id, META_TABLE)
+        meta.update([[time.time_ns()]], gspread.utils.rowcol_to_a1(tables.index(sheet_name) + 2, 2))
+
+    def read_versions(self):
+        if not self.track_versions:
+            return None
+        try:
+            response = get_spreadsheet(self.sheet_id).values_get(f"'{META_TABLE}'!A2:B")
+        except gspread.exceptions.APIError:
+            return None # Aba de versões ainda não criada (nenhuma escrita desde que o modo foi ligado)
+        return {row[0]: str(row[1]) for row in response.get('values', []) if len(row) >= 2}
+
+    def _to_records(self, sheet_name, values):
+        """Converte a matriz de valores de uma aba (cabeçalho + linhas) em registros, como o get_all_records.
+
+        Os valores ficam como texto: a conversão de tipos é feita depois, coluna a coluna e vetorizada,
+        por apply_table_schema (converter célula a célula aqui custava mais que a leitura inteira).
+        """
+        if not values or not values[0]:
+            return []
+        header = values[0]
+        self._headers[sheet_name] = header
+        rows = [row[:len(header)] for row in gspread.utils.fill_gaps(values[1:], cols=len(header))]
+        records = gspread.utils.to_records(header, rows)
+
+        id_col = ID_COLUMNS.get(sheet_name)
+        if id_col:
+            self._set_row_map(sheet_name, [record.get(id_col) for record in records])
+        return records
+
+    def read_table(self, sheet_name):
+        return self.read_tables([sheet_name])[sheet_name]
+
+    def read_tables(self, sheet_names):
+        # Uma única chamada values:batchGet traz todas as abas pedidas
+        sh = get_spreadsheet(self.sheet_id)
+        try:
+            response = sh.values_batch_get([f"'{sheet_name}'" for sheet_name in sheet_names])
+        except gspread.exceptions.APIError:
+            # Um intervalo inválido derruba o lote inteiro: descarta os handles e identifica a aba que não existe
+            invalidate_sheet_handles(self.sheet_id)
+            for sheet_name in sheet_names:
+                get_worksheet(self.sheet_id, sheet_name) # Lança WorksheetNotFound para a aba ausente
+            raise
+
+        value_ranges = response.get('valueRanges', [])
+        return {
+            sheet_name: self._to_records(sheet_name, value_range.get('values', []))
+            for sheet_name, value_range in zip(sheet_names, value_ranges)
+        }
+
+    @_evict_handles_on_api_error
+    def write_table(self, sheet_name, df):
+        """Reescreve a aba inteira. Uso restrito a migrações de esquema."""
+        worksheet = self._worksheet(sheet_name, fresh=True)
+
+        # Converte o DataFrame para lista de listas, incluindo o cabeçalho
+        data_to_write = [df.columns.tolist()] + [[_to_cell_value(v) for v in row] for row in df.values.tolist()]
+
+        # Sobrescreve a aba a partir de A1 e só depois limpa as sobras (linhas/colunas além dos novos dados),
+        # para que um leitor concorrente nunca encontre a aba vazia
+        worksheet.update(data_to_write, 'A1', value_input_option='USER_ENTERED')
+        n_rows, n_cols = len(data_to_write), len(data_to_write[0])
+        leftovers = []
+        if worksheet.row_count > n_rows:
+            leftovers.append(f"{gspread.utils.rowcol_to_a1(n_rows + 1, 1)}:{gspread.utils.rowcol_to_a1(worksheet.row_count, worksheet.col_count)}")
+        if worksheet.col_count > n_cols:
+            leftovers.append(f"{gspread.utils.rowcol_to_a1(1, n_cols + 1)}:{gspread.utils.rowcol_to_a1(n_rows, worksheet.col_count)}")
+        if leftovers:
+            worksheet.batch_clear(leftovers)
+        self._headers[sheet_name] = df.columns.tolist()
+        self._bump_version(sheet_name)
+
+    def insert_row(self, sheet_name, data, id_col):
+        return self.insert_rows(sheet_name, [data], id_col)[0]
+
+    @_evict_handles_on_api_error
+    def insert_rows(self, sheet_name, rows, id_col):
+        with self._lock:
+            worksheet = self._worksheet(sheet_name)
+            header = self._header(worksheet, sheet_name)
+            rows = [dict(row) for row in rows]
+            if not rows:
+                return []
+
+            # IDs novos vêm da reserva atômica (simulação de AUTO_INCREMENT); IDs explícitos são mantidos
+            pending = [row for row in rows if int(row.get(id_col) or 0) <= 0]
+            for row, new_id in zip(pending, self._allocate_ids(worksheet, sheet_name, id_col, len(pending))):
+                row[id_col] = new_id
+
+            if not header:
+                # Aba sem cabeçalho: cria o cabeçalho junto com as primeiras linhas
+                self.write_table(sheet_name, pd.DataFrame(rows))
+                self._set_row_map(sheet_name, [row[id_col] for row in rows])
+                return [row[id_col] for row in rows]
+
+            # Acrescenta somente as novas linhas ao final da tabela (uma única chamada de append)
+            response = worksheet.append_rows(
+                [[_to_cell_value(row.get(col, '')) for col in header] for row in rows],
+                value_input_option='USER_ENTERED', table_range='A1'
+            )
+            updated_range = (response or {}).get('updates', {}).get('updatedRange', '')
+            match = re.search(r'!\D+(\d+)', updated_range)
+            if match:
+                row_map = self._row_maps.setdefault(sheet_name, {})
+                for offset, row in enumerate(rows):
+                    row_map[int(row[id_col])] = int(match.group(1)) + offset
+            self._bump_version(sheet_name)
+            return [int(row[id_col]) for row in rows]
+
+    @_evict_handles_on_api_error
+    def update_row(self, sheet_name, id_col, id_value, data, expected_version=None):
+        with self._lock:
+            worksheet = self._worksheet(sheet_name)
+            header = self._header(worksheet, sheet_name)
+            row = self._locate_row(worksheet, sheet_name, id_col, id_value)
+            self._check_row_version(worksheet, sheet_name, row, id_value, expected_version)
+            if row is None:
+                return False
+
+            # Agrupa as colunas alteradas em faixas contíguas (ex.: B5:K5) e envia todas numa única chamada
+            changed = sorted((header.index(key) + 1, _to_cell_value(value)) for key, value in data.items() if key in header and key != id_col)
+            if not changed:
+                return False
+            ranges = []
+            for col_number, value in changed:
+                if ranges and ranges[-1]['end'] == col_number - 1:
+                    ranges[-1]['end'] = col_number
+                    ranges[-1]['values'].append(value)
+                else:
+                    ranges.append({'start': col_number, 'end': col_number, 'values': [value]})
+
+            worksheet.batch_update([
+                {
+                    'range': f"{gspread.utils.rowcol_to_a1(row, r['start'])}:{gspread.utils.rowcol_to_a1(row, r['end'])}",
+                    'values': [r['values']],
+                }
+                for r in ranges
+            ], value_input_option='USER_ENTERED')
+            self._bump_version(sheet_name)
+            return True
+
+    @_evict_handles_on_api_error
+    def delete_row(self, sheet_name, id_col, id_value, expected_version=None):
+        with self._lock:
+            worksheet = self._worksheet(sheet_name)
+            row = self._locate_row(worksheet, sheet_name, id_col, id_value)
+            self._check_row_version(worksheet, sheet_name, row, id_value, expected_version)
+            if row is None:
+                return False
+
+            # Uma única requisição de exclusão de linha; as linhas abaixo sobem uma posição
+            worksheet.delete_rows(row)
+            self._row_maps[sheet_name] = {
+                key: (r - 1 if r > row else r) for key, r in self._row_maps[sheet_name].items() if key != int(id_value)
+            }
+            self._bump_version(sheet_name)
+            return True
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS veiculo (
+    id_veiculo INTEGER PRIMARY KEY,
+    nome TEXT, placa TEXT, ano INTEGER, valor_pago REAL, data_compra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_veiculo_placa ON veiculo (placa);
+
+CREATE TABLE IF NOT EXISTS prestador (
+    id_prestador INTEGER PRIMARY KEY,
+    empresa TEXT, telefone TEXT, nome_prestador TEXT, cnpj TEXT, email TEXT,
+    endereco TEXT, numero TEXT, cidade TEXT, bairro TEXT, cep TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_prestador_empresa ON prestador (empresa);
+
+CREATE TABLE IF NOT EXISTS servico (
+    id_servico INTEGER PRIMARY KEY,
+    id_veiculo INTEGER, id_prestador INTEGER, nome_servico TEXT, data_servico TEXT,
+    garantia_dias INTEGER, valor REAL, km_realizado INTEGER, km_proxima_revisao INTEGER,
+    registro TEXT, data_vencimento TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_servico_veiculo ON servico (id_veiculo);
+CREATE INDEX IF NOT EXISTS idx_servico_prestador ON servico (id_prestador);
+
+CREATE TABLE IF NOT EXISTS _meta (
+    tabela TEXT PRIMARY KEY,
+    versao INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS _ids (
+    tabela TEXT PRIMARY KEY,
+    ultimo INTEGER NOT NULL
+);
+"""
+
+
+class SQLiteBackend(StorageBackend):
+    """Backend local em SQLite, com chaves primárias reais e escritas de uma única linha."""
+
+    def __init__(self, path):
+        self.path = path
+        # Uma única conexão compartilhada entre as sessões (threads) do Streamlit, protegida por lock
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SQLITE_SCHEMA)
+
+    def _columns(self, sheet_name, data=None):
+        """Valida o nome da tabela e retorna suas colunas (ou só as presentes em `data`)."""
+        if sheet_name not in TABLE_COLUMNS:
+            raise ValueError(f"Tabela desconhecida: '{sheet_name}'")
+        columns = TABLE_COLUMNS[sheet_name]
+        return columns if data is None else [c for c in columns if c in data]
+
+    def _bump_version(self, sheet_name):
+        # Chamado dentro da transação da escrita: a versão muda junto com os dados, atomicamente
+        self._conn.execute(
+            f'INSERT INTO {META_TABLE} (tabela, versao) VALUES (?, 1) '
+            f'ON CONFLICT (tabela) DO UPDATE SET versao = versao + 1', [sheet_name]
+        )
+
+    def _check_row_version(self, sheet_name, id_col, id_value, expected_version):
+        """Dentro da transação da escrita: lança WriteConflictError se a linha não tiver mais a versão esperada."""
+        if expected_version is None:
+            return
+        # Reserva a escrita antes de ler: nenhum outro processo grava entre a conferência e a escrita
+        self._conn.execute('BEGIN IMMEDIATE')
+        row = self._conn.execute(f'SELECT * FROM {sheet_name} WHERE {id_col} = ?', [int(id_value)]).fetchone()
+        if row is None:
+            raise WriteConflictError(sheet_name, id_value, deleted=True)
+        if row_version(sheet_name, {key: ('' if row[key] is None else row[key]) for key in row.keys()}) != expected_version:
+            raise WriteConflictError(sheet_name, id_value)
+
+    def read_versions(self):
+        with self._lock:
+            rows = self._conn.execute(f'SELECT tabela, versao FROM {META_TABLE}').fetchall()
+        return {row['tabela']: str(row['versao']) for row in rows}
+
+    def read_table(self, sheet_name):
+        self._columns(sheet_name)
+        with self._lock:
+            rows = self._conn.execute(f'SELECT * FROM {sheet_name} ORDER BY {ID_COLUMNS[sheet_name]}').fetchall()
+        # Células vazias voltam como '' (mesmo comportamento do get_all_records)
+        return [{key: ('' if row[key] is None else row[key]) for key in row.keys()} for row in rows]
+
+    def write_table(self, sheet_name, df):
+        columns = self._columns(sheet_name, df.columns)
+        rows = [[_to_cell_value(v) for v in row] for row in df[columns].values.tolist()]
+        with self._lock, self._conn:
+            self._conn.execute(f'DELETE FROM {sheet_name}')
+            self._conn.executemany(
+                f"INSERT INTO {sheet_name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows
+            )
+            self._bump_version(sheet_name)
+
+    def _reserve(self, sheet_name, count):
+        """Dentro da transação: avança o contador de IDs da tabela (em _ids) e retorna os `count` IDs reservados.
+
+        O contador nunca fica abaixo do maior ID da tabela, então vale também para bancos já preenchidos.
+        """
+        if count <= 0:
+            return []
+        (last,) = self._conn.execute(
+            f'INSERT INTO _ids (tabela, ultimo) VALUES (?, (SELECT COALESCE(MAX({ID_COLUMNS[sheet_name]}), 0) FROM {sheet_name}) + ?) '
+            f'ON CONFLICT (tabela) DO UPDATE SET ultimo = MAX(ultimo + ?, excluded.ultimo) RETURNING ultimo',
+            [sheet_name, count, count]
+        ).fetchone()
+        return list(range(last - count + 1, last + 1))
+
+    def reserve_ids(self, sheet_name, count):
+        self._columns(sheet_name)
+        with self._lock, self._conn:
+            return self._reserve(sheet_name, count)
+
+    def _insert(self, sheet_name, data, id_col):
+        columns = self._columns(sheet_name, data)
+        cursor = self._conn.execute(
+            f"INSERT INTO {sheet_name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [_to_cell_value(data[c]) for c in columns]
+        )
+        return cursor.lastrowid
+
+    def insert_row(self, sheet_name, data, id_col):
+        return self.insert_rows(sheet_name, [data], id_col)[0]
+
+    def insert_rows(self, sheet_name, rows, id_col):
+        # Todas as linhas numa única transação. Sem ID positivo, o ID vem do contador de `reserve_ids`
+        # (e não do INTEGER PRIMARY KEY): assim nunca repete um ID reservado e ainda não inserido
+        with self._lock, self._conn:
+            rows = [dict(row) for row in rows]
+            pending = [row for row in rows if int(row.get(id_col) or 0) <= 0]
+            for row, new_id in zip(pending, self._reserve(sheet_name, len(pending))):
+                row[id_col] = new_id
+            ids = [self._insert(sheet_name, row, id_col) for row in rows]
+            if ids:
+                self._bump_version(sheet_name)
+            return ids
+
+    def existing_ids(self, sheet_name, id_col, ids):
+        self._columns(sheet_name)
+        ids = [int(v) for v in ids]
+        if not ids:
+            return set()
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {id_col} FROM {sheet_name} WHERE {id_col} IN ({', '.join('?' * len(ids))})", ids).fetchall()
+        return {row[0] for row in rows}
+
+    def update_row(self, sheet_name, id_col, id_value, data, expected_version=None):
+        columns = [c for c in self._columns(sheet_name, data) if c != id_col]
+        if not columns:
+            return False
+        with self._lock, self._conn:
+            self._check_row_version(sheet_name, id_col, id_value, expected_version)
+            cursor = self._conn.execute(
+                f"UPDATE {sheet_name} SET {', '.join(f'{c} = ?' for c in columns)} WHERE {id_col} = ?",
+                [_to_cell_value(data[c]) for c in columns] + [int(id_value)]
+            )
+            if cursor.rowcount > 0:
+                self._bump_version(sheet_name)
+        return cursor.rowcount > 0
+
+    def delete_row(self, sheet_name, id_col, id_value, expected_version=None):
+        self._columns(sheet_name)
+        with self._lock, self._conn:
+            self._check_row_version(sheet_name, id_col, id_value, expected_version)
+            cursor = self._conn.execute(f'DELETE FROM {sheet_name} WHERE {id_col} = ?', [int(id_value)])
+            if cursor.rowcount > 0:
+                self._bump_version(sheet_name)
+        return cursor.rowcount > 0
+
+
+@st.cache_resource # Um único backend por processo, compartilhado entre as sessões
+def get_backend():
+    """Retorna o backend de armazenamento configurado em STORAGE_BACKEND."""
+    if STORAGE_BACKEND == 'sqlite':
+        return SQLiteBackend(SQLITE_PATH)
+    return GoogleSheetsBackend(SHEET_ID, track_versions=FRESHNESS_MODE == 'version')
+
+
+@timed('schema.coerce')
+def _prepare_sheet_df(sheet_name, data):
+    """Monta o DataFrame de uma aba a partir dos registros lidos, com conversões iniciais."""
+    df = pd.DataFrame(data)
+    if not df.empty:
+        df = apply_table_schema(sheet_name, df)
+    df.attrs['data_version'] = content_version(sheet_name, df)
+    return df
+
+
+def content_version(sheet_name, df):
+    """Versão dos dados de uma aba, derivada do conteúdo já tipado.
+
+    Os índices e visões derivadas são reconstruídos só quando ela muda: reler a mesma tabela
+    (atualização por TTL, cópia em disco) dá a mesma versão e reaproveita o que já foi montado.
+    A ordem das linhas entra no resumo: os índices guardam posições, e a mesma tabela reordenada
+    na planilha precisa de índices novos.
+    """
+    digest = hashlib.blake2b(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes(), digest_size=8).hexdigest()
+    return f'{sheet_name}@{digest}'
+
+
+def apply_table_schema(sheet_name, df):
+    """Converte as colunas de `df` para os tipos de TABLE_SCHEMAS (altera e retorna o próprio DataFrame)."""
+    for col, kind in TABLE_SCHEMAS.get(sheet_name, {}).items():
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if kind in ('id', 'int'):
+            df[col] = pd.to_numeric(values, errors='coerce').fillna(0).astype('int32')
+        elif kind == 'year':
+            df[col] = pd.to_numeric(values, errors='coerce').round().astype('Int32')
+        elif kind == 'money':
+            df[col] = pd.to_numeric(values, errors='coerce').fillna(0.0).astype('float64')
+        elif kind == 'date':
+            df[col] = pd.to_datetime(values, errors='coerce')
+        elif kind == 'category':
+            df[col] = values.astype(object).fillna('').astype(str).astype('category')
+        else:
+            df[col] = values.fillna('').astype(str)
+    return df
+
+
+SHEET_CACHE_TTL = 5 # Segundos de validade de cada aba em cache (depois disso é servida e atualizada em segundo plano)
+SHEET_REFRESH_IDLE_AFTER = 300 # Segundos sem leituras depois dos quais uma aba deixa de ser atualizada
+SHEET_VERSION_MAX_AGE = 60 # No modo 'version', idade máxima da última leitura completa, mesmo com a versão inalterada
+
+# Cópia local em Parquet de cada aba tipada, regravada em segundo plano quando o conteúdo muda. Um processo
+# novo responde na hora com ela e revalida com o backend em segundo plano. Vazio desativa.
+WARM_CACHE_DIR = os.environ.get('WARM_CACHE_DIR', 'movdrive_cache')
+
+
+class SheetCache:
+    """Leituras tipadas por aba, compartilhadas entre as sessões (stale-while-revalidate).
+
+    Cada aba tem sua própria entrada: uma escrita invalida só a aba escrita, e as abas ausentes
+    de um pedido são buscadas juntas numa única leitura em lote. Uma aba vencida (mais velha que
+    `ttl`) é servida na hora com o último snapshot bom, e uma única thread de atualização do
+    processo a relê em segundo plano, em lote, enquanto houver sessões lendo. Com `check_versions`,
+    a thread só baixa de novo as abas cuja versão no backend (`read_versions`) mudou, ou cuja última
+    leitura completa passou de `max_age`: as versões só mudam com as escritas feitas pelo app, e uma
+    edição direta na planilha só é vista nessa releitura. Com `warm_dir`,
+    a primeira leitura de cada aba no processo vem da cópia em disco e já é revalidada pela thread.
+
+    Uma escrita não descarta o snapshot: só avança a geração da aba, que passa a ser servida como
+    vencida até a releitura. Só bloqueiam na rede a partida a frio sem cópia em disco e a leitura
+    de quem acabou de escrever (ver `own_write_generations`), até ter um snapshot com a própria
+    alteração. Leituras simultâneas da mesma aba são agrupadas numa única requisição.
+    """
+
+    def __init__(self, ttl, check_versions=False, warm_dir=None, idle_after=SHEET_REFRESH_IDLE_AFTER, max_age=SHEET_VERSION_MAX_AGE):
+        self.ttl = ttl
+        self.check_versions = check_versions
+        self.max_age = max_age # Com check_versions: idade máxima da leitura completa, mesmo com a versão inalterada
+        self.warm_dir = warm_dir
+        self.idle_after = idle_after # Sem leituras há mais tempo que isso, a aba deixa de ser atualizada
+        self._warm_tried = set() # Abas cuja cópia em disco já foi consultada (só vale na partida a frio)
+        self._warm_saved = {} # {aba: data_version da cópia em disco}
+        self._warm_pending = {} # {aba: DataFrame lido do backend ainda não gravado em disco}
+        # {aba: (instante da leitura/confirmação, DataFrame tipado, versão no backend, geração da leitura)}
+        self._entries = {}
+        self._loaded_at = {} # {aba: instante da última leitura completa do backend (a confirmação de versão não conta)}
+        self._as_of = {} # {aba: data/hora (time.time) dos dados servidos: leitura ou última confirmação}
+        self._last_read = {} # {aba: instante da última leitura por uma sessão}
+        self._inflight = {} # {aba: (geração, Future)} das leituras em andamento, para agrupar pedidos
+        self._generations = {} # {aba: nº de invalidações}, para descartar leituras que cruzaram uma escrita
+        # Linhagem de cada aba: muda quando a aba é recarregada com conteúdo que os agregados incrementais
+        # não acompanharam (carga fria, escrita de outro processo, migração); releituras idênticas a mantêm
+        self._lineages = {}
+        self._tracked = set() # Abas invalidadas por escritas deste processo já aplicadas por delta
+        self._lock = threading.Lock()
+        self._backend = None # Backend da última leitura de uma sessão, usado pela thread de atualização
+        self.last_refresh_error = None
+        self._wake = threading.Event()
+        # A thread guarda só uma referência fraca: um cache descartado (cache_resource.clear) leva a thread junto
+        self._refresher = threading.Thread(
+            target=SheetCache._run_refresher, args=(weakref.ref(self), self._wake, ttl), name='sheet-cache-refresh', daemon=True
+        )
+        self._refresher.start()
+
+    def lineage(self, sheet_name):
+        with self._lock:
+            return self._lineages.get(sheet_name)
+
+    def is_current(self, sheet_name, df):
+        """True se `df` é o snapshot atual da aba e nenhuma escrita o invalidou desde a leitura."""
+        with self._lock:
+            entry = self._entries.get(sheet_name)
+            return (
+                entry is not None and entry[3] == self._generations.get(sheet_name, 0)
+                and entry[1].attrs.get('data_version') == df.attrs.get('data_version')
+            )
+
+    def as_of(self, sheet_names):
+        """Data/hora (time.time) dos dados mais antigos entre as abas indicadas, ou None se nenhuma foi lida."""
+        with self._lock:
+            stamps = [self._as_of[name] for name in sheet_names if name in self._as_of]
+        return min(stamps) if stamps else None
+
+    def _warm_path(self, sheet_name):
+        return os.path.join(self.warm_dir, f'{sheet_name}.parquet')
+
+    def save_warm(self):
+        """Grava em disco as abas lidas do backend cujo conteúdo mudou (arquivo temporário + rename).
+
+        Chamado pela thread de atualização: a gravação nunca atrasa a leitura de uma sessão.
+        """
+        with self._lock:
+            pending, self._warm_pending = self._warm_pending, {}
+        if not pending:
+            return
+        try:
+            os.makedirs(self.warm_dir, exist_ok=True)
+            for name, df in pending.items():
+                with perf_span('cache.save_warm'):
+                    tmp_path = f'{self._warm_path(name)}.{threading.get_ident()}.tmp'
+                    df.to_parquet(tmp_path, index=False)
+                    os.replace(tmp_path, self._warm_path(name))
+                with self._lock:
+                    self._warm_saved[name] = df.attrs.get('data_version')
+        except Exception:
+            pass # A cópia em disco é só um atalho de partida: sem ela, vale a leitura do backend
+
+    def _load_warm(self, sheet_names):
+        """Na primeira leitura de cada aba no processo, usa a cópia em disco. Retorna {aba: DataFrame}.
+
+        As abas vindas do disco entram no cache já vencidas: a thread de atualização as revalida em seguida.
+        """
+        if not self.warm_dir:
+            return {}
+        with self._lock:
+            names = [name for name in sheet_names if name not in self._warm_tried]
+            self._warm_tried.update(names)
+        frames, saved_at = {}, {}
+        for name in names:
+            try:
+                path = self._warm_path(name)
+                df = pd.read_parquet(path)
+                saved_at[name] = os.path.getmtime(path)
+            except Exception:
+                continue # Sem cópia (ou ilegível): a aba vem do backend
+            df = apply_table_schema(name, df) # A cópia pode ser de um esquema anterior
+            df.attrs['data_version'] = content_version(name, df)
+            frames[name] = df
+        stale_since = time.monotonic() - self.ttl
+        with self._lock:
+            for name, df in frames.items():
+                if name in self._entries: # Uma leitura do backend chegou antes: ela prevalece
+                    frames[name] = self._entries[name][1]
+                else:
+                    self._entries[name] = (stale_since, df, None, self._generations.get(name, 0))
+                    self._warm_saved[name] = df.attrs['data_version']
+                    self._as_of[name] = saved_at[name]
+                    self._lineages[name] = f'{name}@{time.time_ns()}'
+        return frames
+
+    def _load(self, backend, sheet_names, generations, versions):
+        """Lê as abas do backend e guarda as que nenhuma escrita invalidou durante a leitura."""
+        now, wall = time.monotonic(), time.time()
+        with perf_span('backend.read_tables'):
+            records = backend.read_tables(sheet_names)
+        loaded = {name: _prepare_sheet_df(name, records[name]) for name in sheet_names}
+        with self._lock:
+            for name, df in loaded.items():
+                if self._generations.get(name, 0) == generations[name]:
+                    previous = self._entries.get(name)
+                    # Releitura idêntica (ou já acompanhada pelos deltas) mantém a linhagem
+                    unchanged = previous is not None and previous[1].attrs.get('data_version') == df.attrs['data_version']
+                    if name not in self._lineages or not (unchanged or name in self._tracked):
+                        self._lineages[name] = f'{name}@{time.time_ns()}'
+                    self._entries[name] = (now, df, (versions or {}).get(name), generations[name])
+                    self._loaded_at[name] = now
+                    self._as_of[name] = wall
+                    if self.warm_dir and self._warm_saved.get(name) != df.attrs['data_version']:
+                        self._warm_pending[name] = df
+                    self._tracked.discard(name)
+        return loaded
+
+    def _fetch(self, backend, sheet_names, generations, versions=None):
+        """Lê as abas do backend, juntando-se às leituras já em andamento das mesmas abas.
+
+        Uma leitura em andamento só é aproveitada se começou depois da última escrita na aba
+        (mesma geração); senão, quem pediu faria uma leitura anterior à própria escrita.
+        """
+        with self._lock:
+            joined = {}
+            for name in sheet_names:
+                inflight = self._inflight.get(name)
+                if inflight and inflight[0] == generations[name]:
+                    joined[name] = inflight[1]
+            own = [name for name in sheet_names if name not in joined]
+            future = concurrent.futures.Future()
+            for name in own:
+                self._inflight[name] = (generations[name], future)
+
+        frames = {}
+        if own:
+            try:
+                loaded = self._load(backend, own, generations, versions)
+                future.set_result(loaded)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    for name in own:
+                        if self._inflight.get(name, (None, None))[1] is future:
+                            del self._inflight[name]
+            frames.update(loaded)
+        if joined:
+            get_perf().count('cache.coalesced', len(joined))
+        for name, pending in joined.items():
+            frames[name] = pending.result()[name]
+        return frames
+
+    def refresh_stale(self):
+        """Relê, numa única leitura em lote, as abas vencidas (ou escritas) que alguma sessão leu recentemente."""
+        now = time.monotonic()
+        backend = self._backend
+        with self._lock:
+            generations = {name: self._generations.get(name, 0) for name in self._entries}
+            # Leitura completa recente o bastante para confiar na versão (a cópia em disco nunca é)
+            recent = {name for name in self._entries if now - self._loaded_at.get(name, float('-inf')) < self.max_age}
+            stale = {
+                name: entry for name, entry in self._entries.items()
+                if (now - entry[0] >= self.ttl or entry[3] < generations[name]) and now - self._last_read.get(name, 0) < self.idle_after
+            }
+        if not stale or backend is None:
+            return []
+
+        versions = None
+        if self.check_versions:
+            # Sonda de versão (uma chamada leve): só as abas que mudaram são baixadas de novo
+            with perf_span('backend.read_versions'):
+                versions = backend.read_versions()
+        if versions is not None:
+            # Uma aba escrita depois da leitura é sempre relida, mesmo que a sonda tenha vindo antes da escrita
+            unchanged = [
+                name for name, entry in stale.items()
+                if entry[2] == versions.get(name) and entry[3] == generations[name] and name in recent
+            ]
+            wall = time.time()
+            with self._lock:
+                for name in unchanged:
+                    if self._entries.get(name) is stale[name]:
+                        self._entries[name] = (now,) + stale[name][1:]
+                        self._as_of[name] = wall
+            get_perf().count('cache.version_unchanged', len(unchanged))
+            stale = {name: entry for name, entry in stale.items() if name not in unchanged}
+
+        if stale:
+            with perf_span('cache.refresh'):
+                self._fetch(backend, list(stale), generations, versions)
+        return list(stale)
+
+    @staticmethod
+    def _run_refresher(cache_ref, wake, interval):
+        """Thread de atualização: acorda a cada `interval` (ou quando uma sessão encontra uma aba vencida)."""
+        while True:
+            wake.wait(interval)
+            wake.clear()
+            cache = cache_ref()
+            if cache is None:
+                return
+            try:
+                cache.refresh_stale()
+                cache.last_refresh_error = None
+            except Exception as e: # A thread nunca pode morrer: as sessões seguem com o último snapshot bom
+                cache.last_refresh_error = str(e)
+            cache.save_warm()
+            del cache
+
+    def get_many(self, sheet_names):
+        """Retorna {aba: snapshot do DataFrame}; só bloqueia nas abas que ainda não estão no cache
+        e nas que quem chama acabou de escrever (até o snapshot conter a escrita).
+
+        O snapshot compartilha os dados com o cache (e com as outras sessões). Alterá-lo é seguro:
+        pelo copy-on-write do pandas, só a coluna alterada é copiada, e o cache nunca muda.
+        """
+        now = time.monotonic()
+        own_writes = own_write_generations()
+        with self._lock:
+            cached = {name: self._entries.get(name) for name in sheet_names}
+            generations = {name: self._generations.get(name, 0) for name in sheet_names}
+            self._last_read.update((name, now) for name in sheet_names)
+        # Snapshot anterior à escrita de quem chama: precisa da releitura (as outras sessões seguem com ele)
+        behind = [name for name, entry in cached.items() if entry and entry[3] < own_writes.get(name, 0)]
+        frames = {name: entry[1] for name, entry in cached.items() if entry and name not in behind}
+        stale = [name for name in frames if now - cached[name][0] >= self.ttl or cached[name][3] < generations[name]]
+        missing = [name for name in sheet_names if name not in frames and name not in behind]
+        perf = get_perf()
+        perf.count('cache.hit', len(frames) - len(stale))
+        perf.count('cache.stale', len(stale))
+        perf.count('cache.miss', len(missing))
+        perf.count('cache.own_write', len(behind))
+
+        # As outras abas ainda fora do cache vêm junto, na mesma leitura em lote: numa renderização
+        # a frio, as abas pedidas uma a uma custariam uma ida à rede cada
+        extra = []
+        if missing:
+            with self._lock:
+                extra = [name for name in TABLE_COLUMNS if name not in self._entries and name not in self._inflight and name not in sheet_names]
+                generations.update((name, self._generations.get(name, 0)) for name in extra)
+
+        # Partida a frio: responde com a cópia em disco (a thread de atualização a revalida)
+        warm = self._load_warm(missing + extra) if missing else {}
+        if warm:
+            frames.update((name, df) for name, df in warm.items() if name in missing)
+            missing = [name for name in missing if name not in warm]
+            extra = [name for name in extra if name not in warm]
+            perf.count('cache.warm_disk', len(warm))
+        if stale or warm or missing or behind:
+            self._backend = get_backend()
+        if stale or warm:
+            self._wake.set()
+
+        if missing or behind:
+            # A versão é lida antes dos dados: guardada com eles, poupa a próxima releitura se nada mudar
+            versions = None
+            if self.check_versions:
+                with perf.span('backend.read_versions'):
+                    versions = self._backend.read_versions()
+            try:
+                frames.update(self._fetch(self._backend, missing + behind + extra, generations, versions))
+            except Exception:
+                if not extra:
+                    raise
+                # Uma aba extra com problema (ex.: inexistente) não pode impedir a leitura das pedidas
+                frames.update(self._fetch(self._backend, missing + behind, generations, versions))
+
+        # Cópia rasa: um DataFrame novo por leitura (colunas próprias), mas sem duplicar os dados
+        return {name: frames[name].copy(deep=False) for name in sheet_names}
+
+    def invalidate(self, sheet_names=None, tracked=False):
+        """Marca as abas indicadas (ou todas) como escritas: avança a geração e acorda a thread de atualização.
+
+        O último snapshot continua sendo servido até a releitura. Retorna {aba: nova geração}: quem
+        escreveu a guarda (ver `own_write_generations`) para não ler um snapshot anterior à escrita.
+
+        `tracked=True`: a escrita que motivou a invalidação já foi aplicada aos agregados incrementais,
+        então a próxima leitura mantém a linhagem da aba. Senão a linhagem muda na hora.
+        """
+        generations = {}
+        with self._lock:
+            for name in set(TABLE_COLUMNS) | set(self._entries) if sheet_names is None else sheet_names:
+                self._generations[name] = generations[name] = self._generations.get(name, 0) + 1
+                if tracked:
+                    self._tracked.add(name)
+                else:
+                    self._tracked.discard(name)
+                    self._lineages[name] = f'{name}@{time.time_ns()}'
+        self._wake.set()
+        return generations
+
+
+_thread_writes = threading.local()
+
+def own_write_generations():
+    """{aba: geração} das escritas feitas por quem está lendo: a leitura dessas abas espera um snapshot que as contenha.
+
+    Numa sessão do Streamlit fica no session_state; fora dela (threads de fundo, scripts), vale por thread.
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        if not hasattr(_thread_writes, 'generations'):
+            _thread_writes.generations = {}
+        return _thread_writes.generations
+    return st.session_state.setdefault('own_write_generations', {})
+
+
+@st.cache_resource # Um único cache de abas (e uma única thread de atualização) por processo
+def get_sheet_cache():
+    # O SQLite já é local: a cópia em disco só compensa para o Google Sheets
+    warm_dir = WARM_CACHE_DIR if STORAGE_BACKEND != 'sqlite' else None
+    return SheetCache(SHEET_CACHE_TTL, check_versions=FRESHNESS_MODE == 'version', warm_dir=warm_dir)
+
+
+def show_data_freshness():
+    """Legenda com a data/hora dos dados exibidos (o snapshot pode estar sendo atualizado em segundo plano)."""
+    cache = get_sheet_cache()
+    as_of = cache.as_of(SERVICE_TABLES)
+    if as_of is None:
+        return
+    age = time.time() - as_of
+    stamp = datetime.fromtimestamp(as_of).strftime('%d/%m/%Y %H:%M:%S')
+    caption = f"🕒 Dados de {stamp}" + (f" (há {int(age)} s)" if age >= SHEET_CACHE_TTL else "")
+    if cache.last_refresh_error:
+        caption += f" · ⚠️ A atualização em segundo plano falhou ({cache.last_refresh_error}); exibindo a última leitura válida."
+    st.caption(caption)
+
+
+def get_sheet_data(sheet_name):
+    """Lê os dados de uma aba/sheet e retorna um DataFrame, com conversões iniciais."""
+    try:
+        return get_sheet_cache().get_many([sheet_name])[sheet_name]
+
+    except gspread.WorksheetNotFound:
+        st.error(f"A aba/sheet **'{sheet_name}'** não foi encontrada na planilha. Crie-a com os cabeçalhos corretos.")
+        return pd.DataFrame()
+    except Exception as e:
+        st.error(f"Erro ao ler a sheet '{sheet_name}': {e}")
+        return pd.DataFrame()
+
+
+SERVICE_TABLES = ('servico', 'veiculo', 'prestador')
+
+def get_all_sheet_data():
+    """Lê as abas de serviço, veículo e prestador; as que estiverem frias vêm numa única requisição em lote.
+
+    Retorna {aba: DataFrame tipado}. Se o lote falhar, lê aba por aba para reportar o erro da aba certa.
+    """
+    try:
+        return get_sheet_cache().get_many(SERVICE_TABLES)
+    except Exception:
+        return {sheet_name: get_sheet_data(sheet_name) for sheet_name in SERVICE_TABLES}
+
+
+# Visões em cache derivadas das abas: [(abas de origem, função em cache)]
+_DERIVED_VIEWS = []
+
+def derived_view(*sheet_names):
+    """Registra uma função em cache como dependente das abas indicadas.
+
+    Quando uma dessas abas é escrita, `clear_data_cache` limpa a visão junto com a aba.
+    """
+    def register(cached_func):
+        _DERIVED_VIEWS.append((frozenset(sheet_names), cached_func))
+        return cached_func
+    return register
+
+
+def clear_data_cache(*sheet_names, tracked=True):
+    """Marca as abas escritas (todas, se nenhuma for indicada) para releitura e limpa as visões que dependem delas.
+
+    As outras sessões seguem com o último snapshot até a releitura em segundo plano; a próxima leitura
+    de quem escreveu espera a releitura. Use `tracked=False` para escritas que não passaram pelo CRUD
+    (migrações, escritas descartadas): os agregados incrementais serão recalculados.
+    """
+    generations = get_sheet_cache().invalidate(sheet_names or None, tracked=bool(sheet_names) and tracked)
+    own_write_generations().update(generations)
+    for depends_on, cached_func in _DERIVED_VIEWS:
+        if not sheet_names or depends_on.intersection(sheet_names):
+            cached_func.clear()
+
+
+@timed('backend.write_table')
+def write_sheet_data(sheet_name, df_new):
+    """Sobrescreve a aba/sheet inteira com o novo DataFrame.
+
+    Uso restrito a migrações de esquema: inserções, edições e exclusões passam
+    por `execute_crud_operation`, que grava apenas a linha afetada.
+    """
+    try:
+        get_backend().write_table(sheet_name, df_new)
+
+        # Limpa o cache da aba para forçar a releitura imediata
+        clear_data_cache(sheet_name, tracked=False)
+        
+        return True
+
+    except Exception as e:
+        st.error(f"Erro ao escrever na sheet '{sheet_name}': {e}")
+        return False
+
+# ==============================================================================
+# 🚨 WRITE-BEHIND: DIÁRIO LOCAL DE ESCRITAS (OPCIONAL) 🚨
+# ==============================================================================
+
+# Com WRITE_BEHIND=1 os formulários gravam num diário local (SQLite) e retornam na hora;
+# uma thread em segundo plano envia as alterações ao backend em lotes.
+WRITE_BEHIND = os.environ.get('WRITE_BEHIND', '0') == '1'
+WRITE_BEHIND_JOURNAL = os.environ.get('WRITE_BEHIND_JOURNAL', 'movdrive_journal.db')
+WRITE_BEHIND_INTERVAL = 2.0 # Segundos entre os envios (as edições desse intervalo são fundidas)
+WRITE_BEHIND_MAX_BACKOFF = 300 # Teto, em segundos, da espera entre novas tentativas após falha
+
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    sheet_name TEXT NOT NULL, operation TEXT NOT NULL, id_col TEXT NOT NULL, id_value INTEGER NOT NULL,
+    data TEXT, attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT, created_at REAL NOT NULL,
+    expected_version TEXT, result_version TEXT
+);
+"""
+# Colunas acrescentadas depois da primeira versão do diário: {coluna: tipo}, adicionadas aos diários antigos
+JOURNAL_ADDED_COLUMNS = {'expected_version': 'TEXT', 'result_version': 'TEXT'}
+
+
+def _coalesce_journal(entries):
+    """Funde as entradas pendentes por linha (aba, ID), mantendo a ordem de chegada.
+
+    insert + updates vira um único insert; updates seguidos viram um único update; qualquer
+    operação seguida de delete vira delete (ou nada, se a linha nem chegou a ser enviada).
+    A versão esperada é a da primeira entrada (a linha como está no backend) e a versão
+    resultante, a da última.
+    """
+    merged = {}
+    for entry in entries:
+        key = (entry['sheet_name'], entry['id_value'])
+        current = merged.get(key)
+        if current is None:
+            merged[key] = dict(entry, data=dict(entry['data']), seqs=[entry['seq']])
+            continue
+
+        current['seqs'].append(entry['seq'])
+        current['next_attempt'] = max(current['next_attempt'], entry['next_attempt'])
+        current['attempts'] = max(current['attempts'], entry['attempts'])
+        if entry['operation'] == 'delete':
+            current['operation'] = 'noop' if current['operation'] in ('insert', 'noop') else 'delete'
+            current['data'] = {}
+        elif entry['operation'] == 'update' and current['operation'] in ('insert', 'update'):
+            current['data'].update(entry['data'])
+        current['result_version'] = entry['result_version'] if current['operation'] == 'update' else None
+    return list(merged.values())
+
+
+def _journal_label(group):
+    return f"{group['operation']} do ID {group['id_value']} em '{group['sheet_name']}'"
+
+
+class WriteBehindQueue:
+    """Diário durável de escritas pendentes e a thread que as envia ao backend.
+
+    As entradas ficam no SQLite até o backend confirmar a escrita, então sobrevivem a um
+    reinício do processo. Enquanto pendentes, são aplicadas por cima dos DataFrames lidos
+    (`apply_to`), para que as sessões vejam a alteração imediatamente.
+    """
+
+    def __init__(self, backend, path, interval=WRITE_BEHIND_INTERVAL):
+        self.backend = backend
+        self.interval = interval
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(JOURNAL_SCHEMA)
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(journal)')}
+        with self._conn:
+            for column, kind in JOURNAL_ADDED_COLUMNS.items():
+                if column not in columns: # Entradas antigas ficam sem versão: são enviadas sem conferência
+                    self._conn.execute(f'ALTER TABLE journal ADD COLUMN {column} {kind}')
+        self._dropped = [] # Mensagens das escritas descartadas (linha excluída ou alterada por outra pessoa)
+        self.last_error = None
+        self._wake = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._worker.start()
+
+    def pending(self, sheet_name=None):
+        """Entradas ainda não confirmadas pelo backend, na ordem de chegada (opcionalmente de uma aba)."""
+        where, params = ('WHERE sheet_name = ?', (sheet_name,)) if sheet_name else ('', ())
+        with self._lock:
+            rows = self._conn.execute(f'SELECT * FROM journal {where} ORDER BY seq', params).fetchall()
+        return [dict(row, data=json.loads(row['data']) if row['data'] else {}) for row in rows]
+
+    def next_id(self, sheet_name):
+        """Retorna um ID novo para uma inserção enfileirada, vindo da reserva do backend (`reserve_ids`).
+
+        A reserva é a mesma das inserções diretas e dos outros processos, então o ID nunca se repete.
+        Fora do lock da fila: quando a reserva vai à rede, a leitura das pendências não espera por ela.
+        """
+        return self.backend.reserve_ids(sheet_name, 1)[0]
+
+    def enqueue(self, sheet_name, operation, id_col, id_value, data=None, expected_version=None, result_version=None):
+        """Grava a alteração no diário local. O envio ao backend fica para a thread.
+
+        `expected_version`: versão da linha (ver `row_version`) sobre a qual a alteração foi feita; o envio
+        só grava se o backend ainda tiver essa versão. `result_version`: versão da linha depois de um update,
+        para reconhecer numa nova tentativa uma alteração que a tentativa anterior já gravou.
+        """
+        payload = json.dumps({key: _to_cell_value(value) for key, value in (data or {}).items()})
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO journal (sheet_name, operation, id_col, id_value, data, created_at, expected_version, result_version) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (sheet_name, operation, id_col, int(id_value), payload, time.time(), expected_version, result_version)
+            )
+
+    def apply_to(self, sheet_name, df):
+        """Retorna `df` com as escritas pendentes da aba aplicadas (o DataFrame original não é alterado)."""
+        entries = self.pending(sheet_name)
+        if not entries:
+            return df
+
+        id_col = entries[0]['id_col']
+        touched = {} # {id: linha final (dict) ou None se removida}
+        for entry in entries:
+            id_value = int(entry['id_value'])
+            if entry['operation'] == 'insert':
+                touched[id_value] = dict(entry['data'], **{id_col: id_value})
+            elif entry['operation'] == 'update':
+                if id_value in touched:
+                    base = touched[id_value]
+                else:
+                    match = df[df[id_col] == id_value] if not df.empty else df
+                    base = match.iloc[0].to_dict() if not match.empty else None
+                if base is not None:
+                    touched[id_value] = dict(base, **entry['data'])
+            elif entry['operation'] == 'delete':
+                touched[id_value] = None
+
+        kept = df[~df[id_col].isin(list(touched))] if not df.empty else df
+        new_rows = [row for row in touched.values() if row is not None]
+        if not new_rows:
+            kept = kept.reset_index(drop=True)
+            kept.attrs['data_version'] = f"{df.attrs.get('data_version')}+{entries[-1]['seq']}"
+            return kept
+
+        df_new = _prepare_sheet_df(sheet_name, new_rows)
+        if not df.empty:
+            df_new = df_new.reindex(columns=df.columns)
+        merged = pd.concat([kept, df_new], ignore_index=True).sort_values(id_col, kind='stable', ignore_index=True)
+        # Categorias diferentes nas duas partes viram texto no concat: reaplica o esquema
+        merged = apply_table_schema(sheet_name, merged)
+        # A versão combina a leitura do backend com a última entrada do diário aplicada
+        merged.attrs['data_version'] = f"{df.attrs.get('data_version')}+{entries[-1]['seq']}"
+        return merged
+
+    def flush(self):
+        """Envia ao backend as escritas pendentes, fundidas por linha. Inserções da mesma aba vão num único lote."""
+        now = time.time()
+        groups = [group for group in _coalesce_journal(self.pending()) if group['next_attempt'] <= now]
+
+        done = [] # Escritas confirmadas: (seqs, abas, acompanhada pelos agregados?)
+        inserts = {}
+        for group in groups:
+            if group['operation'] == 'insert':
+                inserts.setdefault((group['sheet_name'], group['id_col']), []).append(group)
+        for (sheet_name, id_col), batch in inserts.items():
+            self._send(batch, functools.partial(self._insert_batch, sheet_name, id_col, batch), done)
+
+        for group in groups:
+            if group['operation'] == 'update':
+                self._send([group], functools.partial(self._update_row, group), done)
+            elif group['operation'] == 'delete':
+                self._send([group], functools.partial(self._delete_row, group), done)
+            elif group['operation'] == 'noop':
+                done.append((group['seqs'], {group['sheet_name']}, True))
+        self._settle(done)
+
+        with self._lock:
+            failing = self._conn.execute('SELECT 1 FROM journal WHERE last_error IS NOT NULL LIMIT 1').fetchone()
+        if failing is None:
+            self.last_error = None
+        return len(groups)
+
+    def _insert_batch(self, sheet_name, id_col, batch):
+        """Envia um lote de inserções com IDs já definidos, sem duplicar linhas numa nova tentativa.
+
+        Uma tentativa anterior pode ter gravado as linhas mesmo terminando em erro (resposta perdida,
+        falha depois do append, processo encerrado no meio do envio). Antes de reenviar, confere quais
+        IDs já estão no backend: essas linhas recebem só um update com os dados atuais, e as demais são inseridas.
+        """
+        rows = [dict(group['data'], **{id_col: group['id_value']}) for group in batch]
+        if any(group['attempts'] for group in batch):
+            existing = self.backend.existing_ids(sheet_name, id_col, [row[id_col] for row in rows])
+            for row in rows:
+                if int(row[id_col]) in existing:
+                    self.backend.update_row(sheet_name, id_col, int(row[id_col]), row)
+            rows = [row for row in rows if int(row[id_col]) not in existing]
+        return self.backend.insert_rows(sheet_name, rows, id_col) if rows else []
+
+    def _update_row(self, group):
+        """Envia um update condicionado à versão esperada da linha.
+
+        Numa nova tentativa, a anterior pode ter gravado a alteração antes de falhar: se a linha já
+        tem a versão resultante, o mesmo update (condicionado a ela) só confirma o que está gravado.
+        """
+        args = (group['sheet_name'], group['id_col'], group['id_value'], group['data'])
+        try:
+            return self.backend.update_row(*args, expected_version=group['expected_version'])
+        except WriteConflictError:
+            if not group['attempts'] or group['result_version'] is None:
+                raise
+            return self.backend.update_row(*args, expected_version=group['result_version'])
+
+    def _delete_row(self, group):
+        """Envia um delete condicionado à versão esperada; numa nova tentativa, linha já excluída conta como feito."""
+        try:
+            return self.backend.delete_row(group['sheet_name'], group['id_col'], group['id_value'], group['expected_version'])
+        except WriteConflictError as e:
+            if group['attempts'] and e.deleted:
+                return True
+            raise
+
+    def _send(self, batch, write, done):
+        seqs = [seq for group in batch for seq in group['seqs']]
+        placeholders = ', '.join('?' * len(seqs))
+        # Conta a tentativa antes de enviar: se ela falhar (ou o processo cair) depois de o backend aplicar
+        # a escrita, a próxima tentativa sabe que precisa conferir o que já foi gravado
+        with self._lock, self._conn:
+            self._conn.execute(f'UPDATE journal SET attempts = attempts + 1 WHERE seq IN ({placeholders})', seqs)
+        try:
+            result = write()
+        except WriteConflictError as e:
+            # A linha mudou no backend depois de enfileirada (outra sessão, outro processo, a própria planilha):
+            # a alteração é descartada em vez de sobrescrever a outra edição, e quem usa o app é avisado
+            with self._lock:
+                self._dropped.extend(f"A alteração '{_journal_label(group)}' foi descartada: {e}" for group in batch)
+            done.append((seqs, {group['sheet_name'] for group in batch}, False))
+            return
+        except Exception as e:
+            # Mantém no diário e agenda nova tentativa com espera exponencial
+            self.last_error = f"{batch[0]['operation']} em '{batch[0]['sheet_name']}': {e}"
+            with self._lock, self._conn:
+                self._conn.execute(
+                    f"UPDATE journal SET last_error = ?, "
+                    f"next_attempt = ? + MIN(?, ? * (1 << MIN(attempts - 1, 16))) WHERE seq IN ({placeholders})",
+                    [str(e), time.time(), WRITE_BEHIND_MAX_BACKOFF, self.interval] + seqs
+                )
+            return
+
+        if result is False:
+            # Não adianta tentar de novo: a linha já não existe no backend
+            with self._lock:
+                self._dropped.extend(
+                    f"A alteração '{_journal_label(group)}' foi descartada: o registro não existe mais na planilha." for group in batch
+                )
+        # Uma escrita descartada já tinha entrado nos agregados ao ser enfileirada: eles precisam ser refeitos
+        done.append((seqs, {group['sheet_name'] for group in batch}, result is not False))
+
+    def _settle(self, done):
+        """Tira do diário as escritas confirmadas, depois de reler as abas escritas aqui mesmo, nesta thread.
+
+        Enquanto isso as sessões seguem com o snapshot anterior mais as pendências, e nenhuma espera a rede.
+        Só depois de o cache ter a alteração ela sai do diário: assim ela nunca some da tela no meio do caminho.
+        """
+        if not done:
+            return
+        untracked = {name for _, names, tracked in done if not tracked for name in names}
+        tracked = {name for _, names, _ in done for name in names} - untracked
+        if tracked:
+            clear_data_cache(*tracked)
+        if untracked:
+            clear_data_cache(*untracked, tracked=False)
+        try:
+            get_sheet_cache().get_many(sorted(tracked | untracked))
+        except Exception:
+            pass # A thread de atualização relê a aba depois; até lá vale o último snapshot bom
+        seqs = [seq for group_seqs, _, _ in done for seq in group_seqs]
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM journal WHERE seq IN ({', '.join('?' * len(seqs))})", seqs)
+
+    def status(self):
+        """Resumo para a interface: escritas pendentes, quantas já falharam e a última falha."""
+        with self._lock:
+            row = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(last_error IS NOT NULL), 0) FROM journal').fetchone()
+        return {'pending': row[0], 'failing': row[1], 'last_error': self.last_error}
+
+    def take_dropped(self):
+        """Retorna (e esquece) as escritas descartadas desde a última chamada."""
+        with self._lock:
+            dropped, self._dropped = self._dropped, []
+        return dropped
+
+    def flush_now(self):
+        """Acorda a thread de envio sem esperar o intervalo."""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e: # A thread nunca pode morrer: as pendências continuam no diário
+                self.last_error = str(e)
+
+
+@st.cache_resource # Uma única fila (e uma única thread de envio) por processo
+def get_write_behind_queue():
+    """Retorna a fila write-behind do processo, criando o diário e a thread na primeira chamada."""
+    return WriteBehindQueue(get_backend(), WRITE_BEHIND_JOURNAL)
+
+
+def apply_pending_writes(sheet_name, df):
+    """No modo write-behind, aplica sobre `df` as alterações ainda não enviadas ao backend."""
+    if not WRITE_BEHIND:
+        return df
+    return get_write_behind_queue().apply_to(sheet_name, df)
+
+
+def get_service_tables():
+    """Leitura em lote das três abas, com as escritas pendentes (modo write-behind) já aplicadas."""
+    return {sheet_name: apply_pending_writes(sheet_name, df) for sheet_name, df in get_all_sheet_data().items()}
+
+
+def show_write_behind_status():
+    """Exibe no topo da página as escritas ainda não gravadas no backend e as falhas de envio."""
+    queue = get_write_behind_queue()
+    status = queue.status()
+    if status['failing']:
+        st.warning(
+            f"⚠️ {status['pending']} alteração(ões) ainda não gravada(s) na planilha. "
+            f"Última falha: {status['last_error']}. Novas tentativas são feitas automaticamente."
+        )
+    elif status['pending']:
+        st.caption(f"⏳ {status['pending']} alteração(ões) aguardando envio para a planilha.")
+    for message in queue.take_dropped():
+        st.error(message)
+
+# ==============================================================================
+# 🚨 FUNÇÕES DE ACESSO A DADOS (SIMULAÇÃO CRUD) 🚨
+# ==============================================================================
+
+# Colunas com índice hash de igualdade, além da chave primária
+INDEXED_COLUMNS = {'veiculo': ['placa'], 'prestador': ['empresa'], 'servico': ['id_veiculo', 'id_prestador']}
+
+class TableIndexes:
+    """Índices hash de uma tabela carregada: {coluna: {valor: posições das linhas no DataFrame}}.
+
+    Para o serviço, os índices de id_veiculo/id_prestador servem também como contagem
+    reversa de chave estrangeira (quantos serviços apontam para cada veículo/prestador).
+    """
+
+    def __init__(self, sheet_name, df):
+        self.columns = {}
+        for col in [ID_COLUMNS[sheet_name]] + INDEXED_COLUMNS.get(sheet_name, []):
+            if col in df.columns:
+                self.columns[col] = {key: positions.tolist() for key, positions in df.groupby(col, sort=False, observed=True).indices.items()}
+
+    def lookup(self, col, value):
+        """Posições das linhas com `col == value`, ou None se a coluna não tiver índice."""
+        if col not in self.columns:
+            return None
+        return self.columns[col].get(value, [])
+
+    def count(self, col, value):
+        positions = self.lookup(col, value)
+        return len(positions) if positions else 0
+
+
+@st.cache_resource(max_entries=32) # Compartilhado entre as sessões; uma entrada por versão de cada tabela
+def _build_table_indexes(sheet_name, data_version, _df):
+    return TableIndexes(sheet_name, _df)
+
+def get_table_indexes(sheet_name, df):
+    """Índices da tabela completa `df`, reconstruídos só quando a versão dos dados muda."""
+    data_version = df.attrs.get('data_version')
+    if data_version is None:
+        return TableIndexes(sheet_name, df)
+    return _build_table_indexes(sheet_name, data_version, df)
+
+
+def get_data(sheet_name, filter_col=None, filter_value=None):
+    """Busca dados de uma aba/sheet e retorna um DataFrame do Pandas, com filtro opcional.
+
+    Filtros de igualdade em colunas indexadas (ID, placa, empresa, chaves estrangeiras do
+    serviço) são respondidos pelo índice hash, sem varrer a tabela.
+    """
+    df = apply_pending_writes(sheet_name, get_sheet_data(sheet_name))
+    if df.empty:
+        return df
+    
+    if filter_col and filter_value is not None:
+        try:
+            # Os IDs já são inteiros desde a leitura; basta garantir que o valor de filtro também seja
+            if filter_col.startswith('id_'):
+                 filter_value = int(filter_value) if pd.notna(filter_value) else 0
+
+            positions = get_table_indexes(sheet_name, df).lookup(filter_col, filter_value)
+            if positions is None: # Coluna sem índice: varredura completa
+                return df[df[filter_col] == filter_value]
+            return df.iloc[positions]
+        except:
+            # Em caso de falha de filtro (por exemplo, coluna não existe), retorne um DF vazio.
+            return pd.DataFrame() 
+    
+    return df
+
+
+SPEND_RECONCILE_SECONDS = 600 # Recalcula os agregados por garantia, mesmo sem mudança de linhagem
+
+
+class SpendAggregates:
+    """Totais de gasto em serviços por veículo, por prestador e por mês, mantidos por deltas.
+
+    Cada escrita de serviço feita pelo CRUD tira a contribuição da linha antiga e soma a da nova.
+    O recálculo completo só acontece quando a linhagem da aba de serviços muda no SheetCache
+    (carga fria ou alteração que não passou por aqui) e, por garantia, a cada SPEND_RECONCILE_SECONDS.
+    Uma releitura por TTL só troca a linhagem se trouxer conteúdo diferente (escritas de outros processos).
+    Como a linhagem é mantida quando uma escrita acompanhada coincide com uma escrita de fora, cada
+    versão nova da aba é conferida com `matches` (somas de conferência) e recalculada se não bater.
+    """
+
+    def __init__(self):
+        self.lineage = None
+        self.built_at = 0.0
+        self.checked_version = None # data_version do último snapshot da aba conferido (ou usado no recálculo)
+        # {chave: [total, nº de serviços]}; a chave some quando o último serviço dela é removido
+        self.by_vehicle = {}
+        self.by_provider = {}
+        self.by_month = {}
+        self._lock = threading.Lock()
+        # Serializa (escrita de serviço + delta) e recálculo: um recálculo nunca vê a escrita sem o delta
+        self.sync_lock = threading.RLock()
+
+    def needs_rebuild(self, lineage):
+        return lineage is None or lineage != self.lineage or time.monotonic() - self.built_at > SPEND_RECONCILE_SECONDS
+
+    @timed('aggregates.rebuild')
+    def rebuild(self, df_servicos, lineage):
+        """Recalcula tudo a partir da aba de serviços (com os tipos de TABLE_SCHEMAS)."""
+        totals = {}
+        if not df_servicos.empty:
+            valor = df_servicos['valor']
+            month = df_servicos['data_servico'].dt.strftime('%Y-%m')
+            for name, keys in (('by_vehicle', df_servicos['id_veiculo']), ('by_provider', df_servicos['id_prestador']), ('by_month', month)):
+                grouped = valor.groupby(keys).agg(['sum', 'size']) # Como em `apply`: serviço sem valor também conta
+                totals[name] = {key: [float(total), int(count)] for key, total, count in grouped.itertuples()}
+        with self._lock:
+            self.by_vehicle = totals.get('by_vehicle', {})
+            self.by_provider = totals.get('by_provider', {})
+            self.by_month = totals.get('by_month', {})
+            self.lineage = lineage
+            self.built_at = time.monotonic()
+
+    def apply(self, old_row=None, new_row=None):
+        """Aplica o delta de uma escrita: `old_row` sai (update/delete), `new_row` entra (insert/update)."""
+        with self._lock:
+            for row, sign in ((old_row, -1), (new_row, 1)):
+                if row is None:
+                    continue
+                valor = pd.to_numeric(row.get('valor'), errors='coerce')
+                valor = 0.0 if pd.isna(valor) else float(valor)
+                data_servico = pd.to_datetime(row.get('data_servico'), errors='coerce')
+                for totals, key in (
+                    (self.by_vehicle, int(row.get('id_veiculo') or 0)),
+                    (self.by_provider, int(row.get('id_prestador') or 0)),
+                    (self.by_month, None if pd.isna(data_servico) else data_servico.strftime('%Y-%m')),
+                ):
+                    if key is None:
+                        continue
+                    entry = totals.setdefault(key, [0.0, 0])
+                    entry[0] += sign * valor
+                    entry[1] += sign
+                    if entry[1] <= 0:
+                        del totals[key]
+
+    @staticmethod
+    def _month_index(month):
+        year, number = month.split('-')
+        return int(year) * 12 + int(number)
+
+    def matches(self, df_servicos):
+        """Confere os totais com a aba de serviços, sem recalcular: para cada agrupamento, compara o nº de
+        serviços, a soma dos valores (em centavos) e essas duas somas ponderadas pela chave.
+
+        Uma escrita de fora que mude valor, veículo, prestador ou mês de um serviço (ou inclua/remova
+        serviços) muda alguma dessas somas, salvo coincidências.
+        """
+        if df_servicos.empty:
+            expected = [(0, 0, 0, 0)] * 3
+        else:
+            cents = (df_servicos['valor'].fillna(0) * 100).round().astype('int64')
+            dates = df_servicos['data_servico']
+            dated = dates.notna()
+            month = (dates[dated].dt.year * 12 + dates[dated].dt.month).astype('int64')
+            expected = [
+                (len(keys), int(part.sum()), int((keys * part).sum()), int(keys.sum()))
+                for keys, part in (
+                    (df_servicos['id_veiculo'].fillna(0).astype('int64'), cents),
+                    (df_servicos['id_prestador'].fillna(0).astype('int64'), cents),
+                    (month, cents[dated]),
+                )
+            ]
+        with self._lock:
+            actual = []
+            for totals, weight in ((self.by_vehicle, int), (self.by_provider, int), (self.by_month, self._month_index)):
+                rounded = [(weight(key), round(total * 100), count) for key, (total, count) in totals.items()]
+                actual.append((
+                    sum(count for _, _, count in rounded), sum(total for _, total, _ in rounded),
+                    sum(key * total for key, total, _ in rounded), sum(key * count for key, _, count in rounded),
+                ))
+        return actual == expected
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'by_vehicle': {key: total for key, (total, _) in self.by_vehicle.items()},
+                'by_provider': {key: total for key, (total, _) in self.by_provider.items()},
+                'by_month': {key: total for key, (total, _) in self.by_month.items()},
+            }
+
+
+@st.cache_resource # Um único conjunto de agregados por processo, compartilhado entre as sessões
+def get_spend_store():
+    return SpendAggregates()
+
+def get_spend_aggregates():
+    """Totais de gasto em dia com a aba de serviços: {'by_vehicle', 'by_provider', 'by_month'} ou None se a leitura falhar."""
+    store = get_spend_store()
+    cache = get_sheet_cache()
+    try:
+        df_servicos = cache.get_many(['servico'])['servico']
+    except Exception as e:
+        st.error(f"Erro ao ler a sheet 'servico': {e}")
+        return None
+
+    if store.needs_rebuild(cache.lineage('servico')):
+        with store.sync_lock:
+            # Relê dentro do lock: uma escrita concluída enquanto esperávamos já invalidou a aba
+            df_servicos = cache.get_many(['servico'])['servico']
+            lineage = cache.lineage('servico')
+            if store.needs_rebuild(lineage):
+                store.rebuild(apply_pending_writes('servico', df_servicos), lineage)
+                store.checked_version = df_servicos.attrs.get('data_version')
+    elif df_servicos.attrs.get('data_version') != store.checked_version:
+        # Aba relida com a linhagem mantida: confere se os deltas explicam todo o conteúdo novo
+        with store.sync_lock:
+            df_servicos = cache.get_many(['servico'])['servico']
+            version = df_servicos.attrs.get('data_version')
+            # Um snapshot anterior a uma escrita já aplicada aos agregados não bateria: espera a releitura
+            if version != store.checked_version and cache.is_current('servico', df_servicos):
+                df_servicos = apply_pending_writes('servico', df_servicos)
+                if not store.matches(df_servicos):
+                    get_perf().count('aggregates.mismatch')
+                    store.rebuild(df_servicos, cache.lineage('servico'))
+                store.checked_version = version
+    return store.snapshot()
+
+
+def execute_crud_operation(sheet_name, data=None, id_col=None, id_value=None, operation='insert', expected_version=None):
+    """Executa as operações CRUD no backend configurado (Insert, Update, Delete).
+
+    `expected_version`: versão da linha (`row_version`) vista pelo usuário. Se a linha mudou desde
+    então, a atualização/exclusão é recusada com um aviso em vez de sobrescrever a outra edição.
+    """
+    id_col = ID_COLUMNS.get(sheet_name, f'id_{sheet_name}') if id_col is None else id_col
+
+    if sheet_name != 'servico':
+        return _dispatch_crud_operation(sheet_name, data, id_col, id_value, operation, expected_version)
+
+    # Serviços: os agregados de gasto acompanham a escrita por delta (a linha antiga sai, a nova entra)
+    store = get_spend_store()
+    with store.sync_lock:
+        old_row = None
+        if operation in ['update', 'delete'] and id_value is not None:
+            match = get_data(sheet_name, id_col, id_value)
+            old_row = match.iloc[0].to_dict() if not match.empty else None
+
+        success, result_id = _dispatch_crud_operation(sheet_name, data, id_col, id_value, operation, expected_version)
+        if success:
+            store.apply(old_row, None if operation == 'delete' else dict(old_row or {}, **data))
+    return success, result_id
+
+def _dispatch_crud_operation(sheet_name, data, id_col, id_value, operation, expected_version=None):
+    if WRITE_BEHIND:
+        return _enqueue_crud_operation(sheet_name, data, id_col, id_value, operation, expected_version)
+    return _write_crud_operation(sheet_name, data, id_col, id_value, operation, expected_version)
+
+@timed('crud.write')
+def _write_crud_operation(sheet_name, data, id_col, id_value, operation, expected_version=None):
+    """Grava a operação diretamente no backend e invalida o cache da aba escrita."""
+    backend = get_backend()
+
+    try:
+        # 1. INSERÇÃO (o backend atribui o próximo ID)
+        if operation == 'insert':
+            new_id = backend.insert_row(sheet_name, data, id_col)
+            data[id_col] = new_id
+            clear_data_cache(sheet_name)
+            return True, new_id
+
+        # 2. ATUALIZAÇÃO OU EXCLUSÃO (UPDATE/DELETE) de uma única linha
+        elif operation in ['update', 'delete']:
+            if id_value is None:
+                return False, None
+
+            if operation == 'update':
+                success = backend.update_row(sheet_name, id_col, int(id_value), data, expected_version)
+            else:
+                success = backend.delete_row(sheet_name, id_col, int(id_value), expected_version)
+
+            if success:
+                clear_data_cache(sheet_name)
+            return success, id_value if success else None
+
+    except WriteConflictError as e:
+        # A linha foi escrita por outra sessão/processo: a leitura em cache também está desatualizada.
+        # A versão atual passa a ser a vista pelo usuário: repetir a operação, já avisado, é permitido.
+        st.error(f"⚠️ {e}")
+        clear_data_cache(sheet_name, tracked=False)
+        remember_row_version(sheet_name, id_value)
+        return False, None
+    except Exception as e:
+        st.error(f"Erro ao escrever na sheet '{sheet_name}': {e}")
+        return False, None
+
+    return False, None
+
+@timed('crud.enqueue')
+def _enqueue_crud_operation(sheet_name, data, id_col, id_value, operation, expected_version=None):
+    """Versão write-behind de execute_crud_operation: grava no diário local e retorna na hora."""
+    queue = get_write_behind_queue()
+
+    if operation == 'insert':
+        try:
+            id_value = queue.next_id(sheet_name)
+        except Exception as e:
+            st.error(f"Erro ao reservar um novo ID em '{sheet_name}': {e}")
+            return False, None
+        data[id_col] = id_value
+    elif operation in ['update', 'delete']:
+        # A linha precisa existir (no backend ou nas pendências)
+        match = get_data(sheet_name, id_col, id_value) if id_value is not None else pd.DataFrame()
+        if match.empty:
+            if expected_version is not None:
+                st.error(f"⚠️ {WriteConflictError(sheet_name, id_value, deleted=True)}")
+            return False, None
+        # A conferência da versão usa a leitura em cache com as pendências; o envio ao backend confere
+        # de novo, contra a linha gravada, a versão guardada no diário
+        row = match.iloc[0].to_dict()
+        version = row_version(sheet_name, row)
+        if expected_version is not None and version != expected_version:
+            st.error(f"⚠️ {WriteConflictError(sheet_name, id_value)}")
+            remember_row_version(sheet_name, id_value, row)
+            return False, None
+        expected_version = version
+    else:
+        return False, None
+
+    result_version = row_version(sheet_name, dict(row, **data)) if operation == 'update' else None
+    queue.enqueue(sheet_name, operation, id_col, id_value, data, expected_version, result_version)
+    return True, id_value
+
+
+def remember_row_version(sheet_name, id_value, row=None):
+    """Guarda na sessão a versão da linha que o usuário está vendo (no formulário de edição ou ao pedir a exclusão)."""
+    if row is None:
+        match = get_data(sheet_name, ID_COLUMNS[sheet_name], id_value)
+        row = match.iloc[0].to_dict() if not match.empty else None
+    versions = st.session_state.setdefault('row_versions', {})
+    versions[f'{sheet_name}:{int(id_value)}'] = row_version(sheet_name, row) if row is not None else None
+
+def seen_row_version(sheet_name, id_value):
+    """Versão guardada por `remember_row_version` (None se a linha não foi aberta nesta sessão)."""
+    return st.session_state.get('row_versions', {}).get(f'{sheet_name}:{int(id_value)}')
+
+def forget_row_version(sheet_name, id_value):
+    st.session_state.get('row_versions', {}).pop(f'{sheet_name}:{int(id_value)}', None)
+
+
+def _pause_before_rerun():
+    """Dá tempo de ler a mensagem de sucesso antes do rerun (no modo write-behind a gravação é imediata)."""
+    if not WRITE_BEHIND:
+        time.sleep(1)
+
+# --- Funções de Inserção/Atualização/Exclusão (CRUD) ---
+# Veículo
+def insert_vehicle(nome, placa, ano, valor_pago, data_compra):
+    
+    # Checa se a placa já existe
+    df_check = get_data('veiculo', 'placa', placa)
+    if not df_check.empty:
+        st.error(f"Placa '{placa}' já cadastrada.")
+        return False
+        
+    data = {
+        'id_veiculo': 0, 
+        'nome': nome, 'placa': placa, 
+        'ano': ano, 'valor_pago': float(valor_pago), 'data_compra': str(data_compra)
+    }
+    
+    success, _ = execute_crud_operation('veiculo', data=data, id_col='id_veiculo', operation='insert')
+    
+    if success:
+        st.success(f"Veículo '{nome}' ({placa}) cadastrado com sucesso!")
+        st.session_state['edit_vehicle_id'] = None
+        st.rerun()  
+    else:
+        st.error("Falha ao cadastrar veículo.")
+
+def update_vehicle(id_veiculo, nome, placa, ano, valor_pago, data_compra, expected_version=None):
+    
+    # Checa se a placa existe em outro ID
+    df_check = get_data('veiculo', 'placa', placa)
+    if not df_check.empty:
+        # Pega o ID do veículo encontrado (se houver) e converte para int
+        found_id = df_check.iloc[0]['id_veiculo'] 
+        if found_id != int(id_veiculo):
+            st.error(f"Placa '{placa}' já cadastrada para outro veículo (ID {found_id}).")
+            return False
+
+    data = {
+        'nome': nome, 'placa': placa, 
+        'ano': ano, 'valor_pago': float(valor_pago), 'data_compra': str(data_compra)
+    }
+    
+    success, _ = execute_crud_operation('veiculo', data=data, id_col='id_veiculo', id_value=int(id_veiculo), operation='update', expected_version=expected_version)
+    
+    if success:
+        st.success(f"Veículo '{nome}' ({placa}) atualizado com sucesso!")
+        forget_row_version('veiculo', id_veiculo)
+        st.session_state['edit_vehicle_id'] = None
+        st.rerun()  
+    else:
+        st.error("Falha ao atualizar veículo.")
+
+def count_services(fk_col, id_value):
+    """Quantos serviços referenciam o veículo/prestador (pelo índice reverso de chave estrangeira)."""
+    df_servicos = get_data('servico')
+    if df_servicos.empty:
+        return 0
+    return get_table_indexes('servico', df_servicos).count(fk_col, int(id_value))
+
+def delete_vehicle(id_veiculo, expected_version=None):
+    # Simulação da verificação de chave estrangeira
+    if count_services('id_veiculo', id_veiculo) > 0:
+        st.error("Não é possível remover o veículo. Existem serviços vinculados a ele.")
+        return False
+        
+    success, _ = execute_crud_operation('veiculo', id_col='id_veiculo', id_value=int(id_veiculo), operation='delete', expected_version=expected_version)
+    
+    if success:
+        st.success("Veículo removido com sucesso!")
+        forget_row_version('veiculo', id_veiculo)
+        _pause_before_rerun()
+        st.rerun()  
+    else:
+        st.error("Falha ao remover veículo.")
+
+# Prestador
+def insert_new_prestador(empresa, telefone, nome_prestador, cnpj, email, endereco, numero, cidade, bairro, cep):
+    df_check = get_data("prestador", "empresa", empresa)
+    if not df_check.empty:
+        st.warning(f"A empresa '{empresa}' já está cadastrada.")
+        return False
+        
+    data = {
+        'id_prestador': 0, 'empresa': empresa, 'telefone': telefone, 'nome_prestador': nome_prestador, 
+        'cnpj': cnpj, 'email': email, 'endereco': endereco, 'numero': numero, 
+        'cidade': cidade, 'bairro': bairro, 'bairro': bairro, 'cep': cep
+    }
+    
+    success, _ = execute_crud_operation('prestador', data=data, id_col='id_prestador', operation='insert')
+    
+    if success:
+        st.success(f"Prestador '{empresa}' cadastrado com sucesso!")
+        st.session_state['edit_prestador_id'] = None
+        st.rerun()  
+        return True
+    return False
+
+def update_prestador(id_prestador, empresa, telefone, nome_prestador, cnpj, email, endereco, numero, cidade, bairro, cep, expected_version=None):
+    data = {
+        'empresa': empresa, 'telefone': telefone, 'nome_prestador': nome_prestador, 
+        'cnpj': cnpj, 'email': email, 'endereco': endereco, 'numero': numero, 
+        'cidade': cidade, 'bairro': bairro, 'cep': cep
+    }
+    
+    success, _ = execute_crud_operation('prestador', data=data, id_col='id_prestador', id_value=int(id_prestador), operation='update', expected_version=expected_version)
+    
+    if success:
+        st.success(f"Prestador '{empresa}' atualizado com sucesso!")
+        forget_row_version('prestador', id_prestador)
+        st.session_state['edit_prestador_id'] = None
+        st.rerun()  
+        return True
+    return False
+
+def delete_prestador(id_prestador, expected_version=None):
+    if count_services('id_prestador', id_prestador) > 0:
+        st.error("Não é possível remover o prestador. Existem serviços vinculados a ele.")
+        return False
+
+    success, _ = execute_crud_operation('prestador', id_col='id_prestador', id_value=int(id_prestador), operation='delete', expected_version=expected_version)
+    
+    if success:
+        st.success("Prestador removido com sucesso!")
+        forget_row_version('prestador', id_prestador)
+        _pause_before_rerun()
+        st.rerun()  
+    else:
+        st.error("Falha ao remover prestador.")
+
+def insert_prestador(empresa, telefone, nome_prestador, cnpj, email, endereco, numero, cidade, bairro, cep):
+    """Insere ou atualiza um prestador (usado no cadastro de Serviço)."""
+    df = get_data("prestador", "empresa", empresa)
+    
+    if not df.empty:
+        # Se existe, retorna o ID e atualiza os dados
+        id_prestador = df.iloc[0]['id_prestador']
+        # Simula a atualização de dados do prestador
+        update_prestador(id_prestador, empresa, telefone, nome_prestador, cnpj, email, endereco, numero, cidade, bairro, cep)
+        st.info(f"Dados do Prestador '{empresa}' atualizados.")
+        return id_prestador
+    
+    # Se não existe, insere
+    data = {
+        'id_prestador': 0, 'empresa': empresa, 'telefone': telefone, 'nome_prestador': nome_prestador, 
+        'cnpj': cnpj, 'email': email, 'endereco': endereco, 'numero': numero, 
+        'cidade': cidade, 'bairro': bairro, 'cep': cep
+    }
+    success, new_id = execute_crud_operation('prestador', data=data, id_col='id_prestador', operation='insert')
+    
+    return new_id if success else None
+
+# Serviço
+def insert_service(id_veiculo, id_prestador, nome_servico, data_servico, garantia_dias, valor, km_realizado, km_proxima_revisao, registro):
+    data_servico_dt = pd.to_datetime(data_servico)
+    data_vencimento = data_servico_dt + timedelta(days=int(garantia_dias))
+
+    data = {
+        'id_servico': 0, 'id_veiculo': int(id_veiculo), 'id_prestador': int(id_prestador), 
+        'nome_servico': nome_servico, 'data_servico': str(data_servico_dt.date()), 
+        'garantia_dias': str(garantia_dias), 'valor': float(valor), 
+        'km_realizado': str(km_realizado), 'km_proxima_revisao': str(km_proxima_revisao), 
+        'registro': registro, 
+        'data_vencimento': str(data_vencimento.date()) # Campo auxiliar para Dashboards
+    }
+    
+    success, _ = execute_crud_operation('servico', data=data, id_col='id_servico', operation='insert')
+    
+    if success:
+        st.success(f"Serviço '{nome_servico}' cadastrado com sucesso!")
+        if 'edit_service_id' in st.session_state:
+            del st.session_state['edit_service_id']
+        st.rerun()  
+    else:
+        st.error("Falha ao cadastrar serviço.")
+
+def update_service(id_servico, id_veiculo, id_prestador, nome_servico, data_servico, garantia_dias, valor, km_realizado, km_proxima_revisao, registro, expected_version=None):
+    data_servico_dt = pd.to_datetime(data_servico)
+    data_vencimento = data_servico_dt + timedelta(days=int(garantia_dias))
+
+    data = {
+        'id_veiculo': int(id_veiculo), 'id_prestador': int(id_prestador), 
+        'nome_servico': nome_servico, 'data_servico': str(data_servico_dt.date()), 
+        'garantia_dias': str(garantia_dias), 'valor': float(valor), 
+        'km_realizado': str(km_realizado), 'km_proxima_revisao': str(km_proxima_revisao), 
+        'registro': registro,
+        'data_vencimento': str(data_vencimento.date()) # Campo auxiliar para Dashboards
+    }
+    
+    success, _ = execute_crud_operation('servico', data=data, id_col='id_servico', id_value=int(id_servico), operation='update', expected_version=expected_version)
+    
+    if success:
+        st.success(f"Serviço '{nome_servico}' atualizado com sucesso!")
+        forget_row_version('servico', id_servico)
+        if 'edit_service_id' in st.session_state:
+            del st.session_state['edit_service_id']
+        st.rerun()  
+    else:
+        st.error("Falha ao atualizar serviço.")
+
+def delete_service(id_servico, expected_version=None):
+    success, _ = execute_crud_operation('servico', id_col='id_servico', id_value=int(id_servico), operation='delete', expected_version=expected_version)
+    
+    if success:
+        st.success("Serviço removido com sucesso!")
+        forget_row_version('servico', id_servico)
+        _pause_before_rerun()
+        st.rerun()  
+    else:
+        st.error("Falha ao remover serviço.")
+
+# --- Importação em Lote (CSV/Excel) ---
+IMPORT_TABLES = {'Veículo': 'veiculo', 'Prestador': 'prestador', 'Serviço': 'servico'}
+# Colunas lidas do arquivo (o ID é sempre atribuído na importação). Serviços identificam o veículo
+# pela placa e o prestador pela empresa; data_vencimento é calculada.
+IMPORT_COLUMNS = {
+    'veiculo': ['nome', 'placa', 'ano', 'valor_pago', 'data_compra'],
+    'prestador': [c for c in TABLE_COLUMNS['prestador'] if c != 'id_prestador'],
+    'servico': ['placa', 'empresa', 'nome_servico', 'data_servico', 'garantia_dias', 'valor', 'km_realizado', 'km_proxima_revisao', 'registro'],
+}
+IMPORT_REQUIRED = {'veiculo': ['nome', 'placa'], 'prestador': ['empresa'], 'servico': ['placa', 'empresa', 'nome_servico', 'data_servico']}
+
+def read_import_file(uploaded_file):
+    """Lê um CSV (separador detectado automaticamente) ou Excel como texto, com cabeçalhos em minúsculas."""
+    if uploaded_file.name.lower().endswith('.xlsx'):
+        df = pd.read_excel(uploaded_file, dtype=str) # Requer o pacote openpyxl
+    else:
+        df = pd.read_csv(uploaded_file, sep=None, engine='python', dtype=str, encoding='utf-8-sig')
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    return df.fillna('').apply(lambda col: col.str.strip())
+
+def _parse_import_numbers(values):
+    """Texto -> número, aceitando o formato brasileiro (R$ 1.234,56). Vazio ou inválido -> NaN."""
+    text = values.str.replace('R$', '', regex=False).str.strip()
+    brazilian = text.str.contains(',', regex=False)
+    text = text.where(~brazilian, text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    return pd.to_numeric(text, errors='coerce')
+
+def _parse_import_dates(values):
+    """Texto -> data, aceitando AAAA-MM-DD (com ou sem hora, como vem do Excel) e DD/MM/AAAA."""
+    parsed = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    return parsed.fillna(pd.to_datetime(values, format='%d/%m/%Y', errors='coerce'))
+
+def _flag(errors, mask, message):
+    """Acrescenta a mensagem de erro a todas as linhas marcadas em `mask` de uma vez."""
+    errors[mask] = errors[mask] + message + '; '
+
+def _parse_import_column(df, col, parse, errors):
+    """Converte a coluna e marca como erro as células preenchidas que não puderam ser convertidas."""
+    parsed = parse(df[col])
+    _flag(errors, (df[col] != '') & parsed.isna(), f"'{col}' inválido")
+    return parsed
+
+def _unique_in_file_and_table(df, errors, col, existing):
+    """Marca valores de `col` repetidos no arquivo ou já presentes na tabela."""
+    filled = df[col] != ''
+    _flag(errors, filled & df[col].duplicated(keep=False), f"'{col}' repetido no arquivo")
+    if not existing.empty:
+        _flag(errors, filled & df[col].isin(existing[col].astype(str)), f"'{col}' já cadastrado")
+
+def _validate_vehicles(df, errors):
+    _unique_in_file_and_table(df, errors, 'placa', get_data('veiculo'))
+    return pd.DataFrame({
+        'id_veiculo': 0, 'nome': df['nome'], 'placa': df['placa'],
+        'ano': _parse_import_column(df, 'ano', _parse_import_numbers, errors).round().astype('Int32'),
+        'valor_pago': _parse_import_column(df, 'valor_pago', _parse_import_numbers, errors).fillna(0.0),
+        'data_compra': _parse_import_column(df, 'data_compra', _parse_import_dates, errors),
+    })
+
+def _validate_prestadores(df, errors):
+    _unique_in_file_and_table(df, errors, 'empresa', get_data('prestador'))
+    return df.assign(id_prestador=0)[TABLE_COLUMNS['prestador']]
+
+def _validate_services(df, errors):
+    # Resolve placa -> id_veiculo e empresa -> id_prestador com um mapeamento da coluna inteira
+    veiculos, prestadores = get_data('veiculo'), get_data('prestador')
+    placas = dict(zip(veiculos['placa'].astype(str), veiculos['id_veiculo'])) if not veiculos.empty else {}
+    empresas = dict(zip(prestadores['empresa'].astype(str), prestadores['id_prestador'])) if not prestadores.empty else {}
+    id_veiculo = df['placa'].map(placas)
+    id_prestador = df['empresa'].map(empresas)
+    _flag(errors, (df['placa'] != '') & id_veiculo.isna(), "'placa' não cadastrada")
+    _flag(errors, (df['empresa'] != '') & id_prestador.isna(), "'empresa' não cadastrada")
+
+    data_servico = _parse_import_column(df, 'data_servico', _parse_import_dates, errors)
+    garantia_dias = _parse_import_column(df, 'garantia_dias', _parse_import_numbers, errors).fillna(0).round()
+    _flag(errors, garantia_dias < 0, "'garantia_dias' negativo")
+    km = {col: _parse_import_column(df, col, _parse_import_numbers, errors).fillna(0).round().astype(int)
+          for col in ('km_realizado', 'km_proxima_revisao')}
+    return pd.DataFrame({
+        'id_servico': 0, 'id_veiculo': id_veiculo.fillna(0).astype(int), 'id_prestador': id_prestador.fillna(0).astype(int),
+        'nome_servico': df['nome_servico'], 'data_servico': data_servico, 'garantia_dias': garantia_dias.astype(int),
+        'valor': _parse_import_column(df, 'valor', _parse_import_numbers, errors).fillna(0.0),
+        **km, 'registro': df['registro'],
+        'data_vencimento': data_servico + pd.to_timedelta(garantia_dias, unit='D'), # Campo auxiliar para Dashboards
+    })
+
+def validate_import(sheet_name, df_file):
+    """Valida o arquivo inteiro de uma vez.
+
+    Retorna (linhas válidas prontas para gravar, relatório com a linha do arquivo e os erros de cada linha recusada).
+    Lança ValueError se faltar alguma coluna obrigatória.
+    """
+    missing = [col for col in IMPORT_REQUIRED[sheet_name] if col not in df_file.columns]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes no arquivo: {', '.join(missing)}")
+
+    df = df_file.reindex(columns=IMPORT_COLUMNS[sheet_name], fill_value='')
+    errors = pd.Series('', index=df.index)
+    for col in IMPORT_REQUIRED[sheet_name]:
+        _flag(errors, df[col] == '', f"'{col}' vazio")
+    validate = {'veiculo': _validate_vehicles, 'prestador': _validate_prestadores, 'servico': _validate_services}[sheet_name]
+    rows = validate(df, errors)
+
+    ok = errors == ''
+    # Linha 1 do arquivo é o cabeçalho
+    report = pd.DataFrame({'Linha': df.index[~ok] + 2, 'Erros': errors[~ok].str.rstrip('; ')})
+    return rows[ok], report
+
+@timed('crud.import')
+def import_rows(sheet_name, df_valid):
+    """Grava as linhas validadas numa única escrita em lote (IDs reservados de uma vez). Retorna os IDs."""
+    ids = get_backend().insert_rows(sheet_name, df_valid.to_dict('records'), ID_COLUMNS[sheet_name])
+    # A importação não passa pelos deltas dos agregados de gasto: a próxima leitura os recalcula de uma vez
+    clear_data_cache(sheet_name, tracked=False)
+    return ids
+
+# --- FUNÇÃO QUE SIMULA O JOIN DO SQL ---
+
+@timed('view.join')
+def _join_service_tables(servicos, veiculos, prestadores):
+    """Faz o JOIN de serviço com veículo e prestador, ordenado por data (desc).
+
+    As tabelas de entrada já chegam com os tipos de TABLE_SCHEMAS e não são alteradas.
+    """
+    # 1. JOIN com Veículo
+    df_merged = pd.merge(servicos, veiculos[['id_veiculo', 'nome', 'placa']], on='id_veiculo', how='left')
+    
+    # 2. JOIN com Prestador
+    df_merged = pd.merge(df_merged, prestadores[['id_prestador', 'empresa', 'cidade']], on='id_prestador', how='left')
+    
+    # Renomeia colunas para o display
+    df_merged = df_merged.rename(columns={'nome': 'Veículo', 'placa': 'Placa', 'empresa': 'Empresa', 'cidade': 'Cidade', 'nome_servico': 'Serviço', 'data_servico': 'Data', 'valor': 'Valor'})
+
+    # Já ordenada (datas vazias no fim): o filtro por data vira busca binária e não precisa reordenar
+    df_merged = df_merged.sort_values(by='Data', ascending=False, na_position='last', ignore_index=True)
+    df_merged.attrs['dated_rows'] = int(df_merged['Data'].notna().sum())
+    return df_merged
+
+
+@timed('view.date_filter')
+def _slice_by_date(df_merged, date_start, date_end):
+    """Linhas da visão com Data entre `date_start` e `date_end` (inclusive), em O(log n + k).
+
+    As datas preenchidas, lidas de trás para frente, formam um vetor crescente (sem cópia),
+    onde `searchsorted` encontra os dois limites do intervalo.
+    """
+    n_dated = df_merged.attrs['dated_rows']
+    ascending = df_merged['Data'].to_numpy()[:n_dated][::-1]
+    lo = ascending.searchsorted(pd.Timestamp(date_start).to_datetime64(), side='left')
+    hi = ascending.searchsorted(pd.Timestamp(date_end).to_datetime64(), side='right')
+    return df_merged.iloc[n_dated - hi:n_dated - lo]
+
+
+@derived_view(*SERVICE_TABLES)
+@st.cache_resource(max_entries=8) # Visão compartilhada entre abas e sessões, uma por versão dos dados
+def _build_service_view(data_versions, _servicos, _veiculos, _prestadores):
+    """Materializa o JOIN uma única vez por combinação de versões das três abas.
+
+    `data_versions` é a tupla de `attrs['data_version']`; os DataFrames em si não entram no hash.
+    O resultado é compartilhado e deve ser tratado como somente leitura.
+    """
+    df_merged = _join_service_tables(_servicos, _veiculos, _prestadores)
+    df_merged.attrs['data_version'] = '|'.join(data_versions)
+    return df_merged
+
+
+def get_full_service_data(date_start=None, date_end=None):
+    """Lê todos os dados e simula a operação JOIN do SQL no Pandas.
+
+    O JOIN é materializado uma vez por versão dos dados (ver `_build_service_view`) e reaproveitado
+    pelas abas; aqui só se aplica o filtro de datas. O retorno é um snapshot da visão compartilhada
+    (cópia rasa, com copy-on-write): pode ser alterado sem afetar as outras abas e sessões.
+    """
+    
+    # Uma única leitura em lote (e em cache) das três abas
+    tables = get_service_tables()
+    df_servicos = tables['servico']
+    df_veiculos = tables['veiculo']
+    df_prestadores = tables['prestador']
+    
+    if df_servicos.empty or df_veiculos.empty or df_prestadores.empty:
+        return pd.DataFrame()
+    
+    data_versions = tuple(tables[name].attrs.get('data_version') for name in SERVICE_TABLES)
+    if None in data_versions:
+        # Sem versão não há chave segura para o cache: monta a visão sem compartilhá-la
+        df_merged = _join_service_tables(df_servicos, df_veiculos, df_prestadores)
+    else:
+        df_merged = _build_service_view(data_versions, df_servicos, df_veiculos, df_prestadores)
+
+    # 3. Filtragem por Data (se necessário), por busca binária na ordem da visão
+    if date_start and date_end:
+        df_merged = _slice_by_date(df_merged, date_start, date_end)
+        
+    return df_merged.copy(deep=False)
+
+# ==============================================================================
+# 🚨 CSS PERSONALIZADO PARA FORÇAR BOTÕES LADO A LADO NO CELULAR 🚨
+# ==============================================================================
+CUSTOM_CSS = """
+/* Aplica display flex (alinhamento horizontal) e nowrap (não quebrar linha) 
+   aos containers de coluna que envolvem os botões de ação (lápis e lixeira).
+   Isso garante que os botões fiquem lado a lado mesmo em telas muito pequenas. */
+.st-emotion-cache-12fmwza, .st-emotion-cache-n2e28m { /* Classes específicas do Streamlit */
+    display: flex;
+    flex-wrap: nowrap !important;
+    gap: 5px; 
+    align-items: center; 
+}
+
+/* Garante que os containers internos dos botões ocupem o mínimo de espaço */
+.st-emotion-cache-12fmwza > div, .st-emotion-cache-n2e28m > div {
+    min-width: 0 !important;
+    max-width: none !important;
+}
+/* Reduz o padding dos botões para economizar espaço e garantir o alinhamento */
+.st-emotion-cache-n2e28m button, .st-emotion-cache-12fmwza button {
+    padding: 0px 5px !important;
+    line-height: 1.2 !important;
+    font-size: 14px;
+}
+"""
+# ==============================================================================
+
+
+# --- FORMATAÇÃO PARA EXIBIÇÃO ---
+
+def format_brl(values):
+    """Formata uma Series numérica como moeda (R$ 1.234,56), coluna inteira de uma vez."""
+    numbers = values.fillna(0.0)
+    cents = (numbers.abs() * 100).round().astype('int64')
+    reais = (cents // 100).astype(str).str.replace(r'\B(?=(\d{3})+$)', '.', regex=True)
+    sign = pd.Series('', index=numbers.index).mask(numbers < 0, '-')
+    return 'R$ ' + sign + reais + ',' + (cents % 100).astype(str).str.zfill(2)
+
+def format_date(values):
+    """Formata uma Series de datas como dd-mm-YYYY ('N/A' para datas vazias)."""
+    return values.dt.strftime('%d-%m-%Y').fillna('N/A')
+
+MONEY_DISPLAY_COLUMNS = ['Valor', 'Total Gasto em Serviços']
+
+def with_brl_columns(df):
+    """Troca as colunas de dinheiro por texto em R$ (1.234,56), independente do idioma do navegador.
+
+    O valor numérico fica numa coluna oculta ('_' + nome), para ordenações e cálculos feitos no app.
+    """
+    money = [col for col in MONEY_DISPLAY_COLUMNS if col in df.columns]
+    return df.assign(**{f'_{col}': df[col] for col in money}, **{col: format_brl(df[col]) for col in money})
+
+# Formatação das datas e quilometragens feita pelo próprio navegador: essas colunas continuam numéricas/datas,
+# então a ordenação por clique no cabeçalho funciona. O grid não tem moeda em reais: o dinheiro vai como texto
+# (ver with_brl_columns) e a cópia numérica fica oculta.
+DISPLAY_COLUMN_CONFIG = {
+    **{f'_{col}': None for col in MONEY_DISPLAY_COLUMNS},
+    'Data Serviço': st.column_config.DateColumn('Data Serviço', format='DD-MM-YYYY'),
+    'Data Vencimento': st.column_config.DateColumn('Data Vencimento', format='DD-MM-YYYY'),
+    'KM Realizado': st.column_config.NumberColumn('KM Realizado', format='%d km'),
+    'KM Próxima Revisão': st.column_config.NumberColumn('KM Próxima Revisão', format='%d km'),
+}
+
+
+def spend_table(totals, labels, label_col):
+    """Tabela de gastos a partir de {chave: total}, ordenada do maior para o menor.
+
+    `labels` traduz as chaves (ex.: id -> nome do veículo); chaves sem rótulo ficam de fora e
+    rótulos repetidos são somados, como no antigo groupby sobre o JOIN.
+    """
+    keys = pd.Series(list(totals), dtype=object)
+    df = pd.DataFrame({
+        label_col: keys if labels is None else keys.map(labels),
+        'Total Gasto em Serviços': pd.Series(list(totals.values()), dtype=float),
+    })
+    df = df.dropna(subset=[label_col]).groupby(label_col, as_index=False)['Total Gasto em Serviços'].sum()
+    return df.sort_values('Total Gasto em Serviços', ascending=False, ignore_index=True)
+
+@timed('view.history_format')
+def _history_display(df_historico, today):
+    """Monta a tabela do Histórico a partir da visão de serviços (sem alterar a visão)."""
+    hoje = pd.Timestamp(today)
+    # Datas vazias (NaT) são exibidas como a data de hoje, para que 'Dias para Vencer' seja sempre um número
+    data_servico = df_historico['Data'].fillna(hoje)
+    data_vencimento = df_historico['data_vencimento'].fillna(hoje)
+    return with_brl_columns(pd.DataFrame({
+        'Veículo': df_historico['Veículo'],
+        'Serviço': df_historico['Serviço'],
+        'Empresa': df_historico['Empresa'],
+        'Data Serviço': data_servico,
+        'Data Vencimento': data_vencimento,
+        'Dias para Vencer': (data_vencimento - hoje).dt.days,
+        'Cidade': df_historico['Cidade'],
+        'Valor': df_historico['Valor'],
+        'KM Realizado': df_historico['km_realizado'],
+        'KM Próxima Revisão': df_historico['km_proxima_revisao'],
+    }))
+
+@derived_view(*SERVICE_TABLES)
+@st.cache_resource(max_entries=8) # Uma tabela formatada por versão da visão (e por dia, por causa dos prazos)
+def _build_history_display(data_version, today, _df_historico):
+    return _history_display(_df_historico, today)
+
+def get_history_display(df_historico):
+    """Tabela do Histórico pronta para exibição, montada uma única vez por versão dos dados."""
+    data_version = df_historico.attrs.get('data_version')
+    if data_version is None:
+        return _history_display(df_historico, date.today())
+    return _build_history_display(data_version, date.today(), df_historico)
+
+
+# --- COMPONENTES DE DISPLAY ---
+
+LISTING_PAGE_SIZES = [10, 25, 50, 100] # Opções de itens por página nas listagens de manutenção
+
+def paginate_listing(df, key):
+    """Desenha os controles de paginação e retorna só a fatia visível de `df`.
+
+    O tamanho da página e o deslocamento (cursor) ficam no session_state, um par por listagem;
+    apenas as linhas da página atual criam widgets.
+    """
+    offset_key = f'{key}_offset'
+    total = len(df)
+
+    col_size, col_prev, col_info, col_next = st.columns([0.3, 0.15, 0.4, 0.15])
+    with col_size:
+        page_size = st.selectbox("Itens por página", LISTING_PAGE_SIZES, index=1, key=f'{key}_page_size')
+
+    # Alinha o cursor ao início da página (o tamanho pode ter mudado) e ao total (a lista pode ter encolhido)
+    offset = min(st.session_state.get(offset_key, 0), max(total - 1, 0)) // page_size * page_size
+    st.session_state[offset_key] = offset
+
+    with col_prev:
+        if st.button("◀️", key=f'{key}_prev', disabled=offset == 0, help="Página anterior"):
+            st.session_state[offset_key] = offset - page_size
+            st.rerun()
+    with col_next:
+        if st.button("▶️", key=f'{key}_next', disabled=offset + page_size >= total, help="Próxima página"):
+            st.session_state[offset_key] = offset + page_size
+            st.rerun()
+    with col_info:
+        st.caption(f"{offset + 1}–{min(offset + page_size, total)} de {total} · página {offset // page_size + 1} de {-(-total // page_size)}")
+
+    return df.iloc[offset:offset + page_size]
+
+@timed('render.listing')
+def display_vehicle_table_and_actions(df_veiculos_listagem):
+    """Exibe a tabela de veículos, paginada, com layout adaptado para celular."""
+    st.subheader("Manutenção de Veículos Existentes")
+    page = paginate_listing(df_veiculos_listagem, 'veiculos')
+    st.markdown('---') 
+    
+    page = page.assign(valor_display=format_brl(page['valor_pago']))
+    
+    for row in page.to_dict('records'):
+        id_veiculo = int(row['id_veiculo']) 
+        
+        # PROPORÇÃO PARA RESPONSIVIDADE: 85% para Dados, 15% para Ações.
+        col_data, col_actions = st.columns([0.85, 0.15]) 
+        
+        # --- BLOC DE DADOS (COLUNA ESQUERDA) ---
+        with col_data:
+            st.markdown(f"**{row['nome']} ({row['placa']})**")
+            st.markdown(f"Ano: **{row['ano']}**")
+            st.markdown(f"Valor: **{row['valor_display']}**")
+        
+        # --- BLOCO DE AÇÃO (COLUNA DIREITA) ---
+        with col_actions:
+            col_act1, col_act2 = st.columns(2) 
+            
+            with col_act1:
+                if st.button("✏️", key=f"edit_v_{id_veiculo}", help=f"Editar Veículo ID {id_veiculo}"):
+                    st.session_state['edit_vehicle_id'] = id_veiculo
+                    forget_row_version('veiculo', id_veiculo) # O formulário guarda a versão que exibir
+                    st.rerun() 
+
+            with col_act2:
+                if st.button("🗑️", key=f"delete_v_{id_veiculo}", help=f"Excluir Veículo ID {id_veiculo}"):
+                    if st.session_state.get(f'confirm_delete_v_{id_veiculo}', False):
+                        delete_vehicle(id_veiculo, expected_version=seen_row_version('veiculo', id_veiculo))
+                    else:
+                        st.session_state[f'confirm_delete_v_{id_veiculo}'] = True
+                        remember_row_version('veiculo', id_veiculo)
+                        st.rerun() 
+        
+        # Linha de aviso de confirmação de exclusão (fora das colunas)
+        if st.session_state.get(f'confirm_delete_v_{id_veiculo}', False) and not st.session_state.get('edit_vehicle_id'):
+            st.error(f"⚠️ **Clique novamente** no botão 🗑️ acima para confirmar a exclusão do ID {id_veiculo}.")
+        
+        st.markdown("---") 
+            
+@timed('render.listing')
+def display_prestador_table_and_actions(df_prestadores_listagem):
+    """Exibe a tabela de prestadores, paginada, com layout adaptado para celular."""
+    st.subheader("Manutenção de Prestadores Existentes")
+    page = paginate_listing(df_prestadores_listagem, 'prestadores')
+    st.markdown('---') 
+    
+    for row in page.to_dict('records'):
+        id_prestador = int(row['id_prestador']) 
+        
+        # PROPORÇÃO PARA RESPONSIVIDADE
+        col_data, col_actions = st.columns([0.85, 0.15]) 
+        
+        # --- BLOC DA LINHA DE DADOS ---
+        with col_data:
+            st.markdown(f"**{row['empresa']}**")
+            st.markdown(f"Contato: **{row['nome_prestador'] or 'N/A'}**")
+            st.markdown(f"Telefone: **{row['telefone'] or 'N/A'}**")
+            st.markdown(f"Cidade: **{row['cidade'] or 'N/A'}**")
+        
+        # --- BLOCO DE AÇÃO (COLUNA DIREITA) ---
+        with col_actions:
+            col_act1, col_act2 = st.columns(2) 
+            
+            with col_act1:
+                if st.button("✏️", key=f"edit_p_{id_prestador}", help=f"Editar Prestador ID {id_prestador}"):
+                    st.session_state['edit_prestador_id'] = id_prestador
+                    forget_row_version('prestador', id_prestador) # O formulário guarda a versão que exibir
+                    st.rerun() 
+
+            with col_act2:
+                if st.button("🗑️", key=f"delete_p_{id_prestador}", help=f"Excluir Prestador ID {id_prestador}"):
+                    if st.session_state.get(f'confirm_delete_p_{id_prestador}', False):
+                        delete_prestador(id_prestador, expected_version=seen_row_version('prestador', id_prestador))
+                    else:
+                        st.session_state[f'confirm_delete_p_{id_prestador}'] = True
+                        remember_row_version('prestador', id_prestador)
+                        st.rerun() 
+
+        if st.session_state.get(f'confirm_delete_p_{id_prestador}', False) and not st.session_state.get('edit_prestador_id'):
+            st.error(f"⚠️ **Clique novamente** no botão 🗑️ acima para confirmar a exclusão do ID {id_prestador}.")
+            
+        st.markdown("---") 
+
+@timed('render.listing')
+def display_service_table_and_actions(df_servicos_listagem):
+    """Exibe a tabela de serviços, paginada, com layout adaptado para celular."""
+    st.subheader("Manutenção de Serviços Existentes")
+    page = paginate_listing(df_servicos_listagem, 'servicos')
+    st.markdown('---') 
+    
+    # Formata a data só da página visível, de uma vez (a coluna 'Data' já é datetime do Pandas)
+    page = page.assign(data_display=format_date(page['Data']))
+    
+    for row in page.to_dict('records'):
+        # df_servicos_listagem é o resultado de get_full_service_data, que já tem o id_servico
+        id_servico = int(row['id_servico']) 
+        
+        data_display = row['data_display']
+        
+        # PROPORÇÃO PARA RESPONSIVIDADE
+        col_data, col_actions = st.columns([0.85, 0.15]) 
+        
+        # --- BLOC DA LINHA DE DADOS ---
+        with col_data:
+            st.markdown(f"**{row['Veículo']}** - {row['Serviço']}")
+            st.markdown(f"Data: **{data_display}**")
+            st.markdown(f"Empresa: **{row['Empresa']}**")
+
+        # --- BLOCO DE AÇÃO (COLUNA DIREITA) ---
+        with col_actions:
+            col_act1, col_act2 = st.columns(2) 
+
+            with col_act1:
+                if st.button("✏️", key=f"edit_{id_servico}", help=f"Editar Serviço ID {id_servico}"):
+                    st.session_state['edit_service_id'] = id_servico
+                    forget_row_version('servico', id_servico) # O formulário guarda a versão que exibir
+                    st.rerun() 
+
+            with col_act2:
+                if st.button("🗑️", key=f"delete_{id_servico}", help=f"Excluir Serviço ID {id_servico}"):
+                    if st.session_state.get(f'confirm_delete_{id_servico}', False):
+                        delete_service(id_servico, expected_version=seen_row_version('servico', id_servico))
+                    else:
+                        st.session_state[f'confirm_delete_{id_servico}'] = True
+                        remember_row_version('servico', id_servico)
+                        st.rerun() 
+
+        if st.session_state.get(f'confirm_delete_{id_servico}', False) and not st.session_state.get('edit_service_id'):
+            st.error(f"⚠️ **Clique novamente** no botão 🗑️ acima para confirmar a exclusão do ID {id_servico}.")
+
+        st.markdown("---") 
+
+
+# --- Componentes de Gestão Unificada (Cadastro/Manutenção) ---
+
+def manage_vehicle_form():
+    """Formulário unificado para Cadastro e Manutenção de Veículos."""
+    
+    vehicle_id_to_edit = st.session_state.get('edit_vehicle_id', None)
+    is_editing = vehicle_id_to_edit is not None
+    
+    col_header1, col_header2 = st.columns([0.2, 0.8])
+    with col_header1:
+        st.header("Veículo")
+    with col_header2:
+        if not is_editing:
+             if st.button("➕ Novo Veículo", key="btn_novo_veiculo_lista", help="Iniciar um novo cadastro de veículo"):
+                 st.session_state['edit_vehicle_id'] = 'NEW_MODE'
+                 st.rerun()
+
+    if is_editing or st.session_state.get('edit_vehicle_id') == 'NEW_MODE':
+        
+        is_new_mode = st.session_state.get('edit_vehicle_id') == 'NEW_MODE'
+        # ALTERAÇÃO: Chama a nova função de busca de dados
+        df_veiculos = get_data("veiculo")
+
+        if is_new_mode:
+            st.header("➕ Novo Veículo")
+            submit_label = 'Cadastrar Veículo'
+            data = {
+                'nome': '', 'placa': '', 'ano': date.today().year, 
+                'valor_pago': 0.0, 'data_compra': date.today()
+            }
+            if st.button("Cancelar Cadastro / Voltar para Lista"):
+                del st.session_state['edit_vehicle_id']
+                st.rerun()  
+                return
+            
+        else: # MODO EDIÇÃO
+            submit_label = 'Atualizar Veículo'
+            
+            try:
+                selected_row = df_veiculos[df_veiculos['id_veiculo'] == vehicle_id_to_edit].iloc[0]
+            except:
+                st.error("Dados do veículo não encontrados para edição.")
+                del st.session_state['edit_vehicle_id']
+                st.rerun()  
+                return
+            
+            data = selected_row.to_dict()
+            if seen_row_version('veiculo', vehicle_id_to_edit) is None:
+                remember_row_version('veiculo', vehicle_id_to_edit, data)
+            # data_compra já é datetime (TABLE_SCHEMAS); o formulário usa date
+            data['data_compra'] = data['data_compra'].date() if pd.notna(data['data_compra']) else date.today()
+
+            st.header(f"✏️ Editando Veículo ID: {vehicle_id_to_edit}")
+            if st.button("Cancelar Edição / Voltar para Lista"):
+                del st.session_state['edit_vehicle_id']
+                st.rerun()  
+                return
+
+        with st.form(key='manage_vehicle_form_edit'):
+            st.caption("Informações Básicas")
+            vehicle_name = st.text_input("Nome Amigável do Veículo (Ex: Gol do João)", value=data['nome'], max_chars=100)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                placa = st.text_input("Placa", value=data['placa'], max_chars=10)
+            
+            # Ajustando colunas para 2, já que Renavam saiu
+            col3, col4 = st.columns(2)
+            with col3:
+                st.caption("Detalhes de Aquisição")
+                current_year = date.today().year
+                # Converte o ano para int, tratando possíveis erros
+                default_ano = int(data['ano']) if pd.notna(data.get('ano')) and str(data['ano']).isdigit() else current_year
+                ano = st.number_input("Ano do Veículo", min_value=1900, max_value=current_year + 1, value=default_ano, step=1)
+            with col4:
+                st.caption(" ") # Espaço para alinhar com o título acima
+                # Converte o valor para float, tratando possíveis erros
+                default_valor = float(data['valor_pago']) if pd.notna(data.get('valor_pago')) else 0.0
+                valor_pago = st.number_input("Valor Pago (R$)", min_value=0.0, format="%.2f", value=default_valor, step=1000.0)
+            
+            col5, col6 = st.columns(2)
+            with col5:
+                # data_compra já está como date
+                data_compra = st.date_input("Data de Compra", value=data['data_compra'])
+            
+            # O Renavam foi removido, então ele não é passado aqui
+            renavam_dummy = None
+
+            submit_button = st.form_submit_button(label=submit_label)
+
+            if submit_button:
+                if not vehicle_name or not placa:
+                    st.warning("O Nome e a Placa são campos obrigatórios.")
+                elif is_new_mode:
+                    # 🛑 REMOÇÃO 6: Não passar 'renavam_dummy'
+                    insert_vehicle(vehicle_name, placa, ano, valor_pago, data_compra)
+                else:
+                    # 🛑 REMOÇÃO 7: Não passar 'renavam_dummy'
+                    update_vehicle(vehicle_id_to_edit, vehicle_name, placa, ano, valor_pago, data_compra,
+                                   expected_version=seen_row_version('veiculo', vehicle_id_to_edit))
+        
+        return
+
+    # MODO LISTAGEM
+    # ALTERAÇÃO: Chama a nova função de busca de dados
+    df_veiculos_listagem = get_data("veiculo")
+    # Simula o 'ORDER BY nome'
+    if not df_veiculos_listagem.empty:
+        df_veiculos_listagem = df_veiculos_listagem.sort_values(by='nome')
+        display_vehicle_table_and_actions(df_veiculos_listagem)
+    else:
+        st.info("Nenhum veículo cadastrado. Clique em '➕ Novo Veículo' para começar.")
+        st.markdown("---")
+
+def manage_prestador_form():
+    """Formulário unificado para Cadastro e Manutenção de Prestadores."""
+    
+    prestador_id_to_edit = st.session_state.get('edit_prestador_id', None)
+    is_editing = prestador_id_to_edit is not None
+    
+    col_header1, col_header2 = st.columns([0.2, 0.8])
+    with col_header1:
+        st.header("Prestador")
+    with col_header2:
+        if not is_editing:
+             if st.button("➕ Novo Prestador", key="btn_novo_prestador_lista", help="Iniciar um novo cadastro de prestador"):
+                 st.session_state['edit_prestador_id'] = 'NEW_MODE'
+                 st.rerun()
+
+    if is_editing or st.session_state.get('edit_prestador_id') == 'NEW_MODE':
+
+        is_new_mode = st.session_state.get('edit_prestador_id') == 'NEW_MODE'
+        # ALTERAÇÃO: Chama a nova função de busca de dados
+        df_prestadores = get_data("prestador")
+
+        if is_new_mode:
+            st.header("➕ Novo Prestador")
+            submit_label = 'Cadastrar Prestador'
+            data = {
+                'empresa': '', 'telefone': '', 'nome_prestador': '', 'cnpj': '', 'email': '',
+                'endereco': '', 'numero': '', 'cidade': '', 'bairro': '', 'cep': ''
+            }
+            if st.button("Cancelar Cadastro / Voltar para Lista"):
+                del st.session_state['edit_prestador_id']
+                st.rerun()  
+                return
+
+        else: # MODO EDIÇÃO
+            submit_label = 'Atualizar Prestador'
+            try:
+                selected_row = df_prestadores[df_prestadores['id_prestador'] == prestador_id_to_edit].iloc[0]
+            except:
+                st.error("Dados do prestador não encontrados para edição.")
+                del st.session_state['edit_prestador_id']
+                st.rerun()  
+                return
+
+            data = selected_row.to_dict()
+            if seen_row_version('prestador', prestador_id_to_edit) is None:
+                remember_row_version('prestador', prestador_id_to_edit, data)
+            st.header(f"✏️ Editando Prestador ID: {prestador_id_to_edit}")
+            
+            if st.button("Cancelar Edição / Voltar para Lista"):
+                del st.session_state['edit_prestador_id']
+                st.rerun()  
+                return
+
+        with st.form(key='manage_prestador_form_edit'):
+            st.caption("Dados da Empresa")
+            company_name = st.text_input("Nome da Empresa/Oficina (Obrigatório)", value=data['empresa'], max_chars=100, disabled=(not is_new_mode))
+            
+            col_p1, col_p2 = st.columns(2)
+            with col_p1:
+                telefone = st.text_input("Telefone da Empresa", value=data['telefone'] or "", max_chars=20)
+            with col_p2:
+                nome_prestador = st.text_input("Nome do Prestador/Contato", value=data['nome_prestador'] or "", max_chars=100)
+            
+            col_p3, col_p4 = st.columns(2) 
+            with col_p3:
+                cnpj = st.text_input("CNPJ", value=data['cnpj'] or "", max_chars=18)
+            with col_p4:
+                email = st.text_input("E-mail", value=data['email'] or "", max_chars=100)
+            
+            st.caption("Endereço")
+            col_addr1, col_addr2 = st.columns([3, 1])
+            with col_addr1:
+                endereco = st.text_input("Endereço (Rua, Av.)", value=data['endereco'] or "", max_chars=255)
+            with col_addr2:
+                numero = st.text_input("Número", value=data['numero'] or "", max_chars=20)
+
+            col_addr3, col_addr4, col_addr5 = st.columns([2, 2, 1])
+            with col_addr3:
+                bairro = st.text_input("Bairro", value=data['bairro'] or "", max_chars=100)
+            with col_addr4:
+                cidade = st.text_input("Cidade", value=data['cidade'] or "", max_chars=100)
+            with col_addr5:
+                cep = st.text_input("CEP", value=data['cep'] or "", max_chars=20)
+                
+            submit_button = st.form_submit_button(label=submit_label)
+            
+            if submit_button:
+                if not company_name:
+                    st.warning("O nome da empresa é obrigatório.")
+                    return
+                
+                args = (company_name, telefone, nome_prestador, cnpj, email, endereco, numero, cidade, bairro, cep)
+
+                if is_new_mode:
+                    insert_new_prestador(*args)
+                else:
+                    update_prestador(prestador_id_to_edit, *args, expected_version=seen_row_version('prestador', prestador_id_to_edit))
+        
+        return
+    
+    # MODO LISTAGEM
+    # ALTERAÇÃO: Chama a nova função de busca de dados
+    df_prestadores_listagem = get_data("prestador")
+    # Simula o 'ORDER BY empresa'
+    if not df_prestadores_listagem.empty:
+        df_prestadores_listagem = df_prestadores_listagem.sort_values(by='empresa')
+        display_prestador_table_and_actions(df_prestadores_listagem)
+    else:
+        st.info("Nenhum prestador cadastrado. Clique em '➕ Novo Prestador' para começar.")
+        st.markdown("---")
+
+def manage_service_form():
+    """Gerencia o fluxo de Novo Cadastro, Edição e Listagem/Filtro de Serviços."""
+    
+    # Usa a mesma leitura em lote de get_full_service_data (uma requisição para as três abas)
+    tables = get_service_tables()
+    df_veiculos = tables['veiculo']
+    df_prestadores = tables['prestador']
+    if df_veiculos.empty or df_prestadores.empty:
+        st.warning("⚠️ Por favor, cadastre pelo menos um veículo e um prestador primeiro.")
+        return
+
+    df_veiculos = df_veiculos.sort_values(by='nome')
+    df_prestadores = df_prestadores.sort_values(by='empresa')
+    
+    df_veiculos['display_name'] = df_veiculos['nome'].astype(str) + ' (' + df_veiculos['placa'].astype(str) + ')'
+    veiculos_map = pd.Series(df_veiculos.id_veiculo.values, index=df_veiculos.display_name).to_dict()
+    veiculos_nomes = list(df_veiculos['display_name'])
+    prestadores_nomes = list(df_prestadores['empresa']) 
+    
+    service_id_to_edit = st.session_state.get('edit_service_id', None)
+    is_editing = service_id_to_edit is not None
+    
+    col_header1, col_header2 = st.columns([0.2, 0.8])
+    with col_header1:
+        st.header("Serviço")
+    with col_header2:
+        if not is_editing:
+             if st.button("➕ Novo Serviço", key="btn_novo_servico_lista", help="Iniciar um novo cadastro de serviço"):
+                 st.session_state['edit_service_id'] = 'NEW_MODE'
+                 st.rerun()
+
+    if is_editing or st.session_state.get('edit_service_id') == 'NEW_MODE':
+        
+        is_new_mode = st.session_state.get('edit_service_id') == 'NEW_MODE'
+        
+        if is_new_mode:
+             st.header("➕ Novo Serviço")
+             submit_label = 'Cadastrar Serviço'
+             data = {
+                 'nome_servico': '', 'registro': '', 'data_servico': date.today(), 
+                 'garantia_dias': 90, 'valor': 0.0, 'km_realizado': 0, 'km_proxima_revisao': 0
+             }
+             selected_vehicle_idx = 0
+             selected_prestador_idx = 0
+             
+             if st.button("Cancelar Cadastro / Voltar para Lista"):
+                 del st.session_state['edit_service_id']
+                 st.rerun()  
+                 return
+        
+        else: # MODO EDIÇÃO
+            submit_label = 'Atualizar Serviço'
+            
+            try:
+                # ALTERAÇÃO: Chama a nova função de busca com filtro
+                df_data = get_data("servico", "id_servico", int(service_id_to_edit))
+            except Exception as e:
+                st.error(f"Erro ao buscar dados do serviço ID {service_id_to_edit}: {e}")
+                df_data = pd.DataFrame()
+            
+            if df_data.empty:
+                st.error("Dados do serviço não encontrados para edição.")
+                del st.session_state['edit_service_id']
+                st.rerun()  
+                return
+                
+            data = df_data.iloc[0].to_dict()
+            if seen_row_version('servico', service_id_to_edit) is None:
+                remember_row_version('servico', service_id_to_edit, data)
+            st.header(f"✏️ Editando Serviço ID: {service_id_to_edit}")
+            
+            # Garante que os IDs de Veículo e Prestador sejam inteiros
+            current_id_veiculo = int(data['id_veiculo'])
+            current_id_prestador = int(data['id_prestador'])
+
+            # Busca os nomes para preencher o selectbox (JOIN manual)
+            current_vehicle_row = df_veiculos[df_veiculos['id_veiculo'] == current_id_veiculo].iloc[0]
+            current_vehicle_name = current_vehicle_row['display_name']
+            
+            current_prestador_name = df_prestadores[df_prestadores['id_prestador'] == current_id_prestador].iloc[0]['empresa']
+            
+            # Encontra os índices
+            selected_vehicle_idx = veiculos_nomes.index(current_vehicle_name)
+            selected_prestador_idx = prestadores_nomes.index(current_prestador_name) if current_prestador_name in prestadores_nomes else 0
+            
+            # data_servico já é datetime (TABLE_SCHEMAS); o formulário usa date
+            data['data_servico'] = data['data_servico'].date() if pd.notna(data['data_servico']) else date.today()
+
+            if st.button("Cancelar Edição / Voltar para Lista"):
+                del st.session_state['edit_service_id']
+                st.rerun()  
+                return
+
+        # --- FORMULÁRIO (Novo Cadastro ou Edição) ---
+        with st.form(key='manage_service_form_edit'):
+            
+            st.caption("Veículo e Prestador")
+            selected_vehicle = st.selectbox("Veículo", veiculos_nomes, index=selected_vehicle_idx, key="edit_service_vehicle", help="Comece a digitar para buscar o veículo.")
+            selected_company_name = st.selectbox("Nome da Empresa/Oficina", prestadores_nomes, index=selected_prestador_idx, key='edit_service_company', help="Comece a digitar para buscar a empresa.")
+
+            st.caption("Detalhes do Serviço")
+            service_name = st.text_input("Nome do Serviço", value=data['nome_servico'], max_chars=100)
+            
+            registro = st.text_input("Registro Adicional (Ex: N° NF, Código)", value=data.get('registro') or "", max_chars=50) 
+            
+            default_service_date = data['data_servico']
+            service_date = st.date_input("Data do Serviço", value=default_service_date)
+            
+            col_s1, col_s2, col_s3, col_s4 = st.columns(4)
+            with col_s1:
+                default_garantia = int(data['garantia_dias']) if pd.notna(data.get('garantia_dias')) and str(data.get('garantia_dias')).isdigit() else 90
+                garantia = st.number_input("Garantia (Dias)", min_value=0, max_value=3650, value=default_garantia, step=1)
+            with col_s2:
+                default_valor = float(data['valor']) if pd.notna(data.get('valor')) else 0.0
+                value = st.number_input("Valor (R$)", min_value=0.0, format="%.2f", value=default_valor, step=10.0)
+            with col_s3:
+                default_km_current = int(data['km_realizado']) if pd.notna(data.get('km_realizado')) and str(data.get('km_realizado')).isdigit() else 0
+                km_realizado = st.number_input("KM Realizado", min_value=0, value=default_km_current, step=100)
+            with col_s4:
+                default_km_next = int(data['km_proxima_revisao']) if pd.notna(data.get('km_proxima_revisao')) and str(data.get('km_proxima_revisao')).isdigit() else 0
+                km_next = st.number_input("KM Próxima Revisão", min_value=0, value=default_km_next, step=1000)
+                
+            submit_button = st.form_submit_button(label=submit_label)
+
+            if submit_button:
+                if not selected_company_name:
+                     st.error("Por favor, selecione uma Empresa/Oficina válida.")
+                     return
+                if not service_name:
+                    st.warning("Preencha o Nome do Serviço.")
+                    return
+
+                new_id_veiculo = int(veiculos_map[selected_vehicle])
+                prestador_row = df_prestadores[df_prestadores['empresa'] == selected_company_name]
+                new_id_prestador = int(prestador_row.iloc[0]['id_prestador'])
+
+                args_service = (
+                    new_id_veiculo, new_id_prestador, service_name, service_date, garantia, 
+                    value, km_realizado, km_next, registro
+                )
+
+                if is_new_mode:
+                    insert_service(*args_service)
+                else:
+                    update_service(int(service_id_to_edit), *args_service, expected_version=seen_row_version('servico', service_id_to_edit))
+        
+        return
+
+    # --- MODO LISTAGEM / MANUTENÇÃO ---
+    else: 
+        st.subheader("Manutenção de Serviços Existentes (Filtro e Edição)")
+        
+        col_filtro1, col_filtro2 = st.columns(2)
+        with col_filtro1:
+            date_end_default = date.today()
+            date_start_default = date_end_default - timedelta(days=90)
+            date_start = st.date_input("Filtrar por Data de Início", value=date_start_default)
+        with col_filtro2:
+            date_end = st.date_input("Filtrar por Data Final", value=date_end_default)
+
+        # ALTERAÇÃO: Chama a função de JOIN e Filtro no Pandas
+        df_servicos_listagem = get_full_service_data(date_start, date_end)
+        
+        if not df_servicos_listagem.empty:
+            # Filtra colunas necessárias para o display_service_table_and_actions
+            df_servicos_display = df_servicos_listagem[['id_servico', 'Veículo', 'Serviço', 'Data', 'Empresa']]
+            display_service_table_and_actions(df_servicos_display)
+        else:
+            st.info("Nenhum serviço encontrado no período selecionado.")
+
+def manage_bulk_import():
+    """Importação em lote de veículos, prestadores ou serviços a partir de um arquivo CSV/Excel."""
+    st.subheader("Importação em Lote (CSV/Excel)")
+    label = st.selectbox("Tabela de destino", list(IMPORT_TABLES), key='import_table')
+    sheet_name = IMPORT_TABLES[label]
+    st.caption(
+        f"Colunas do arquivo: {', '.join(IMPORT_COLUMNS[sheet_name])}. "
+        f"Obrigatórias: {', '.join(IMPORT_REQUIRED[sheet_name])}. Datas em AAAA-MM-DD ou DD/MM/AAAA."
+    )
+
+    # Trocar a chave do upload limpa o arquivo depois de uma importação concluída
+    upload_key = st.session_state.setdefault('import_upload_key', 0)
+    uploaded = st.file_uploader("Arquivo", type=['csv', 'xlsx'], key=f'import_file_{upload_key}')
+    if uploaded is None:
+        return
+
+    try:
+        df_valid, report = validate_import(sheet_name, read_import_file(uploaded))
+    except ImportError:
+        st.error("Para importar arquivos Excel, instale o pacote 'openpyxl' (ou salve a planilha como CSV).")
+        return
+    except Exception as e:
+        st.error(f"Não foi possível ler o arquivo: {e}")
+        return
+
+    col1, col2 = st.columns(2)
+    col1.metric("Linhas válidas", len(df_valid))
+    col2.metric("Linhas com erro", len(report))
+    if not report.empty:
+        st.dataframe(report, hide_index=True, width='stretch')
+        st.download_button(
+            "Baixar relatório de erros (CSV)", report.to_csv(index=False).encode('utf-8-sig'),
+            file_name=f'erros_importacao_{sheet_name}.csv', mime='text/csv'
+        )
+
+    if st.button(f"Importar {len(df_valid)} linha(s) válida(s)", type='primary', disabled=df_valid.empty):
+        try:
+            ids = import_rows(sheet_name, df_valid)
+        except Exception as e:
+            st.error(f"Erro ao importar para a sheet '{sheet_name}': {e}")
+            return
+        st.session_state['import_upload_key'] = upload_key + 1
+        st.success(f"{len(ids)} registro(s) importado(s) em '{label}'.")
+        time.sleep(1)
+        st.rerun()
+
+def show_perf_panel():
+    """Aba de diagnóstico: latências por span, chamadas à API por execução e exportação das medições."""
+    perf = get_perf()
+    api = get_api_metrics().snapshot()
+    st.header("Diagnóstico de Desempenho")
+    st.caption(f"Percentis das últimas {PERF_BUFFER_SIZE} medições do processo (ms).")
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Chamadas à API", api['calls'])
+    col2.metric("Aguardaram o limitador", api['throttled'])
+    col3.metric("Repetidas", api['retried'])
+    col4.metric("Falharam", api['failed'])
+
+    st.subheader("Latência por etapa")
+    st.dataframe(perf.summary().sort_values('total_ms', ascending=False), hide_index=True, width='stretch')
+    st.subheader("Últimas execuções")
+    st.dataframe(perf.runs(), hide_index=True, width='stretch')
+
+    api_counters = {f'sheets_api.{key}': value for key, value in api.items() if isinstance(value, (int, float))}
+    col_json, col_prom = st.columns(2)
+    col_json.download_button("Exportar JSON", perf.to_json({'sheets_api': api}), file_name='movdrive_perf.json', mime='application/json')
+    col_prom.download_button("Exportar Prometheus", perf.to_prometheus(api_counters), file_name='movdrive_perf.prom', mime='text/plain')
+
+# --- Layout Principal do Streamlit ---
+
+def main():
+    """Função principal que organiza as abas do aplicativo."""
+    # 🚨 PASSO 1: INJETAR O CSS PERSONALIZADO (APLICA O TRUQUE DE RESPONSIVIDADE)
+    st.markdown(f"<style>{CUSTOM_CSS}</style>", unsafe_allow_html=True)
+    
+    # Configuração de Página
+    st.set_page_config(page_title="Controle Automotivo", layout="wide") 
+    st.title("🚗 Sistema de Controle Automotivo")
+    freshness_slot = st.empty() # Preenchido no fim, depois que as abas leram os dados
+
+    # Modo write-behind: avisa sobre alterações ainda não gravadas e falhas de envio
+    if WRITE_BEHIND:
+        show_write_behind_status()
+    if STORAGE_BACKEND != 'sqlite':
+        show_api_status()
+
+    # Inicialização do State
+    if 'edit_service_id' not in st.session_state:
+        st.session_state['edit_service_id'] = None
+    if 'edit_vehicle_id' not in st.session_state:
+        st.session_state['edit_vehicle_id'] = None
+    if 'edit_prestador_id' not in st.session_state:
+        st.session_state['edit_prestador_id'] = None
+
+    # Abas (a de diagnóstico só aparece com PERF_ADMIN_KEY configurada e ?admin=<PERF_ADMIN_KEY> na URL)
+    show_admin = bool(PERF_ADMIN_KEY) and st.query_params.get('admin') == PERF_ADMIN_KEY
+    tabs = st.tabs(["📊 Resumo de Gastos", "📈 Histórico Detalhado", "➕ Cadastro e Manutenção"] + (["🛠️ Desempenho"] if show_admin else []))
+    tab_resumo, tab_historico, tab_cadastro = tabs[:3]
+
+    # ----------------------------------------------------
+    # 1. DASHBOARD: RESUMO DE GASTOS
+    # ----------------------------------------------------
+    with tab_resumo, perf_span('render.resumo'):
+        st.header("Resumo de Gastos por Veículo")
+
+        # Totais mantidos por deltas a cada escrita: a aba não depende do tamanho do histórico
+        gastos = get_spend_aggregates()
+        df_veiculos = get_data('veiculo')
+
+        resumo = pd.DataFrame()
+        if gastos and not df_veiculos.empty:
+            resumo = spend_table(gastos['by_vehicle'], dict(zip(df_veiculos['id_veiculo'], df_veiculos['nome'])), 'Veículo')
+
+        if not resumo.empty:
+            # Ordenadas pelo total numérico; o R$ em pt-BR só entra na exibição
+            st.dataframe(with_brl_columns(resumo), hide_index=True, width='stretch', column_config=DISPLAY_COLUMN_CONFIG)
+
+            with st.expander("Gastos por prestador"):
+                df_prestadores = get_data('prestador')
+                empresas = dict(zip(df_prestadores['id_prestador'], df_prestadores['empresa'])) if not df_prestadores.empty else {}
+                st.dataframe(with_brl_columns(spend_table(gastos['by_provider'], empresas, 'Empresa')), hide_index=True, width='stretch', column_config=DISPLAY_COLUMN_CONFIG)
+
+            with st.expander("Gastos por mês"):
+                por_mes = spend_table(gastos['by_month'], None, 'Mês').sort_values('Mês', ascending=False)
+                st.dataframe(with_brl_columns(por_mes), hide_index=True, width='stretch', column_config=DISPLAY_COLUMN_CONFIG)
+            
+        else:
+            st.info("Nenhum dado de serviço encontrado para calcular o resumo.")
+
+    # ----------------------------------------------------
+    # 2. DASHBOARD: HISTÓRICO DETALHADO
+    # ----------------------------------------------------
+    with tab_historico, perf_span('render.historico'):
+        st.header("Histórico Completo de Serviços")
+        
+        df_historico = get_full_service_data()
+
+        if not df_historico.empty:
+            st.write("### Tabela Detalhada de Serviços")
+            
+            # Colunas de exibição montadas (e guardadas em cache) por versão dos dados; a visão compartilhada não é alterada
+            df_historico_display = get_history_display(df_historico)
+            
+            st.dataframe(df_historico_display, width='stretch', hide_index=True, column_config=DISPLAY_COLUMN_CONFIG)
+            
+        else:
+            st.info("Nenhum serviço encontrado. Por favor, cadastre um serviço na aba 'Cadastro'.")
+
+    # ----------------------------------------------------
+    # 3. CADASTRO / MANUTENÇÃO UNIFICADA
+    # ----------------------------------------------------
+    with tab_cadastro, perf_span('render.cadastro'):
+        st.header("Gestão de Dados (Cadastro e Edição)")
+        
+        if 'cadastro_choice_unificado' not in st.session_state:
+            st.session_state.cadastro_choice_unificado = "Veículo" 
+            
+        choice = st.radio("Selecione a Tabela para Gerenciar:", ["Veículo", "Prestador", "Serviço", "Importar Arquivo"], horizontal=True, key='cadastro_choice_unificado')
+        st.markdown("---")
+
+        if choice == "Veículo":
+            manage_vehicle_form()
+        elif choice == "Prestador":
+            manage_prestador_form()
+        elif choice == "Serviço":
+            manage_service_form()
+        elif choice == "Importar Arquivo":
+            manage_bulk_import()
+
+    if show_admin:
+        with tabs[3]:
+            show_perf_panel()
+
+    with freshness_slot:
+        show_data_freshness()
+
+if __name__ == '__main__':
+
+    with get_perf().rerun():
+        main()
@@ -0,0 +1,5 @@
+"""Ponto de entrada do app para o AppTest nos benchmarks: usa o módulo `app` já importado (e já ligado ao fake)."""
+import app
+
+with app.get_perf().rerun():
+    app.main()
@@ -0,0 +1,234 @@
+"""Fake em memória da API do gspread usada pelo app (planilha, abas e valores), sem rede.
+
+Cada chamada que no gspread real seria uma requisição HTTP é contada em `FakeSheetsClient.calls`
+e pode esperar uma latência injetada, para que os benchmarks meçam o custo de I/O do app.
+Os valores ficam guardados como texto, como o Sheets os devolve.
+"""
+import collections
+import random
+import threading
+import time
+
+import gspread
+from gspread.utils import a1_range_to_grid_range
+
+
+class _ErrorResponse:
+    """Resposta mínima para montar um gspread.exceptions.APIError."""
+
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.text = message
+        self._message = message
+
+    def json(self):
+        return {'error': {'code': self.status_code, 'message': self._message, 'status': 'INVALID_ARGUMENT'}}
+
+
+def _tab_name(range_name):
+    return range_name.split('!')[0].strip("'")
+
+
+def _grid(range_name):
+    a1 = range_name.split('!')[1] if '!' in range_name else range_name
+    return a1_range_to_grid_range(a1)
+
+
+class FakeSheetsClient:
+    """Cliente fake: `open_by_key` devolve sempre a mesma planilha em memória.
+
+    `latency` (segundos) é a espera por chamada; `jitter` soma uma espera aleatória de até esse valor.
+    """
+
+    def __init__(self, tables, latency=0.0, jitter=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = collections.Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock() # A API serializa as escritas de uma planilha; aqui também
+        self.spreadsheet = FakeSpreadsheet(self, tables)
+
+    def _call(self, name):
+        """Conta a chamada e espera a latência injetada (fora do lock, como uma requisição concorrente)."""
+        with self._lock:
+            self.calls[name] += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+    def reset_calls(self):
+        with self._lock:
+            calls = dict(self.calls)
+            self.calls.clear()
+        return calls
+
+    def open_by_key(self, key):
+        self._call('open_by_key')
+        return self.spreadsheet
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, tables):
+        self.client = client
+        self.id = 'fake-spreadsheet'
+        self.tabs = {name: FakeWorksheet(client, name, rows) for name, rows in tables.items()}
+
+    def worksheet(self, title):
+        self.client._call('worksheet')
+        if title not in self.tabs:
+            raise gspread.WorksheetNotFound(title)
+        return self.tabs[title]
+
+    def add_worksheet(self, title, rows=100, cols=26, **kwargs):
+        self.client._call('add_worksheet')
+        with self.client._lock:
+            if title in self.tabs:
+                raise gspread.exceptions.APIError(_ErrorResponse(400, f'A sheet with the name "{title}" already exists.'))
+            self.tabs[title] = FakeWorksheet(self.client, title, [])
+            return self.tabs[title]
+
+    def values_batch_get(self, ranges, params=None):
+        self.client._call('values_batch_get')
+        with self.client._lock:
+            missing = [r for r in ranges if _tab_name(r) not in self.tabs]
+            if missing:
+                raise gspread.exceptions.APIError(_ErrorResponse(400, f'Unable to parse range: {missing[0]}'))
+            return {'valueRanges': [{'range': r, 'values': self.tabs[_tab_name(r)].snapshot()} for r in ranges]}
+
+    def values_get(self, range_name, params=None):
+        self.client._call('values_get')
+        with self.client._lock:
+            name = _tab_name(range_name)
+            if name not in self.tabs:
+                raise gspread.exceptions.APIError(_ErrorResponse(400, f'Unable to parse range: {range_name}'))
+            grid = _grid(range_name) if '!' in range_name else {}
+            first = grid.get('startRowIndex', 0)
+            return {'range': range_name, 'values': self.tabs[name].snapshot()[first:]}
+
+
+class FakeWorksheet:
+    def __init__(self, client, title, rows):
+        self.client = client
+        self.title = title
+        self.id = abs(hash(title)) % 10**9
+        self.rows = [[str(value) for value in row] for row in rows]
+
+    @property
+    def row_count(self):
+        return max(len(self.rows), 1000)
+
+    @property
+    def col_count(self):
+        return max((len(row) for row in self.rows), default=26)
+
+    def snapshot(self):
+        """Cópia das linhas sem as células vazias do fim, como o Sheets devolve."""
+        out = []
+        for row in self.rows:
+            end = len(row)
+            while end and row[end - 1] == '':
+                end -= 1
+            out.append(row[:end])
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def _value(self, row, col):
+        try:
+            return self.rows[row][col]
+        except IndexError:
+            return ''
+
+    def _write(self, range_name, values):
+        grid = _grid(range_name)
+        row0, col0 = grid.get('startRowIndex', 0), grid.get('startColumnIndex', 0)
+        for i, values_row in enumerate(values):
+            while len(self.rows) <= row0 + i:
+                self.rows.append([])
+            row = self.rows[row0 + i]
+            for j, value in enumerate(values_row):
+                while len(row) <= col0 + j:
+                    row.append('')
+                row[col0 + j] = '' if value is None else str(value)
+
+    def row_values(self, row):
+        self.client._call('row_values')
+        with self.client._lock:
+            return self.snapshot()[row - 1] if row - 1 < len(self.rows) else []
+
+    def col_values(self, col):
+        self.client._call('col_values')
+        with self.client._lock:
+            values = [self._value(r, col - 1) for r in range(len(self.rows))]
+        while values and values[-1] == '':
+            values.pop()
+        return values
+
+    def cell(self, row, col):
+        self.client._call('cell')
+        with self.client._lock:
+            return gspread.Cell(row, col, self._value(row - 1, col - 1))
+
+    def acell(self, label):
+        self.client._call('acell')
+        row, col = gspread.utils.a1_to_rowcol(label)
+        with self.client._lock:
+            return gspread.Cell(row, col, self._value(row - 1, col - 1))
+
+    def update(self, values, range_name='A1', **kwargs):
+        self.client._call('update')
+        with self.client._lock:
+            self._write(range_name, values)
+
+    def batch_update(self, data, **kwargs):
+        self.client._call('batch_update')
+        with self.client._lock:
+            for item in data:
+                self._write(item['range'], item['values'])
+
+    def batch_clear(self, ranges):
+        self.client._call('batch_clear')
+        with self.client._lock:
+            for range_name in ranges:
+                grid = _grid(range_name)
+                for r in range(grid.get('startRowIndex', 0), min(grid.get('endRowIndex', len(self.rows)), len(self.rows))):
+                    row = self.rows[r]
+                    for c in range(grid.get('startColumnIndex', 0), min(grid.get('endColumnIndex', len(row)), len(row))):
+                        row[c] = ''
+            while self.rows and not any(self.rows[-1]):
+                self.rows.pop()
+
+    def clear(self):
+        self.client._call('clear')
+        with self.client._lock:
+            self.rows = []
+
+    def append_rows(self, values, **kwargs):
+        """Acrescenta após a última linha com dados e devolve o intervalo gravado, como a API."""
+        self.client._call('append_rows')
+        with self.client._lock:
+            while self.rows and not any(self.rows[-1]):
+                self.rows.pop()
+            first = len(self.rows) + 1
+            self.rows.extend([['' if value is None else str(value) for value in row] for row in values])
+            last_col = gspread.utils.rowcol_to_a1(1, max((len(row) for row in values), default=1))[:-1]
+            return {'updates': {'updatedRange': f"'{self.title}'!A{first}:{last_col}{len(self.rows)}", 'updatedRows': len(values)}}
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def delete_rows(self, start_index, end_index=None):
+        self.client._call('delete_rows')
+        with self.client._lock:
+            del self.rows[start_index - 1:end_index or start_index]
+
+
+def install(app, client):
+    """Faz o app usar `client` no lugar do cliente autenticado e descarta os recursos em cache.
+
+    `app` é o módulo do app já importado. Os caches de recursos (backend, handles, dados) são
+    esvaziados para que nada criado com outro cliente seja reaproveitado.
+    """
+    app.get_gspread_client = lambda: client
+    app.st.cache_resource.clear()
+    return client
@@ -0,0 +1,301 @@
+"""Teste de carga: várias sessões simultâneas do app (AppTest) contra o fake do Google Sheets.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/load_test.py --sessions 20 --actions 30 --services 10000 --latency-ms 150 --output carga.json
+
+Cada sessão é um AppTest próprio (session_state próprio) rodando `main()` no mesmo processo, e
+portanto compartilhando os caches de processo do app, como as sessões de um servidor Streamlit.
+As sessões sorteiam ações:
+  browse   troca a tabela da aba de cadastro (as abas do st.tabs são renderizadas a cada execução)
+  filter   filtra a listagem de serviços por um intervalo de datas
+  edit     abre um serviço "disputado" pelo lápis e grava KM Realizado = valor exibido + 1
+  insert   cadastra um serviço novo pelo formulário
+
+Ao fim, cada edição aceita deveria ter somado 1 ao KM do serviço: a diferença entre as edições
+aceitas e o KM final na planilha fake é o número de atualizações perdidas. Edições recusadas por
+conflito (o registro mudou depois de aberto) não são perdas: o usuário foi avisado.
+"""
+import argparse
+import collections
+import datetime
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+APP_ENTRY = os.path.join(HERE, 'app_entry.py')
+
+os.environ.setdefault('STORAGE_BACKEND', 'sheets')
+os.environ['WARM_CACHE_DIR'] = ''
+os.environ.setdefault('SHEETS_RATE_PER_MINUTE', '1000000')
+os.environ.setdefault('WRITE_BEHIND_JOURNAL', os.path.join(tempfile.mkdtemp(), 'journal.db'))
+sys.path[:0] = [ROOT, HERE]
+
+from unittest.mock import MagicMock # noqa: E402
+
+import streamlit.config # noqa: E402
+import streamlit.testing.v1.app_test as app_test # noqa: E402
+from streamlit.runtime import Runtime # noqa: E402
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager # noqa: E402
+from streamlit.runtime.media_file_manager import MediaFileManager # noqa: E402
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage # noqa: E402
+from streamlit.testing.v1 import AppTest # noqa: E402
+
+logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+
+import app # noqa: E402
+import fake_sheets # noqa: E402
+import synthetic # noqa: E402
+
+ACTIONS = {'browse': 3, 'filter': 3, 'edit': 3, 'insert': 1} # Pesos do sorteio
+HOT_DATE = datetime.date(2026, 12, 31) # Data exclusiva dos serviços disputados: um filtro mostra só eles
+FILTER_RANGE = (datetime.date(2019, 1, 1), datetime.date(2026, 6, 30))
+KM_COLUMN = 'km_realizado'
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))], 2) if ordered else None
+
+
+def _latency(values):
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values), 'p50_ms': _percentile(values, 0.5), 'p95_ms': _percentile(values, 0.95),
+        'p99_ms': _percentile(values, 0.99), 'max_ms': round(max(values), 2), 'mean_ms': round(statistics.mean(values), 2),
+    }
+
+
+def build_tables(n_services, n_hot, seed):
+    """Frota sintética em que os `n_hot` primeiros serviços têm a data HOT_DATE."""
+    tables = synthetic.generate_fleet(n_services, seed=seed)
+    header = tables['servico'][0]
+    date_col, due_col = header.index('data_servico'), header.index('data_vencimento')
+    for row in tables['servico'][1:n_hot + 1]:
+        row[date_col] = row[due_col] = HOT_DATE.isoformat()
+    return tables
+
+
+def prune_stale_widgets(node):
+    """Remove da árvore do AppTest os widgets que a última execução não recriou.
+
+    Quando o script chama st.rerun, o AppTest junta as mensagens das duas passadas: elementos da
+    primeira que a segunda não sobrescreveu continuam na árvore, mas seus widgets já saíram do
+    session_state, e o próximo `run` falha ao ler o estado deles. O navegador descarta esses
+    elementos ao fim da execução; aqui eles são descartados antes da próxima interação.
+    """
+    for key, child in list(getattr(node, 'children', {}).items()):
+        if getattr(child, 'children', None):
+            prune_stale_widgets(child)
+            continue
+        try:
+            child._widget_state
+        except KeyError:
+            del node.children[key]
+        except AttributeError: # Elemento que não é widget
+            pass
+
+
+class Session:
+    """Uma sessão simulada: um AppTest próprio que executa `args.actions` ações sorteadas."""
+
+    def __init__(self, number, hot_ids, args, results, start):
+        self.number = number
+        self.hot_ids = hot_ids
+        self.args = args
+        self.results = results
+        self.start = start
+        self.rng = random.Random(args.seed * 1000 + number)
+        self.at = None
+
+    def run(self, action, at=None):
+        """Executa o script uma vez e registra a duração dessa interação."""
+        at = self.at if at is None else at
+        prune_stale_widgets(at._tree)
+        started = time.perf_counter()
+        at.run()
+        elapsed = (time.perf_counter() - started) * 1000
+        with self.results['lock']:
+            self.results['latency'][action].append(elapsed)
+            if at.exception:
+                self.results['exceptions'].append(str(at.exception[0].value))
+        return at
+
+    def choose(self, table):
+        radio = self.at.radio(key='cadastro_choice_unificado')
+        if radio.value != table:
+            radio.set_value(table)
+            self.run('browse')
+
+    def filter_dates(self, first, last, action):
+        inputs = {d.label: d for d in self.at.date_input}
+        inputs['Filtrar por Data de Início'].set_value(first)
+        inputs['Filtrar por Data Final'].set_value(last)
+        self.run(action)
+
+    def browse(self):
+        self.choose(self.rng.choice([t for t in ('Veículo', 'Prestador', 'Serviço') if t != self.at.radio(key='cadastro_choice_unificado').value]))
+
+    def filter(self):
+        self.choose('Serviço')
+        first = FILTER_RANGE[0] + datetime.timedelta(days=self.rng.randint(0, (FILTER_RANGE[1] - FILTER_RANGE[0]).days - 90))
+        self.filter_dates(first, first + datetime.timedelta(days=90), 'filter')
+
+    def edit(self):
+        self.choose('Serviço')
+        self.filter_dates(HOT_DATE, HOT_DATE, 'edit')
+        id_servico = self.rng.choice(self.hot_ids)
+        self.at.button(key=f'edit_{id_servico}').click()
+        self.run('edit')
+        km = next(n for n in self.at.number_input if n.label == 'KM Realizado')
+        km.set_value(int(km.value) + 1)
+        next(b for b in self.at.button if b.label == 'Atualizar Serviço').click()
+        self.run('edit')
+
+        accepted = self.at.session_state['edit_service_id'] is None
+        with self.results['lock']:
+            self.results['edits']['accepted' if accepted else 'rejected'] += 1
+            if accepted:
+                self.results['accepted_by_id'][id_servico] += 1
+        if not accepted:
+            next(b for b in self.at.button if b.label.startswith('Cancelar Edição')).click()
+            self.run('edit')
+
+    def insert(self):
+        self.choose('Serviço')
+        self.at.button(key='btn_novo_servico_lista').click()
+        self.run('insert')
+        next(t for t in self.at.text_input if t.label == 'Nome do Serviço').set_value(f'Carga {self.number}')
+        next(b for b in self.at.button if b.label == 'Cadastrar Serviço').click()
+        self.run('insert')
+        with self.results['lock']:
+            self.results['inserts'] += 1
+        if self.at.session_state['edit_service_id'] is not None:
+            next(b for b in self.at.button if b.label.startswith('Cancelar Cadastro')).click()
+            self.run('insert')
+
+    def __call__(self):
+        self.start.wait()
+        self.at = self.run('load', AppTest.from_file(APP_ENTRY, default_timeout=self.args.timeout))
+        actions, weights = list(ACTIONS), list(ACTIONS.values())
+        for _ in range(self.args.actions):
+            action = self.rng.choices(actions, weights)[0]
+            try:
+                getattr(self, action)()
+            except Exception as e: # Uma sessão quebrada não derruba as outras; o erro entra no relatório
+                with self.results['lock']:
+                    self.results['exceptions'].append(f'{action}: {type(e).__name__}: {e}')
+                self.at = self.run('load', AppTest.from_file(APP_ENTRY, default_timeout=self.args.timeout))
+
+
+class _PerRunRuntime(Runtime):
+    """Recebe o Runtime que o AppTest cria (e depois zera) a cada execução, sem tocar no compartilhado."""
+
+
+def share_runtime():
+    """Prepara o AppTest para execuções simultâneas no mesmo processo.
+
+    A cada execução o AppTest instala um Runtime simulado global e o zera ao terminar; com várias
+    sessões ao mesmo tempo, uma execução que termina derruba o Runtime das outras. Aqui um único
+    Runtime simulado fica instalado durante todo o teste, como o único Runtime de um servidor.
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    app_test.Runtime = _PerRunRuntime
+    streamlit.config.set_option('global.appTest', True) # O AppTest liga e restaura a opção a cada execução
+
+
+def wait_for_write_behind(timeout=60):
+    """No modo write-behind, espera a fila esvaziar antes de conferir a planilha."""
+    if not app.WRITE_BEHIND:
+        return
+    queue = app.get_write_behind_queue()
+    deadline = time.time() + timeout
+    while queue.pending() and time.time() < deadline:
+        queue.flush_now()
+        time.sleep(0.2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=10, help='Sessões simultâneas')
+    parser.add_argument('--actions', type=int, default=20, help='Ações sorteadas por sessão')
+    parser.add_argument('--services', type=int, default=10000, help='Serviços na frota sintética')
+    parser.add_argument('--hot', type=int, default=5, help='Serviços disputados pelas edições (até 10, uma página)')
+    parser.add_argument('--latency-ms', type=float, default=100.0, help='Latência por chamada à API fake')
+    parser.add_argument('--jitter-ms', type=float, default=50.0)
+    parser.add_argument('--timeout', type=float, default=120, help='Tempo máximo de cada execução do AppTest (s)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='Arquivo JSON com o relatório')
+    args = parser.parse_args(argv)
+
+    n_hot = max(1, min(args.hot, app.LISTING_PAGE_SIZES[0], args.services))
+    tables = build_tables(args.services, n_hot, args.seed)
+    client = fake_sheets.install(app, fake_sheets.FakeSheetsClient(tables, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, seed=args.seed))
+    header = tables['servico'][0]
+    hot_ids = [int(row[0]) for row in tables['servico'][1:n_hot + 1]]
+    initial_km = {int(row[0]): int(row[header.index(KM_COLUMN)]) for row in tables['servico'][1:n_hot + 1]}
+
+    results = {
+        'lock': threading.Lock(), 'latency': collections.defaultdict(list), 'exceptions': [],
+        'edits': collections.Counter(), 'accepted_by_id': collections.Counter(), 'inserts': 0,
+    }
+    share_runtime()
+    start = threading.Barrier(args.sessions + 1)
+    threads = [threading.Thread(target=Session(n, hot_ids, args, results, start), name=f'sessao-{n}') for n in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    wait_for_write_behind()
+
+    calls = dict(client.calls)
+    final_rows = {int(row[0]): row for row in client.spreadsheet.tabs['servico'].snapshot()[1:] if row and row[0].isdigit()}
+    lost = {}
+    for id_servico in hot_ids:
+        expected = initial_km[id_servico] + results['accepted_by_id'][id_servico]
+        final = int(float(final_rows[id_servico][header.index(KM_COLUMN)]))
+        if final != expected:
+            lost[id_servico] = expected - final
+
+    all_latency = [ms for values in results['latency'].values() for ms in values]
+    reruns = len(all_latency)
+    report = {
+        'config': {k: v for k, v in vars(args).items() if k != 'output'} | {'hot': n_hot, 'write_behind': app.WRITE_BEHIND},
+        'wall_s': round(wall, 2),
+        'reruns': reruns,
+        'throughput_reruns_per_s': round(reruns / wall, 2) if wall else None,
+        'latency': _latency(all_latency),
+        'latency_by_action': {action: _latency(values) for action, values in sorted(results['latency'].items())},
+        'backend_calls': {'total': sum(calls.values()), 'per_rerun': round(sum(calls.values()) / reruns, 3) if reruns else None, 'by_method': calls},
+        'edits': {'accepted': results['edits']['accepted'], 'rejected': results['edits']['rejected']},
+        'inserts': results['inserts'],
+        'lost_updates': sum(n for n in lost.values() if n > 0),
+        'lost_updates_by_id': lost,
+        'exceptions': results['exceptions'][:20],
+        'exception_count': len(results['exceptions']),
+    }
+
+    print(json.dumps({k: report[k] for k in ('wall_s', 'reruns', 'throughput_reruns_per_s', 'latency', 'backend_calls', 'edits', 'lost_updates', 'exception_count')}, indent=2, default=str))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Benchmarks offline do app contra o fake do Google Sheets, com frotas sintéticas.
+
+Uso (na raiz do repositório):
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 100000 --latency-ms 150 --output resultados.json
+    python benchmarks/run_benchmarks.py --sizes 1000 --compare resultados.json
+
+Cenários, por tamanho da frota:
+  cold_load       processo recém-iniciado: caches vazios, leitura e JOIN de get_full_service_data
+  dashboard       renderização completa do app (AppTest) com o cache já quente
+  insert          execute_crud_operation de um serviço novo
+  update          execute_crud_operation alterando um serviço existente
+  delete          execute_crud_operation excluindo um serviço
+  date_listing    rerun com a listagem de serviços filtrada por um intervalo de datas
+  reorder         aba de veículos reordenada na planilha (mesmo conteúdo): releitura e buscas por placa,
+                  conferindo que os índices não devolvem a linha da ordem anterior
+
+O resultado (JSON) traz, por tamanho e cenário, os tempos (mediana, p95, mínimo, em ms) e a média de
+chamadas à API fake por iteração. Não usa rede nem credenciais.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+APP_ENTRY = os.path.join(HERE, 'app_entry.py')
+
+# Configuração do app antes de importá-lo: Google Sheets (o fake), sem cópia local em disco
+os.environ.setdefault('STORAGE_BACKEND', 'sheets')
+os.environ['WARM_CACHE_DIR'] = ''
+os.environ.setdefault('SHEETS_RATE_PER_MINUTE', '1000000') # O limitador não entra na medição
+sys.path[:0] = [ROOT, HERE]
+
+from streamlit.testing.v1 import AppTest # noqa: E402
+
+# Fora do `streamlit run`, cada st.* do app avisa que não há contexto de execução: silencia o aviso
+logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+
+import app # noqa: E402
+import fake_sheets # noqa: E402
+import synthetic # noqa: E402
+
+SCENARIOS = ['cold_load', 'dashboard', 'insert', 'update', 'delete', 'date_listing', 'reorder']
+LISTING_WINDOW = (datetime.date(2025, 1, 1), datetime.date(2025, 3, 31))
+
+
+def _new_service(rng, tables):
+    n_vehicles, n_providers = len(tables['veiculo']) - 1, len(tables['prestador']) - 1
+    return {
+        'id_servico': 0, 'id_veiculo': rng.randint(1, n_vehicles), 'id_prestador': rng.randint(1, n_providers),
+        'nome_servico': 'Benchmark', 'data_servico': '2025-02-10', 'garantia_dias': 90, 'valor': 321.5,
+        'km_realizado': 50000, 'km_proxima_revisao': 60000, 'registro': '', 'data_vencimento': '2025-05-11',
+    }
+
+
+def _run_app(timeout, listing=False):
+    at = AppTest.from_file(APP_ENTRY, default_timeout=timeout).run()
+    if listing:
+        at.radio(key='cadastro_choice_unificado').set_value('Serviço').run()
+        at.date_input[0].set_value(LISTING_WINDOW[0])
+        at.date_input[1].set_value(LISTING_WINDOW[1])
+    return at
+
+
+def _check(at):
+    if at.exception:
+        raise RuntimeError(f'O app lançou uma exceção: {at.exception[0].value}')
+
+
+class Bench:
+    def __init__(self, client, tables, repeat, timeout, seed):
+        self.client = client
+        self.tables = tables
+        self.repeat = repeat
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.inserted = []
+
+    def measure(self, step, setup=None):
+        """Executa `step` `repeat` vezes; `setup` (opcional, fora da medição) roda antes de cada uma."""
+        times, calls = [], []
+        for _ in range(self.repeat):
+            arg = setup() if setup else None
+            self.client.reset_calls()
+            start = time.perf_counter()
+            step(arg)
+            times.append((time.perf_counter() - start) * 1000)
+            calls.append(sum(self.client.reset_calls().values()))
+        ordered = sorted(times)
+        return {
+            'iterations': len(times),
+            'median_ms': round(statistics.median(times), 2),
+            'p95_ms': round(ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))], 2),
+            'min_ms': round(ordered[0], 2),
+            'api_calls': round(statistics.mean(calls), 2),
+        }
+
+    def warm(self, _=None):
+        app.get_full_service_data()
+        app.get_spend_aggregates()
+
+    def cold_load(self):
+        def setup():
+            app.st.cache_resource.clear() # Tudo o que um processo novo ainda não teria
+        return self.measure(lambda _: app.get_full_service_data(), setup)
+
+    def dashboard(self):
+        self.warm()
+        _check(_run_app(self.timeout)) # Primeira execução (imports, caches de visão) fora da medição
+        return self.measure(lambda _: _check(AppTest.from_file(APP_ENTRY, default_timeout=self.timeout).run()))
+
+    def insert(self):
+        def step(_):
+            success, id_value = app.execute_crud_operation('servico', data=_new_service(self.rng, self.tables), operation='insert')
+            if success:
+                self.inserted.append(id_value)
+        return self.measure(step, self.warm)
+
+    def update(self):
+        n_services = len(self.tables['servico']) - 1
+        def step(id_value):
+            app.execute_crud_operation('servico', data={'valor': round(self.rng.uniform(80, 4500), 2)}, id_value=id_value, operation='update')
+        return self.measure(step, lambda: (self.warm(), self.rng.randint(1, n_services))[1])
+
+    def delete(self):
+        # Exclui os serviços criados no cenário de inserção: a aba volta ao tamanho original
+        pending = iter(self.inserted)
+        def setup():
+            self.warm()
+            return next(pending, None) or self.rng.randint(1, len(self.tables['servico']) - 1)
+        return self.measure(lambda id_value: app.execute_crud_operation('servico', id_value=id_value, operation='delete'), setup)
+
+    def date_listing(self):
+        def setup():
+            self.warm()
+            return _run_app(self.timeout, listing=True)
+        return self.measure(lambda at: _check(at.run()), setup)
+
+    def reorder(self):
+        tab = self.client.spreadsheet.tabs['veiculo']
+        plates = [row[2] for row in tab.rows[1:]]
+        sample = self.rng.sample(plates, min(20, len(plates)))
+        def setup():
+            self.warm()
+            app.get_data('veiculo', 'placa', sample[0]) # Índices montados para a ordem atual
+            tab.rows[1:] = tab.rows[:0:-1] # Como ordenar a aba na própria planilha: mesmas linhas, outra ordem
+            # Releitura obrigatória na próxima consulta, como depois de uma escrita própria
+            app.own_write_generations().update(app.get_sheet_cache().invalidate(['veiculo']))
+        def step(_):
+            for plate in sample:
+                found = app.get_data('veiculo', 'placa', plate)
+                if list(found['placa']) != [plate]:
+                    raise RuntimeError(f'Busca pela placa {plate} devolveu {list(found["placa"])}')
+        return self.measure(step, setup)
+
+
+def run_size(n_services, args):
+    tables = synthetic.generate_fleet(n_services, seed=args.seed)
+    client = fake_sheets.install(app, fake_sheets.FakeSheetsClient(tables, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, seed=args.seed))
+    bench = Bench(client, tables, args.repeat, args.timeout, args.seed)
+    results = {}
+    for scenario in args.scenarios:
+        results[scenario] = getattr(bench, scenario)()
+        print(f"{n_services:>7} {scenario:<13} mediana {results[scenario]['median_ms']:>9.1f} ms   "
+              f"p95 {results[scenario]['p95_ms']:>9.1f} ms   chamadas {results[scenario]['api_calls']:>6}", flush=True)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    """Imprime a variação da mediana de cada cenário em relação a um resultado anterior."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nComparação com {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    for size, scenarios in current['results'].items():
+        for scenario, result in scenarios.items():
+            before = baseline['results'].get(size, {}).get(scenario)
+            if before:
+                change = (result['median_ms'] / before['median_ms'] - 1) * 100 if before['median_ms'] else 0.0
+                print(f"{size:>7} {scenario:<13} {before['median_ms']:>9.1f} -> {result['median_ms']:>9.1f} ms ({change:+.1f}%)   "
+                      f"chamadas {before['api_calls']} -> {result['api_calls']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Quantidades de serviços')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--repeat', type=int, default=5, help='Iterações medidas por cenário')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latência injetada por chamada à API fake')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Variação aleatória somada à latência')
+    parser.add_argument('--timeout', type=float, default=120, help='Tempo máximo de cada execução do AppTest (s)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Arquivo JSON com os resultados')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+    args = parser.parse_args(argv)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(), 'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'pandas': app.pd.__version__, 'streamlit': app.st.__version__,
+            'platform': platform.platform(), 'repeat': args.repeat, 'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms, 'seed': args.seed, 'write_behind': app.WRITE_BEHIND,
+        },
+        'results': {},
+    }
+    for n_services in args.sizes:
+        report['results'][str(n_services)] = run_size(n_services, args)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+    return report
+
+
+if __name__ == '__main__':
+    main()
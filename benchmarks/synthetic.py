@@ -0,0 +1,71 @@
+"""Gerador de frotas sintéticas para os benchmarks (veículos, prestadores e serviços).
+
+As tabelas saem como matrizes de texto (cabeçalho + linhas), no formato em que o Google Sheets
+devolve os valores, com as colunas de TABLE_COLUMNS. A mesma semente gera sempre os mesmos dados.
+"""
+import datetime
+import random
+
+VEHICLE_MODELS = ['Gol', 'Onix', 'HB20', 'Strada', 'Hilux', 'Saveiro', 'Kwid', 'Corolla', 'S10', 'Fiorino']
+SERVICE_NAMES = [
+    'Troca de óleo', 'Alinhamento e balanceamento', 'Pastilhas de freio', 'Revisão geral',
+    'Troca de pneus', 'Correia dentada', 'Bateria', 'Suspensão dianteira', 'Embreagem', 'Ar-condicionado',
+]
+CITIES = ['São Paulo', 'Campinas', 'Santos', 'Sorocaba', 'Ribeirão Preto', 'Jundiaí']
+
+SERVICES_PER_VEHICLE = 20 # 1k serviços -> 50 veículos; 100k -> 5.000
+SERVICES_PER_PROVIDER = 50 # 1k serviços -> 20 prestadores; 100k -> 2.000
+
+
+def _plate(rng, used):
+    while True:
+        plate = ''.join(rng.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=3)) + str(rng.randint(0, 9)) \
+            + rng.choice('ABCDEFGHIJ') + f'{rng.randint(0, 99):02d}'
+        if plate not in used:
+            used.add(plate)
+            return plate
+
+
+def generate_fleet(n_services, seed=42, start=datetime.date(2019, 1, 1), end=datetime.date(2026, 6, 30)):
+    """Retorna {tabela: [cabeçalho, *linhas]} com `n_services` serviços e frota/prestadores proporcionais."""
+    rng = random.Random(seed)
+    n_vehicles = max(1, n_services // SERVICES_PER_VEHICLE)
+    n_providers = max(1, n_services // SERVICES_PER_PROVIDER)
+
+    plates = set()
+    veiculo = [['id_veiculo', 'nome', 'placa', 'ano', 'valor_pago', 'data_compra']]
+    for i in range(1, n_vehicles + 1):
+        bought = start + datetime.timedelta(days=rng.randint(0, 365))
+        veiculo.append([
+            str(i), f'{rng.choice(VEHICLE_MODELS)} {i}', _plate(rng, plates), str(rng.randint(2012, 2024)),
+            f'{rng.uniform(40000, 180000):.2f}', bought.isoformat(),
+        ])
+
+    prestador = [[
+        'id_prestador', 'empresa', 'telefone', 'nome_prestador', 'cnpj', 'email',
+        'endereco', 'numero', 'cidade', 'bairro', 'cep',
+    ]]
+    for i in range(1, n_providers + 1):
+        prestador.append([
+            str(i), f'Oficina {i}', f'(11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}', f'Responsável {i}',
+            f'{rng.randint(10**13, 10**14 - 1)}', f'contato{i}@oficina.com.br', f'Rua {i}', str(rng.randint(1, 2000)),
+            rng.choice(CITIES), f'Bairro {rng.randint(1, 80)}', f'{rng.randint(10000, 19999)}-{rng.randint(0, 999):03d}',
+        ])
+
+    servico = [[
+        'id_servico', 'id_veiculo', 'id_prestador', 'nome_servico', 'data_servico',
+        'garantia_dias', 'valor', 'km_realizado', 'km_proxima_revisao', 'registro', 'data_vencimento',
+    ]]
+    span_days = (end - start).days
+    for i in range(1, n_services + 1):
+        done = start + datetime.timedelta(days=rng.randint(0, span_days))
+        warranty = rng.choice([0, 30, 90, 180, 365])
+        km = rng.randint(1000, 250000)
+        servico.append([
+            str(i), str(rng.randint(1, n_vehicles)), str(rng.randint(1, n_providers)), rng.choice(SERVICE_NAMES),
+            done.isoformat(), str(warranty), f'{rng.uniform(80, 4500):.2f}', str(km), str(km + 10000),
+            f'NF {rng.randint(1000, 999999)}' if rng.random() < 0.6 else '',
+            (done + datetime.timedelta(days=warranty)).isoformat(),
+        ])
+
+    return {'veiculo': veiculo, 'prestador': prestador, 'servico': servico}